@@ -0,0 +1,301 @@
+# api.py — API JSON sin Streamlit: skills, parser libre, QuerySpec, Auto-SQL y preguntas completas
+# Servidor HTTP/1.1 mínimo sobre asyncio (solo stdlib). El trabajo de CPU (pandas/DuckDB/LLM) corre en un
+# pool de hilos del mismo proceso, así que todas las solicitudes comparten los caches por snapshot (MB,
+# índices de texto y de clave, FIN, sesión DuckDB) y el singleflight; el loop solo parsea y responde.
+#
+#   python api.py --fake 5000                          # hojas sintéticas (bench.synthetic), sin Google
+#   SHEET_ID=… GOOGLE_SERVICE_ACCOUNT=cred.json python api.py --port 8080
+#   curl -s localhost:8080/skills/entregados_sin_factura -d '{"cliente": "toyota", "limit": 20}'
+#   curl -s localhost:8080/ask -d '{"q": "entregados sin factura de inmobiliaria"}'
+#   curl -s localhost:8080/history/trend -d '{"desde": "2026-07-01", "filtro": "en_taller", "por": "MARCA"}'
+# FENIX_API_TOKEN=…: exige "Authorization: Bearer …". FENIX_API_WORKERS: tamaño del pool (por defecto 4).
+import os, sys, json, asyncio, argparse, logging, functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import pandas as pd
+
+from utils.sources import GSheetSource, StaticSource
+from utils.snapshot import snapshot_version
+from utils.tracing import trace
+from utils.skills import mb_for, skill_consulta_vehiculos_freeform, SKILL_CATALOG, run_skill
+from utils.intent import execute_queryspec, llm_question_to_queryspec, _validate_and_repair_spec
+from utils.llm import run_duckdb, iter_duckdb, unlimited_sql, llm_available, llm_debug_info
+from utils.router import answer_question, autosql_query, summarize_result
+from utils.history import enabled as history_enabled, record_snapshot, history_snapshots, history_trend, history_asof
+
+log = logging.getLogger("fenix.api")
+MAX_BODY = 1 << 20
+KEEPALIVE_S = 30
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def frame_json(df: pd.DataFrame | None) -> dict:
+    """DataFrame → {columns, rows, data: [registros]} (fechas ISO, NaN/NaT → null)."""
+    if df is None:
+        return {"columns": [], "rows": 0, "data": []}
+    return {
+        "columns": [str(c) for c in df.columns],
+        "rows": int(len(df)),
+        "data": json.loads(df.to_json(orient="records", date_format="iso", force_ascii=False)),
+    }
+
+def _hint(df: pd.DataFrame | None) -> dict:
+    """{"quisiste_decir": "…"} si el resultado vacío trae sugerencias (cliente inexistente)."""
+    hint = df.attrs.get("quisiste_decir") if df is not None else None
+    return {"quisiste_decir": hint} if hint else {}
+
+# ---------------------- handlers (corren en el pool) ----------------------
+class Api:
+    def __init__(self, source):
+        self.source = source
+
+    def _mb_raw(self, data: dict) -> pd.DataFrame:
+        return data.get("MODELO_BOT", next(iter(data.values())))
+
+    def _period(self, body: dict) -> tuple[int, int]:
+        hoy = date.today()
+        return int(body.get("mes") or hoy.month), int(body.get("anio") or hoy.year)
+
+    def health(self, body: dict) -> dict:
+        data = self.source.load()
+        raw = self._mb_raw(data)
+        return {
+            "status": "ok", "snapshot": snapshot_version(data), "loaded_at": raw.attrs.get("loaded_at"),
+            "sheets": {k: int(len(v)) for k, v in data.items()}, "llm": llm_available(),
+        }
+
+    def reload(self, body: dict) -> dict:
+        self.source.load(force=True)
+        return self.health(body)
+
+    def skills(self, body: dict) -> dict:
+        return {"skills": {name: list(params) for name, (_, _, params) in SKILL_CATALOG.items()}}
+
+    def skill(self, name: str, body: dict) -> dict:
+        if name not in SKILL_CATALOG:
+            raise ApiError(404, f"Skill desconocida: {name}")
+        table, err = run_skill(self.source.load(), name, body)  # TypeError (parámetro de más) → 400
+        if err:
+            raise ApiError(422, err)
+        out = {"skill": name, **frame_json(table)}
+        if table is not None and table.attrs.get("no_encontradas"):
+            out["no_encontradas"] = table.attrs["no_encontradas"]
+        return out
+
+    def freeform(self, body: dict) -> dict:
+        q = self._question(body)
+        table, err = skill_consulta_vehiculos_freeform(self._mb_raw(self.source.load()), q,
+                                                       limit=body.get("limit", 300))
+        if err:
+            raise ApiError(422, err)
+        return {**frame_json(table), **_hint(table)}
+
+    def queryspec(self, body: dict) -> dict:
+        MB = mb_for(self._mb_raw(self.source.load()))
+        if isinstance(body.get("spec"), dict):
+            spec = _validate_and_repair_spec(dict(body["spec"]))
+        elif body.get("q"):
+            spec = llm_question_to_queryspec(str(body["q"]), MB)
+        else:
+            raise ApiError(400, "Falta 'spec' (objeto QuerySpec) o 'q' (pregunta)")
+        table = execute_queryspec(MB, spec, full=bool(body.get("full")))
+        return {"spec": spec, **frame_json(table), **_hint(table)}
+
+    def sql(self, body: dict) -> dict:
+        q = self._question(body)
+        if not llm_available():
+            raise ApiError(503, "Proveedor LLM no disponible (sin API key o circuito abierto)")
+        mes, anio = self._period(body)
+        sql, tables, prelude_sql = autosql_query(self.source.load(), q, mes, anio)
+        if not sql:
+            raise ApiError(502, f"No pude generar SQL: {llm_debug_info()}")
+        if body.get("full"):
+            parts = list(iter_duckdb(unlimited_sql(sql), tables, prelude_sql=prelude_sql))
+            df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+        else:
+            df = run_duckdb(sql, tables, prelude_sql=prelude_sql)
+        return {"sql": sql, **frame_json(df)}
+
+    def ask(self, body: dict) -> dict:
+        q = self._question(body)
+        mes, anio = self._period(body)
+        ans = answer_question(self.source.load(), q, mes, anio, self.semantic_text)
+        out = {"path": ans["path"], "sql": ans["sql"], "messages": [], "tables": [],
+               "timings_ms": {k: round(v * 1000, 1) for k, v in ans["timings"].items()}}
+        for kind, payload in ans["events"]:
+            if kind == "table":
+                df, name, _ = payload
+                out["tables"].append({"name": name, **frame_json(df)})
+            elif kind == "summary":
+                if body.get("summary"):
+                    df, full = payload
+                    out["summary"] = summarize_result(df, q, full=full)
+            elif kind != "sql":
+                out["messages"].append({"kind": kind, "text": str(payload)})
+        return out
+
+    def snapshots(self, body: dict) -> dict:
+        return {"snapshots": frame_json(history_snapshots())}
+
+    def trend(self, body: dict) -> dict:
+        if not body.get("desde"):
+            raise ApiError(400, "Falta 'desde' (fecha AAAA-MM-DD)")
+        return frame_json(history_trend(body["desde"], body.get("hasta"), filtro=body.get("filtro", "en_taller"),
+                                        por=body.get("por")))
+
+    def asof(self, body: dict) -> dict:
+        df = history_asof(body.get("fecha"))
+        limit = body.get("limit", 300)
+        return frame_json(df if limit is None else df.head(int(limit)))
+
+    @staticmethod
+    def _question(body: dict) -> str:
+        q = str(body.get("q") or "").strip()
+        if not q:
+            raise ApiError(400, "Falta 'q' (pregunta)")
+        return q
+
+    @functools.cached_property
+    def semantic_text(self) -> str:
+        try:
+            with open("semantic.yaml", "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return ""
+
+    def route(self, method: str, path: str):
+        """(método, ruta) → función(body) que corre en el pool."""
+        parts = [p for p in path.split("?", 1)[0].split("/") if p]
+        if method == "GET" and parts == ["health"]:
+            return self.health
+        if method == "GET" and parts == ["skills"]:
+            return self.skills
+        if method == "GET" and parts == ["history"]:
+            return self.snapshots
+        if method == "POST" and len(parts) == 2 and parts[0] == "history":
+            fn = {"trend": self.trend, "asof": self.asof}.get(parts[1])
+            if fn is not None:
+                return fn
+        if method == "POST" and len(parts) == 2 and parts[0] == "skills":
+            return functools.partial(self.skill, parts[1])
+        if method == "POST" and len(parts) == 1:
+            fn = {"freeform": self.freeform, "queryspec": self.queryspec, "sql": self.sql, "ask": self.ask,
+                  "reload": self.reload}.get(parts[0])
+            if fn is not None:
+                return fn
+        raise ApiError(404, f"No existe {method} {path}")
+
+# ---------------------- HTTP sobre asyncio ----------------------
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 413: "Payload Too Large",
+            422: "Unprocessable Entity", 500: "Internal Server Error", 502: "Bad Gateway",
+            503: "Service Unavailable"}
+
+def _response(status: int, payload: dict, keep_alive: bool) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+class Server:
+    def __init__(self, api: Api, workers: int = 4, token: str | None = None):
+        self.api, self.token = api, token
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fenix-api")
+
+    def _call(self, method: str, path: str, body: dict) -> dict:
+        # en el hilo del pool: la traza (contextvars) queda en este hilo, no en el loop
+        fn = self.api.route(method, path)
+        endpoint = path.split("?", 1)[0]
+        with trace("api", method=method, endpoint=endpoint, route=f"API {endpoint}"):
+            return fn(body)  # /ask: answer_question reemplaza route por la ruta de la pregunta
+
+    async def _dispatch(self, method: str, path: str, headers: dict, raw: bytes) -> tuple[int, dict]:
+        if self.token and headers.get("authorization") != f"Bearer {self.token}":
+            return 401, {"error": "Token inválido o ausente"}
+        try:
+            body = json.loads(raw or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("el cuerpo debe ser un objeto JSON")
+        except ValueError as e:
+            return 400, {"error": f"JSON inválido: {e}"}
+        loop = asyncio.get_running_loop()
+        try:
+            return 200, await loop.run_in_executor(self.pool, self._call, method, path, body)
+        except ApiError as e:
+            return e.status, {"error": str(e)}
+        except (TypeError, ValueError) as e:
+            return 400, {"error": f"{type(e).__name__}: {e}"}
+        except Exception as e:
+            log.exception("api %s %s", method, path)
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    break
+                if not line:
+                    break
+                try:
+                    method, path, version = line.decode("latin-1").split()
+                except ValueError:
+                    writer.write(_response(400, {"error": "Línea de solicitud inválida"}, False))
+                    break
+                headers = {}
+                while (h := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                keep = (headers.get("connection", "").lower() != "close") and version == "HTTP/1.1"
+                n = int(headers.get("content-length") or 0)
+                if n > MAX_BODY:
+                    writer.write(_response(413, {"error": f"Cuerpo mayor a {MAX_BODY} bytes"}, False))
+                    break
+                raw = await reader.readexactly(n) if n else b""
+                status, payload = await self._dispatch(method.upper(), path, headers, raw)
+                writer.write(_response(status, payload, keep))
+                await writer.drain()
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle, host, port)
+        log.info("API en http://%s:%s", host, port)
+        async with server:
+            await server.serve_forever()
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="API JSON de Agente Fénix (sin Streamlit)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--workers", type=int, default=int(os.environ.get("FENIX_API_WORKERS", 4)))
+    ap.add_argument("--fake", type=int, metavar="FILAS", help="usar hojas sintéticas de N filas (sin Google)")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    if args.fake:
+        from bench.synthetic import make_data
+        source = StaticSource(make_data(args.fake, seed=args.seed, finanzas=True))
+    else:
+        # cada recarga de la planilla queda en el historial (las hojas sintéticas no se registran)
+        on_load = (lambda data: record_snapshot(data, background=True)) if history_enabled() else None
+        source = GSheetSource.from_env(on_load=on_load)
+    server = Server(Api(source), workers=args.workers, token=os.environ.get("FENIX_API_TOKEN") or None)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
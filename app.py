@@ -1,9 +1,8 @@
 # app.py — Agente Fénix (solo MODELO_BOT) + Fallback libre
-import os, sys, io, base64, traceback
+import os, sys, time, base64, traceback
 from datetime import datetime
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 
 ICON_PATH = "assets/Isotipo_Nexa.png"
 try:
@@ -38,34 +37,48 @@ try:
 except Exception:
     pass
 
-def safe_import(module_path, names):
+def safe_import(module_path, names, stop=True):
     try:
         mod = __import__(module_path, fromlist=names)
         return [getattr(mod, n) for n in names]
     except Exception as e:
         st.error(f"❌ Error importando {module_path}")
         st.code("".join(traceback.format_exception(type(e), e, e.__traceback__)))
-        st.stop()
+        if stop:
+            st.stop()
+        return [None] * len(names)
+
+def lazy_import(module_path):
+    # dependencias pesadas (plotly, …) se importan al primer uso, no en el arranque; mismo reporte de error
+    import importlib
+    try:
+        return importlib.import_module(module_path)
+    except Exception:
+        safe_import(module_path, [], stop=False)
+        return None
 
 # ---- Imports de utilidades propias
 (load_sheets,) = safe_import("utils.gsheets", ["load_sheets"])
 (ensure_login,) = safe_import("utils.login", ["ensure_login"])
-(format_currency_clp, format_date_ddmmyyyy) = safe_import(
-    "utils.formatters", ["format_currency_clp", "format_date_ddmmyyyy"]
-)
-(df_to_md,) = safe_import("utils.md", ["df_to_md"])
-(build_duckdb_prelude_and_schema,) = safe_import(
-    "utils.schema", ["build_duckdb_prelude_and_schema"]
+(display_frame,) = safe_import("utils.formatters", ["display_frame"])
+(export_file, EXPORT_FORMATS, stream_export, STREAM_FORMATS, frame_chunks) = safe_import(
+    "utils.exports", ["export_file", "EXPORT_FORMATS", "stream_export", "STREAM_FORMATS", "frame_chunks"]
 )
-(
-    summarize_markdown,
-    nl2sql,
-    run_duckdb,
-    has_openai,
-    llm_debug_info,
-) = safe_import("utils.llm", ["summarize_markdown", "nl2sql", "run_duckdb", "has_openai", "llm_debug_info"])
-(parse_question_to_json,) = safe_import("utils.nlp", ["parse_question_to_json"])
+(make_pager, PAGE_ROWS) = safe_import("utils.paging", ["make_pager", "PAGE_ROWS"])
+(llm_debug_info,) = safe_import("utils.llm", ["llm_debug_info"])
 (verify_and_refine,) = safe_import("utils.llm_guard", ["verify_and_refine"])
+(answer_question, summarize_result) = safe_import("utils.router", ["answer_question", "summarize_result"])
+(trace, span) = safe_import("utils.tracing", ["trace", "span"])
+(memprof,) = safe_import("utils", ["memprof"])
+(precompute, quick_result, precompute_status) = safe_import("utils.precompute", ["precompute", "quick_result", "status"])
+(record_snapshot, history_enabled) = safe_import("utils.history", ["record_snapshot", "enabled"])
+
+if _debug_on():
+    # tracemalloc es global y ralentiza todo el proceso: se activa solo mientras se investiga
+    if st.sidebar.toggle("Perfilado de memoria (todo el proceso)", value=memprof.enabled(), key="memprof"):
+        memprof.enable()
+    else:
+        memprof.disable()
 
 # Skills deterministas (solo MODELO_BOT)
 (
@@ -75,6 +88,12 @@ def safe_import(module_path, names):
     skill_facturacion_por_mes_tipo,
     skill_entregas_proximos_dias_sin_factura,
     skill_sin_aprobacion,
+    skill_buscar_vehiculos,
+    skill_timeline_vehiculo,
+    skill_facturados_pago_vencido,
+    skill_aging_pagos_por_cliente,
+    PAGE_ORDER,
+    COLUMN_MAP,
 ) = safe_import(
     "utils.skills",
     [
@@ -84,19 +103,31 @@ def safe_import(module_path, names):
         "skill_facturacion_por_mes_tipo",
         "skill_entregas_proximos_dias_sin_factura",
         "skill_sin_aprobacion",
+        "skill_buscar_vehiculos",
+        "skill_timeline_vehiculo",
+        "skill_facturados_pago_vencido",
+        "skill_aging_pagos_por_cliente",
+        "PAGE_ORDER",
+        "COLUMN_MAP",
     ],
 )
 
 # Login
 ensure_login()
 
-# Logo Fénix arriba a la derecha
-def _b64(path: str) -> str:
+# Logo Fénix arriba a la derecha (assets leídos una vez por proceso)
+@st.cache_resource(show_spinner=False)
+def _asset(path: str) -> bytes | None:
     try:
         with open(path, "rb") as f:
-            return base64.b64encode(f.read()).decode("utf-8")
+            return f.read()
     except Exception:
-        return ""
+        return None
+
+@st.cache_resource(show_spinner=False)
+def _b64(path: str) -> str:
+    raw = _asset(path)
+    return base64.b64encode(raw).decode("utf-8") if raw else ""
 
 fenix_b64 = _b64("assets/Fenix_isotipo.png")
 if fenix_b64:
@@ -109,22 +140,36 @@ if fenix_b64:
 # Sidebar
 with st.sidebar:
     try:
-        st.image("assets/Nexa_logo.png", use_container_width=True)
+        st.image(_asset("assets/Nexa_logo.png"), use_container_width=True)
     except Exception:
         pass
     st.markdown("---")
 
 st.title("🛠️ Agente Fénix")
-st.caption("Solo MODELO_BOT. Capa semántica + skills deterministas; Auto-SQL y fallback libre.")
+st.caption("MODELO_BOT (+ FINANZAS si existe). Capa semántica + skills deterministas; Auto-SQL y fallback libre.")
 
-# Conexión (solo MODELO_BOT)
+# Conexión (MODELO_BOT + FINANZAS opcional)
 sheet_id = st.secrets.get("SHEET_ID", "")
 with st.sidebar:
     st.subheader("Conexión")
     try:
-        data = load_sheets(sheet_id, allow_sheets=("MODELO_BOT",))
+        _t0, _started = time.perf_counter(), datetime.now().replace(microsecond=0)
+        _mem = memprof.stage_start(None)  # con perfilado: mide también la copia que entrega st.cache_data
+        data = load_sheets(sheet_id, allow_sheets=("MODELO_BOT", "FINANZAS"))
+        # span para la próxima traza: load_sheets corre en el rerun completo, antes de la pregunta
+        _loaded = next(iter(data.values())).attrs.get("loaded_at", "") if data else ""
+        st.session_state["_load_span"] = dict(
+            t0=_t0, dur_ms=(time.perf_counter() - _t0) * 1000,
+            rows=int(sum(len(df) for df in data.values())),
+            cache={"load_sheets": "miss" if _loaded >= _started.isoformat() else "hit"},
+            **memprof.stage_end(_mem, None),
+        )
+        # botones rápidos por defecto: una vez por snapshot, en segundo plano (no demora este rerun)
+        precompute(data, background=True)
+        if history_enabled():  # historial por fecha (utils.history): una vez por snapshot y día, en segundo plano
+            record_snapshot(data, background=True)
         st.success("Google Sheets conectado (solo lectura).")
-        st.write("Hoja:", "MODELO_BOT")
+        st.write("Hojas:", ", ".join(data.keys()))
     except Exception as e:
         st.error(f"Error al conectar: {e}")
         st.info("Verifica SHEET_ID y comparte con el client_email de la service account (Viewer).")
@@ -142,35 +187,118 @@ with st.sidebar:
         st.rerun()
 
 # ---- Helpers para mostrar
-def _fmt_df(df: pd.DataFrame) -> pd.DataFrame:
-    out = df.copy()
-    for c in out.columns:
-        lc = c.lower()
-        if any(k in lc for k in ["monto", "total", "valor", "neto", "bruto", "importe"]):
-            out[c] = out[c].map(format_currency_clp)
-        if "fecha" in lc:
-            out[c] = out[c].map(format_date_ddmmyyyy)
-    return out
-
-def _show(df: pd.DataFrame, name: str):
-    st.dataframe(_fmt_df(df), use_container_width=True)
-    c1, c2 = st.columns(2)
-    with c1:
-        st.download_button(
-            "⬇️ CSV", df.to_csv(index=False).encode("utf-8"), f"{name}.csv", "text/csv"
+def _waterfall(tr: dict) -> str:
+    """Cascada HTML de una traza (utils.tracing): una barra por span, desplazada por su inicio."""
+    spans = tr.get("spans") or []
+    if not spans:
+        return ""
+    t_min = min(0.0, *(s["start_ms"] for s in spans))
+    total = max(max(s["start_ms"] + (s["dur_ms"] or 0) for s in spans), tr.get("total_ms") or 0) - t_min
+    total = total or 1.0
+    rows = []
+    for s in spans:
+        left = (s["start_ms"] - t_min) / total * 100
+        width = max((s["dur_ms"] or 0) / total * 100, 0.5)
+        extra = " · ".join(
+            [f"{s['rows']} filas" for _ in [0] if "rows" in s]
+            + [f"{s['bytes'] / 1024:.0f} KB" for _ in [0] if "bytes" in s]
+            + [f"{k} {v}" for k, v in (s.get("cache") or {}).items()]
+            + [f"{s['prompt_tokens']}+{s['completion_tokens']} tok" for _ in [0] if "prompt_tokens" in s]
+            + [f"pico {s['mem_peak_mb']:.1f} MB · neto {s['mem_net_mb']:+.1f} MB" for _ in [0] if "mem_peak_mb" in s]
+            + [f"⚠ {s['error']}" for _ in [0] if "error" in s]
         )
-    with c2:
-        buff = io.BytesIO()
-        with pd.ExcelWriter(buff, engine="xlsxwriter") as w:
-            df.to_excel(w, index=False, sheet_name="Datos")
-        st.download_button(
-            "⬇️ XLSX",
-            buff.getvalue(),
-            f"{name}.xlsx",
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        color = "#d9534f" if "error" in s else "#f0ad4e" if s.get("depth") else "#5b8def"
+        rows.append(
+            f'<div style="display:flex;align-items:center;font-size:12px;margin:1px 0">'
+            f'<div style="width:34%;padding-left:{8 * s.get("depth", 0)}px;white-space:nowrap;overflow:hidden">'
+            f'{s["name"]}</div><div style="width:46%;position:relative;height:12px;background:#f3f3f3">'
+            f'<div style="position:absolute;left:{left:.1f}%;width:{width:.1f}%;height:12px;background:{color}">'
+            f'</div></div><div style="width:20%;text-align:right">{s["dur_ms"] or 0:.0f} ms</div></div>'
+            + (f'<div style="font-size:11px;color:#777;padding-left:{8 * s.get("depth", 0)}px">{extra}</div>'
+               if extra else "")
         )
-
-@st.cache_data(show_spinner=False)
+    head = (f'<div style="font-size:12px;margin-bottom:4px"><b>{tr.get("route") or tr.get("kind")}</b> · '
+            f'{tr.get("total_ms") or 0:.0f} ms · traza {tr.get("id")}</div>')
+    mem = tr.get("mem")
+    if mem:
+        head += (f'<div style="font-size:11px;color:#777;margin-bottom:4px">memoria: pico {mem["mem_peak_mb"]:.1f} MB · '
+                 f'neto {mem["mem_net_mb"]:+.1f} MB · RSS {mem["rss_start_mb"]:.0f} → pico {mem["rss_peak_mb"]:.0f} MB</div>')
+    return head + "".join(rows)
+
+def _mem_sites(tr: dict):
+    """Sitios (archivo:línea propio) que más memoria retienen al terminar la pregunta."""
+    top = (tr.get("mem") or {}).get("top")
+    if top:
+        st.caption("Asignaciones retenidas por sitio")
+        st.dataframe(pd.DataFrame(top), use_container_width=True, hide_index=True)
+
+if _debug_on() and st.session_state.get("last_trace"):
+    with st.sidebar:
+        st.subheader("Última traza")
+        st.markdown(_waterfall(st.session_state["last_trace"]), unsafe_allow_html=True)
+        _mem_sites(st.session_state["last_trace"])
+
+def _table(df: pd.DataFrame):
+    # formato solo de visualización: montos a texto solo en lo que se muestra (una página), fechas por column_config
+    data, config = display_frame(df)
+    st.dataframe(data, use_container_width=True, column_config=config)
+
+@st.fragment
+def _downloads(name: str):
+    # el archivo se genera solo al pedirlo (rerun del fragmento, no de la página) y queda cacheado.
+    # El resultado se lee de session_state: un fragmento conserva los argumentos con que se declaró.
+    df, full = st.session_state[f"result_{name}"]
+    completo = full is not None and st.checkbox(
+        "Resultado completo (sin tope de pantalla)", key=f"full_{name}",
+        help="Vuelve a ejecutar la consulta sin límite y la escribe por bloques (CSV/Parquet).",
+    )
+    c1, c2 = st.columns([1, 3])
+    with c1:
+        formats = list(STREAM_FORMATS) if completo else list(EXPORT_FORMATS)
+        fmt = st.selectbox("Formato", formats, key=f"fmt_{name}", label_visibility="collapsed")
+    with c2:
+        if st.button(f"Preparar {fmt}", key=f"prep_{name}"):
+            if completo:
+                with st.spinner("Exportando resultado completo…"):
+                    path, fname, mime = stream_export(full(), name, fmt)
+                with open(path, "rb") as fh:
+                    st.download_button(f"⬇️ {fname}", fh, fname, mime, key=f"dl_{name}")
+            else:
+                data, fname, mime = export_file(df, name, fmt)
+                st.download_button(f"⬇️ {fname}", data, fname, mime, key=f"dl_{name}")
+
+@st.fragment
+def _paged(name: str):
+    # cada página se pide al pager (clave o cursor) en un rerun del fragmento; al navegador va solo esa página
+    pager = st.session_state[f"pager_{name}"]
+    i = st.session_state.get(f"page_{name}", 0)
+    rows, has_next = pager.page(i)
+    _table(rows)
+    c1, c2, c3 = st.columns([1, 1, 4])
+    if c1.button("◀ Anterior", key=f"prev_{name}", disabled=i == 0):
+        st.session_state[f"page_{name}"] = i - 1
+        st.rerun(scope="fragment")
+    if c2.button("Siguiente ▶", key=f"next_{name}", disabled=not has_next):
+        st.session_state[f"page_{name}"] = i + 1
+        st.rerun(scope="fragment")
+    total = f" de {pager.total}" if pager.total is not None else ""
+    c3.caption(f"Página {i + 1} · filas {i * PAGE_ROWS + 1}–{i * PAGE_ROWS + len(rows)}{total}")
+
+def _show(df: pd.DataFrame, name: str, full=None):
+    """full: función sin argumentos → resultado sin tope, en bloques (ver utils.exports.stream_export)."""
+    st.session_state[f"result_{name}"] = (df, full)
+    if len(df) <= PAGE_ROWS:
+        _table(df)
+    else:
+        # resultado nuevo (rerun completo): pager nuevo y vuelta a la primera página. Sin fuente completa
+        # se pagina el resultado ya en memoria: al navegador (y al formateo) va una página por vez
+        source = full if full is not None else (lambda: iter([df]))
+        st.session_state[f"pager_{name}"] = make_pager(source, PAGE_ORDER.get(name))
+        st.session_state[f"page_{name}"] = 0
+        _paged(name)
+    _downloads(name)
+
+@st.cache_resource(show_spinner=False)
 def load_semantic_yaml():
     with open("semantic.yaml", "r", encoding="utf-8") as f:
         return f.read()
@@ -182,229 +310,211 @@ except Exception as e:
     st.sidebar.warning(f"No se pudo cargar semantic.yaml: {e}")
 
 tabs = st.tabs(["Preguntar (semántico) + Auto-SQL", "Botones rápidos", "Calibración"])
+MB = data.get("MODELO_BOT", next(iter(data.values())))
+
+def _run_card(table, err, name: str, full=None):
+    if err:
+        st.warning(err)
+    elif table.empty:
+        st.info("Sin resultados.")
+    else:
+        _show(table, name, full)
+        return True
+    return False
+
+def _hhmm(iso: str | None, secs: bool = False) -> str:
+    return (iso or "")[11:19 if secs else 16] or "?"
+
+def _quick(skill: str, params: dict, compute):
+    """Resultado precalculado del snapshot (utils.precompute) si params son los por defecto; si no, compute()."""
+    r = quick_result(data, skill, params)
+    if r is None:
+        return compute()
+    st.caption(f"⚡ Precalculado · snapshot {r['snapshot'][:8]} (cargado {_hhmm(r['loaded_at'])}) "
+               f"· calculado {_hhmm(r['computed_at'], secs=True)}")
+    return r["df"], r["err"]
 
 # ---------------- TAB 1: Preguntar
-with tabs[0]:
+@st.fragment
+def _tab_preguntar():
     st.markdown("### Preguntar (semántico) + Auto-SQL de respaldo")
     q = st.text_input(
         "Pregunta",
         "¿Cuáles son los vehículos entregados que aún no han sido facturas?",
     )
     if st.button("Responder", key="btn_sem"):
-        used_path = None
-        df_result = None
-
-        # 1) Router semántico (si tienes semantic.yaml y LLM activo)
-        if semantic_text and has_openai():
-            parsed = parse_question_to_json(q, semantic_text)
-            if parsed and parsed.get("metric"):
-                metric = parsed["metric"]
-                filters = parsed.get("filters", {}) or {}
-                used_path = f"Semántico → {metric}"
-                try:
-                    MB = data.get("MODELO_BOT", next(iter(data.values())))
-                    if metric == "entregados_sin_factura":
-                        df_result, err = skill_entregados_sin_factura(MB, **filters)
-                    elif metric == "entregados_facturados":
-                        df_result, err = skill_entregados_facturados(MB, **filters)
-                    elif metric == "en_taller":
-                        df_result, err = skill_top_en_taller(MB, **filters)
-                    elif metric == "facturacion_mensual_tipo_cliente":
-                        df_result, err = skill_facturacion_por_mes_tipo(
-                            MB, int(filters.get("mes", mes)), int(filters.get("anio", anio))
-                        )
-                    elif metric == "entregas_proximas_sin_factura":
-                        df_result, err = skill_entregas_proximos_dias_sin_factura(
-                            MB, int(filters.get("horizonte", 7))
-                        )
-                    elif metric == "sin_aprobacion":
-                        df_result, err = skill_sin_aprobacion(MB)
-                    else:
-                        df_result, err = None, f"Métrica no implementada: {metric}"
-                except Exception as e:
-                    df_result, err = None, str(e)
-
-                if err:
-                    st.warning(err)
-                elif df_result is not None and not df_result.empty:
-                    st.success(f"✓ Ruta: {used_path}")
-                    _show(df_result, "resultado_semantico")
-                else:
-                    st.info("Ruta semántica devolvió 0 filas; intentaré Auto-SQL.")
-                    used_path = None
-
-        # 2) Auto-SQL sobre DuckDB (respaldo)
-        if used_path is None:
-            try:
-                prelude_sql, schema_hint = build_duckdb_prelude_and_schema(
-                    {"MODELO_BOT": data["MODELO_BOT"]}
-                )
-                params = {"MES": int(mes), "ANIO": int(anio)}
-                sql = nl2sql(q, schema_hint=schema_hint, params=params)
-                if not sql:
-                    st.warning("No pude generar SQL. Revisa el 'Estado LLM' en la barra lateral.")
-                    st.info(llm_debug_info())
-                else:
-                    st.code(sql, language="sql")
-                    df_result = run_duckdb(
-                        sql, {"MODELO_BOT": data["MODELO_BOT"]}, prelude_sql=prelude_sql
-                    )
-                    if df_result.empty:
-                        st.info("Sin resultados.")
-                    else:
-                        _show(df_result, "resultado_autosql")
+        # una traza por pregunta: load_sheets (si corrió en este rerun), etapas del router, render y resumen
+        with trace("pregunta", q=q, mes=int(mes), anio=int(anio)) as tr:
+            load = st.session_state.pop("_load_span", None)
+            if load:
+                tr.add("load_sheets", load.pop("dur_ms"), start_ms=(load.pop("t0") - tr.t0) * 1000, **load)
+            ans = answer_question(data, q, int(mes), int(anio), semantic_text)
+            with span("render"):
+                for kind, payload in ans["events"]:
+                    if kind == "table":
+                        _show(*payload)
+                    elif kind == "sql":
+                        st.code(payload, language="sql")
+                    elif kind == "trace":
+                        st.code(payload)
+                    elif kind == "summary":
                         try:
                             st.markdown("### Resumen")
-                            st.write(summarize_markdown(df_to_md(df_result), q))
+                            df, full = payload
+                            st.write(summarize_result(df, q, full=full))
                         except Exception as e:
                             st.info(f"(Resumen no disponible) {e}")
-            except Exception as e:
-                st.error("Error en Auto-SQL:")
-                st.code("".join(traceback.format_exception(type(e), e, e.__traceback__)))
-
-        # 3) Fallback libre (heurístico) — interpreta español y arma filtros
-        try:
-            # Ejecutar SOLO si no hubo resultado previo o quedó vacío
-            if df_result is None or (isinstance(df_result, pd.DataFrame) and df_result.empty):
-                MB = data.get("MODELO_BOT", next(iter(data.values())))
-                # import tardío por si aún no pegaste la función
-                from utils.skills import skill_consulta_vehiculos_freeform
-                table, err = skill_consulta_vehiculos_freeform(MB, q)
-                if err:
-                    st.info(f"(Fallback libre) {err}")
-                elif table is not None and not table.empty:
-                    st.success("✓ Ruta: Fallback libre (heurístico)")
-                    _show(table, "resultado_fallback")
-                else:
-                    st.info("Sin resultados.")
-        except Exception as e:
-            st.info(f"(Fallback libre no disponible) {e}")
-
-# ---------------- TAB 2: Botones rápidos
-with tabs[1]:
-    st.markdown("### Botones rápidos (MODELO_BOT)")
-    MB = data.get("MODELO_BOT", next(iter(data.values())))
-
-    c = st.columns(2)
-    with c[0]:
-        st.subheader("Entregados SIN factura")
-        cliente = st.text_input("Cliente (contiene)", key="f1_cli")
-        tipo_cli = st.text_input("Tipo cliente (exacto)", key="f1_tc")
-        marca = st.text_input("Marca (exacto)", key="f1_marca")
-        suc = st.text_input("Sucursal (exacto)", key="f1_suc")
-        asesor = st.text_input("Asesor (contiene)", key="f1_ase")
-        fdesde = st.text_input("Fecha desde (YYYY-MM-DD)", key="f1_fd")
-        fhasta = st.text_input("Fecha hasta (YYYY-MM-DD)", key="f1_fh")
-        if st.button("Ejecutar 1"):
-            table, err = skill_entregados_sin_factura(
-                MB,
-                cliente=cliente or None,
-                tipo_cliente=tipo_cli or None,
-                marca=marca or None,
-                sucursal=suc or None,
-                asesor=asesor or None,
-                desde=fdesde or None,
-                hasta=fhasta or None,
-            )
-            if err:
-                st.warning(err)
-            elif table.empty:
-                st.info("Sin resultados.")
-            else:
-                _show(table, "entregados_sin_factura")
-
-    with c[1]:
-        st.subheader("Entregados CON factura")
-        if st.button("Ejecutar 2"):
-            table, err = skill_entregados_facturados(MB)
-            if err:
-                st.warning(err)
-            elif table.empty:
-                st.info("Sin resultados.")
-            else:
-                _show(table, "entregados_facturados")
-
-    with c[0]:
-        st.subheader("Top en taller (no entregados)")
-        topn = st.number_input("Top N", 1, 100, value=10, key="f3_top")
-        if st.button("Ejecutar 3"):
-            table, err = skill_top_en_taller(MB, topn=int(topn))
-            if err:
-                st.warning(err)
-            elif table.empty:
-                st.info("Sin resultados.")
-            else:
-                _show(table, "top_en_taller")
-                try:
-                    st.plotly_chart(
-                        px.bar(table, x=table.columns[0], y="NUMERO_DIAS_EN_PLANTA"),
-                        use_container_width=True,
-                    )
-                except Exception:
-                    pass
-
-    with c[1]:
-        st.subheader("Facturación por mes / tipo cliente")
-        if st.button("Ejecutar 4"):
-            table, err = skill_facturacion_por_mes_tipo(MB, int(mes), int(anio))
-            if err:
-                st.warning(err)
-            elif table.empty:
-                st.info("Sin resultados.")
-            else:
-                _show(table, "facturacion_mes_tipo")
-                try:
-                    st.plotly_chart(
-                        px.pie(table, names=table.columns[0], values="MONTO_NETO"),
-                        use_container_width=True,
-                    )
-                except Exception:
-                    pass
-
-    with c[0]:
-        st.subheader("Entregas próximos días SIN facturación")
-        horizonte = st.number_input("Días", 1, 60, value=7, key="f5_h")
-        if st.button("Ejecutar 5"):
-            table, err = skill_entregas_proximos_dias_sin_factura(MB, int(horizonte))
-            if err:
-                st.warning(err)
-            elif table.empty:
-                st.info("Sin resultados.")
-            else:
-                _show(table, "entregas_proximas_sin_factura")
-
-    with c[1]:
-        st.subheader("En taller SIN aprobación (proxy)")
-        if st.button("Ejecutar 6"):
-            table, err = skill_sin_aprobacion(MB)
-            if err:
-                st.warning(err)
-            elif table.empty:
-                st.info("Sin resultados.")
-            else:
-                _show(table, "sin_aprobacion")
+                    else:
+                        getattr(st, kind)(payload)
+        st.session_state["last_trace"] = tr.to_dict()
+        if _debug_on():
+            with st.expander(f"🛠️ Traza · {tr.attrs.get('route')} · {tr.total_ms:.0f} ms"):
+                st.markdown(_waterfall(st.session_state["last_trace"]), unsafe_allow_html=True)
+                _mem_sites(st.session_state["last_trace"])
+
+# ---------------- TAB 2: Botones rápidos (cada tarjeta es un fragmento: sus filtros no recalculan las demás)
+@st.fragment
+def _card_sin_factura():
+    st.subheader("Entregados SIN factura")
+    cliente = st.text_input("Cliente (contiene)", key="f1_cli")
+    tipo_cli = st.text_input("Tipo cliente (exacto)", key="f1_tc")
+    marca = st.text_input("Marca (exacto)", key="f1_marca")
+    suc = st.text_input("Sucursal (exacto)", key="f1_suc")
+    asesor = st.text_input("Asesor (contiene)", key="f1_ase")
+    fdesde = st.text_input("Fecha desde (YYYY-MM-DD)", key="f1_fd")
+    fhasta = st.text_input("Fecha hasta (YYYY-MM-DD)", key="f1_fh")
+    if st.button("Ejecutar 1"):
+        f1 = dict(
+            cliente=cliente or None,
+            tipo_cliente=tipo_cli or None,
+            marca=marca or None,
+            sucursal=suc or None,
+            asesor=asesor or None,
+            desde=fdesde or None,
+            hasta=fhasta or None,
+        )
+        table, err = _quick("entregados_sin_factura", f1, lambda: skill_entregados_sin_factura(MB, **f1))
+        _run_card(table, err, "entregados_sin_factura",
+                  lambda: frame_chunks(skill_entregados_sin_factura(MB, limit=None, **f1)[0]))
+
+@st.fragment
+def _card_facturados():
+    st.subheader("Entregados CON factura")
+    if st.button("Ejecutar 2"):
+        table, err = _quick("entregados_facturados", {}, lambda: skill_entregados_facturados(MB))
+        _run_card(table, err, "entregados_facturados",
+                  lambda: frame_chunks(skill_entregados_facturados(MB, limit=None)[0]))
+
+@st.fragment
+def _card_top_taller():
+    st.subheader("Top en taller (no entregados)")
+    topn = st.number_input("Top N", 1, 100, value=10, key="f3_top")
+    if st.button("Ejecutar 3"):
+        table, err = _quick("top_en_taller", {"topn": int(topn)}, lambda: skill_top_en_taller(MB, topn=int(topn)))
+        if _run_card(table, err, "top_en_taller") and (px := lazy_import("plotly.express")):
+            try:
+                st.plotly_chart(
+                    px.bar(table, x=table.columns[0], y="NUMERO_DIAS_EN_PLANTA"),
+                    use_container_width=True,
+                )
+            except Exception:
+                pass
+
+@st.fragment
+def _card_facturacion_mes():
+    st.subheader("Facturación por mes / tipo cliente")
+    if st.button("Ejecutar 4"):
+        table, err = _quick("facturacion_por_mes_tipo", {"mes": int(mes), "anio": int(anio)},
+                            lambda: skill_facturacion_por_mes_tipo(MB, int(mes), int(anio)))
+        if _run_card(table, err, "facturacion_mes_tipo") and (px := lazy_import("plotly.express")):
+            try:
+                st.plotly_chart(
+                    px.pie(table, names=table.columns[0], values="MONTO_NETO"),
+                    use_container_width=True,
+                )
+            except Exception:
+                pass
+
+@st.fragment
+def _card_proximas():
+    st.subheader("Entregas próximos días SIN facturación")
+    horizonte = st.number_input("Días", 1, 60, value=7, key="f5_h")
+    if st.button("Ejecutar 5"):
+        h = int(horizonte)
+        table, err = _quick("entregas_proximos_dias_sin_factura", {"horizonte_dias": h},
+                            lambda: skill_entregas_proximos_dias_sin_factura(MB, h))
+        _run_card(table, err, "entregas_proximas_sin_factura",
+                  lambda: frame_chunks(skill_entregas_proximos_dias_sin_factura(MB, h, limit=None)[0]))
+
+@st.fragment
+def _card_sin_aprobacion():
+    st.subheader("En taller SIN aprobación (proxy)")
+    if st.button("Ejecutar 6"):
+        table, err = _quick("sin_aprobacion", {}, lambda: skill_sin_aprobacion(MB))
+        _run_card(table, err, "sin_aprobacion", lambda: frame_chunks(skill_sin_aprobacion(MB, limit=None)[0]))
+
+@st.fragment
+def _card_pago_vencido():
+    st.subheader("Facturados con pago VENCIDO (FINANZAS)")
+    cli_venc = st.text_input("Cliente (contiene)", key="f8_cli")
+    if st.button("Ejecutar 8"):
+        cli = cli_venc or None
+        table, err = skill_facturados_pago_vencido(data, cliente=cli)
+        _run_card(table, err, "facturados_pago_vencido",
+                  lambda: frame_chunks(skill_facturados_pago_vencido(data, cliente=cli, limit=None)[0]))
+
+@st.fragment
+def _card_aging():
+    st.subheader("Antigüedad de deuda por cliente (aging)")
+    if st.button("Ejecutar 9"):
+        table, err = skill_aging_pagos_por_cliente(data)
+        _run_card(table, err, "aging_pagos_cliente")
+
+@st.fragment
+def _card_buscar():
+    st.subheader("Buscar vehículo (patente / OT / n° factura)")
+    claves = st.text_area("Una o varias claves (pega una lista: una por línea o separadas por coma)", key="f7_claves")
+    if st.button("Buscar"):
+        table, err = skill_buscar_vehiculos(MB, claves)
+        if err:
+            st.warning(err)
+        else:
+            if table.attrs.get("no_encontradas"):
+                st.info(f"Sin coincidencias: {', '.join(table.attrs['no_encontradas'])}")
+            _show(table, "busqueda_vehiculos")
+            if table["CLAVE"].nunique() == 1:
+                timeline, _ = skill_timeline_vehiculo(MB, table["CLAVE"].iloc[0])
+                if timeline is not None:
+                    st.markdown("**Línea de tiempo**")
+                    _table(timeline)
 
 # ---------------- TAB 3: Calibración
-with tabs[2]:
+@st.fragment
+def _tab_calibracion():
     st.markdown("### Calibración (ver lectura real de columnas)")
-    MB = data.get("MODELO_BOT", next(iter(data.values())))
     st.subheader("Encabezados MODELO_BOT")
     st.write(list(MB.columns))
 
-    import yaml
-
-    current_map = {}
-    try:
-        if os.path.exists("column_map.yaml"):
-            current_map = yaml.safe_load(open("column_map.yaml", "r", encoding="utf-8")) or {}
-    except Exception:
-        current_map = {}
     st.subheader("Mapeo actual (column_map.yaml)")
-    st.json(current_map.get("MODELO_BOT", {}))
-
-    from utils.skills import _build_mb
+    st.json(COLUMN_MAP.get("MODELO_BOT", {}))
+
+    from utils.skills import _build_mb, mb_plan
+    from utils.schema import map_cols, MB_KEYS
+
+    plan = mb_plan(MB)
+    st.subheader("Resolución de columnas (campo → encabezado)")
+    st.json(plan["cols"])
+    if plan["missing"] or plan["ambiguous"] or plan["shared"]:
+        st.warning(
+            f"Sin columna: {plan['missing'] or '-'} · Ambiguas: {plan['ambiguous'] or '-'} "
+            f"· Compartidas: {plan['shared'] or '-'}"
+        )
+    with st.expander("Vista DuckDB (MB_KEYS)"):
+        st.json(map_cols(MB, MB_KEYS, label="MB_KEYS"))
 
-    prev = _build_mb(MB).head(15)
+    # muestra: las derivadas son por fila, no hace falta construir MB completo para verificarlas
+    # (formatos de fecha y días en planta sí dependen de la hoja completa: sheet=MB)
+    prev = _build_mb(MB.head(15), sheet=MB)
     st.subheader("Preview derivadas (verifica booleans)")
     cols = [
         "id",
@@ -421,3 +531,38 @@ with tabs[2]:
     ]
     cols = [c for c in cols if c in prev.columns]
     st.dataframe(prev[cols], use_container_width=True)
+
+with tabs[0]:
+    _tab_preguntar()
+
+with tabs[1]:
+    st.markdown("### Botones rápidos (MODELO_BOT)")
+    _pre = precompute_status(data)
+    st.caption(
+        f"Precalculados {_pre['ready']}/{_pre['total']} con parámetros por defecto · snapshot "
+        f"{_pre['snapshot'][:8]} cargado {_hhmm(_pre['loaded_at'])}"
+        + (f" · listos {_hhmm(_pre['done_at'], secs=True)}" if _pre["done_at"] else " · calculando…")
+    )
+    c = st.columns(2)
+    with c[0]:
+        _card_sin_factura()
+    with c[1]:
+        _card_facturados()
+    with c[0]:
+        _card_top_taller()
+    with c[1]:
+        _card_facturacion_mes()
+    with c[0]:
+        _card_proximas()
+    with c[1]:
+        _card_sin_aprobacion()
+
+    c = st.columns(2)
+    with c[0]:
+        _card_pago_vencido()
+    with c[1]:
+        _card_aging()
+    _card_buscar()
+
+with tabs[2]:
+    _tab_calibracion()
@@ -0,0 +1,213 @@
+# batch.py — reporte por lotes: un snapshot, muchas preguntas/skills en paralelo → Parquet/XLSX + manifiesto
+# Carga las hojas una vez, arma MB y la sesión DuckDB antes de repartir los ítems a un pool de hilos y
+# evalúa cada uno con el mismo ruteo que la pestaña "Preguntar" (router.answer_question) o con la skill
+# del catálogo (skills.run_skill). Los resultados se escriben completos (sin tope de pantalla).
+#
+#   python batch.py reports/nocturno.yaml --fake 5000
+#   SHEET_ID=… GOOGLE_SERVICE_ACCOUNT=cred.json python batch.py reports/nocturno.yaml --formatos parquet xlsx
+#
+# Archivo YAML (lista, o {items: [...]}) o JSONL, un ítem por entrada:
+#   - id: sin_factura_toyota
+#     q: entregados sin factura de toyota               # pregunta (mes/anio opcionales por ítem)
+#   - id: proximos_14
+#     skill: entregas_proximos_dias_sin_factura          # skill del catálogo con sus parámetros
+#     params: {horizonte_dias: 14}
+import os, re, sys, json, time, argparse, logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+import yaml
+import pandas as pd
+
+from utils.sources import GSheetSource, StaticSource
+from utils.snapshot import snapshot_version
+from utils.tracing import trace
+from utils.skills import SKILL_CATALOG, mb_for, run_skill
+from utils.schema import build_duckdb_prelude_and_schema
+from utils.llm import duckdb_session, llm_available
+from utils.router import answer_question, summarize_result
+from utils.exports import EXPORT_FORMATS, frame_chunks, write_parquet_stream, to_xlsx_bytes
+from utils.history import enabled as history_enabled, record_snapshot
+
+log = logging.getLogger("fenix.batch")
+FORMATS = {"parquet": "Parquet", "xlsx": "XLSX"}
+XLSX_MAX_ROWS = 1_048_575  # límite de Excel sin la fila de encabezado
+
+def load_items(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            items = [json.loads(line) for line in f if line.strip()]
+        else:
+            doc = yaml.safe_load(f) or []
+            items = doc.get("items", []) if isinstance(doc, dict) else doc
+    seen = set()
+    for i, it in enumerate(items):
+        if not isinstance(it, dict) or bool(it.get("q")) == bool(it.get("skill")):
+            raise ValueError(f"Ítem {i + 1}: debe tener 'q' (pregunta) o 'skill', no ambos")
+        if it.get("skill") and it["skill"] not in SKILL_CATALOG:
+            raise ValueError(f"Ítem {i + 1}: skill desconocida {it['skill']!r}")
+        it.setdefault("id", f"{i + 1:02d}_{it.get('skill') or 'pregunta'}")
+        it["id"] = re.sub(r"[^\w\-]+", "_", str(it["id"])).strip("_")
+        if it["id"] in seen:
+            raise ValueError(f"Ítem {i + 1}: id repetido {it['id']!r}")
+        seen.add(it["id"])
+    return items
+
+def write_result(chunks, base: str, formats: list[str]) -> tuple[list[str], int]:
+    """
+    Bloques → un archivo por formato. Solo Parquet: se escribe bloque a bloque sin juntar el resultado;
+    con XLSX los bloques se juntan (xlsxwriter recorre el frame completo).
+    """
+    parts = list(chunks) if "xlsx" in formats else None
+    files, rows = [], 0
+    for fmt in formats:
+        path = f"{base}.{EXPORT_FORMATS[FORMATS[fmt]][0]}"
+        if fmt == "parquet":
+            rows = write_parquet_stream(iter(parts) if parts is not None else chunks, path)
+        else:
+            rows = sum(len(p) for p in parts)
+            if rows > XLSX_MAX_ROWS:
+                log.warning("%s: %s filas no caben en XLSX; solo Parquet", base, rows)
+                continue
+            df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+            with open(path, "wb") as f:
+                f.write(to_xlsx_bytes(df))
+        files.append(os.path.basename(path))
+    return files, rows
+
+class Batch:
+    def __init__(self, data: dict, out_dir: str, formats: list[str], mes: int, anio: int,
+                 full: bool = True, summary: bool = False, semantic_text: str = ""):
+        self.data, self.out_dir, self.formats = data, out_dir, formats
+        self.mes, self.anio, self.full, self.summary, self.semantic_text = mes, anio, full, summary, semantic_text
+
+    def prepare(self, with_sql: bool) -> dict:
+        """Lo compartido por todo el lote: MB (+ índices al primer uso) y la sesión DuckDB con sus vistas."""
+        t = {}
+        t0 = time.perf_counter()
+        mb_for(self.data.get("MODELO_BOT", next(iter(self.data.values()))))
+        t["build_mb_s"] = round(time.perf_counter() - t0, 3)
+        if with_sql:
+            t0 = time.perf_counter()
+            tables = {k: v for k, v in self.data.items() if k.upper() in ("MODELO_BOT", "FINANZAS")}
+            prelude_sql, _ = build_duckdb_prelude_and_schema(tables)
+            duckdb_session(tables, prelude_sql)
+            t["duckdb_session_s"] = round(time.perf_counter() - t0, 3)
+        return t
+
+    def run_item(self, it: dict) -> dict:
+        rec = {"id": it["id"], "kind": "skill" if it.get("skill") else "pregunta", "files": [], "rows": 0}
+        mes, anio = int(it.get("mes") or self.mes), int(it.get("anio") or self.anio)
+        t0 = time.perf_counter()
+        try:
+            with trace("batch", item=it["id"], route=f"batch {it.get('skill') or 'pregunta'}"):
+                if it.get("skill"):
+                    self._run_skill(it, rec)
+                else:
+                    self._run_question(it, mes, anio, rec)
+        except Exception as e:
+            rec["error"] = f"{type(e).__name__}: {e}"
+            log.warning("%s: %s", it["id"], rec["error"])
+        rec["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        return rec
+
+    def _run_skill(self, it: dict, rec: dict):
+        params = dict(it.get("params") or {})
+        rec.update(skill=it["skill"], params=dict(params))
+        if self.full and "limit" in SKILL_CATALOG[it["skill"]][2]:
+            params.setdefault("limit", None)
+        table, err = run_skill(self.data, it["skill"], params)
+        if err:
+            raise RuntimeError(err)
+        rec["files"], rec["rows"] = write_result(frame_chunks(table), os.path.join(self.out_dir, it["id"]),
+                                                 self.formats)
+
+    def _run_question(self, it: dict, mes: int, anio: int, rec: dict):
+        q = str(it["q"])
+        ans = answer_question(self.data, q, mes, anio, self.semantic_text)
+        rec.update(q=q, mes=mes, anio=anio, path=ans["path"], sql=ans["sql"],
+                   timings_ms={k: round(v * 1000, 1) for k, v in ans["timings"].items()})
+        tables = [p for kind, p in ans["events"] if kind == "table"]
+        rec["messages"] = [f"{kind}: {p}" for kind, p in ans["events"] if kind in ("info", "warning", "error")]
+        for n, (df, name, full) in enumerate(tables):
+            # primera tabla → <id>; las demás (p. ej. línea de tiempo) → <id>__<nombre>
+            base = os.path.join(self.out_dir, it["id"] if n == 0 else f"{it['id']}__{name}")
+            chunks = full() if (self.full and full is not None) else frame_chunks(df)
+            files, rows = write_result(chunks, base, self.formats)
+            rec["files"] += files
+            if n == 0:
+                rec["rows"] = rows
+        if self.summary and ans["df"] is not None and not ans["df"].empty:
+            rec["summary"] = summarize_result(ans["df"], q, full=ans["full"])
+        if ans["path"] is None:
+            raise RuntimeError("; ".join(rec["messages"]) or "sin resultado")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Preguntas y skills por lotes sobre un snapshot → Parquet/XLSX")
+    ap.add_argument("items", help="archivo YAML o JSONL con las preguntas/skills")
+    ap.add_argument("--out", help="carpeta de salida (por defecto reports/out/<fecha>)")
+    ap.add_argument("--formatos", nargs="+", choices=sorted(FORMATS), default=["parquet"])
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--mes", type=int, default=date.today().month)
+    ap.add_argument("--anio", type=int, default=date.today().year)
+    ap.add_argument("--tope-pantalla", action="store_true", help="escribir el resultado con tope de pantalla")
+    ap.add_argument("--resumen", action="store_true", help="agregar el resumen LLM al manifiesto")
+    ap.add_argument("--fake", type=int, metavar="FILAS", help="hojas sintéticas de N filas (sin Google)")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    items = load_items(args.items)
+    started = datetime.now()
+    out_dir = args.out or os.path.join("reports", "out", started.strftime("%Y-%m-%d_%H%M"))
+    os.makedirs(out_dir, exist_ok=True)
+
+    t0 = time.perf_counter()
+    if args.fake:
+        from bench.synthetic import make_data
+        source = StaticSource(make_data(args.fake, seed=args.seed, finanzas=True))
+    else:
+        source = GSheetSource.from_env()
+    data = source.load()
+    load_s = time.perf_counter() - t0
+    try:
+        with open("semantic.yaml", "r", encoding="utf-8") as f:
+            semantic_text = f.read()
+    except OSError:
+        semantic_text = ""
+
+    batch = Batch(data, out_dir, args.formatos, args.mes, args.anio, full=not args.tope_pantalla,
+                  summary=args.resumen, semantic_text=semantic_text)
+    prep = batch.prepare(with_sql=any(it.get("q") for it in items) and llm_available())
+    if history_enabled() and not args.fake:  # el lote nocturno también deja el snapshot en el historial
+        t1 = time.perf_counter()
+        record_snapshot(data)
+        prep["history_s"] = round(time.perf_counter() - t1, 3)
+    t1 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="fenix-batch") as pool:
+        records = list(pool.map(batch.run_item, items))
+    run_s = time.perf_counter() - t1
+
+    raw = data.get("MODELO_BOT", next(iter(data.values())))
+    errors = [r for r in records if r.get("error")]
+    manifest = {
+        "started_at": started.isoformat(timespec="seconds"),
+        "snapshot": snapshot_version(data), "loaded_at": raw.attrs.get("loaded_at"),
+        "sheets": {k: int(len(v)) for k, v in data.items()},
+        "source": f"sintético {args.fake}" if args.fake else "google_sheets",
+        "mes": args.mes, "anio": args.anio, "workers": args.workers, "formatos": args.formatos,
+        "completo": not args.tope_pantalla,
+        "timings_s": {"load": round(load_s, 3), **prep, "items": round(run_s, 3),
+                      "total": round(time.perf_counter() - t0, 3)},
+        "ok": len(records) - len(errors), "errores": len(errors),
+        "items": records,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+    print(f"{len(records) - len(errors)}/{len(records)} ítems OK en {run_s:.1f} s "
+          f"(carga {load_s:.1f} s) → {out_dir}/manifest.json")
+    for r in errors:
+        print(f"  ✗ {r['id']}: {r['error']}")
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+# bench/e2e.py — benchmark/regresión end-to-end del pipeline de preguntas, 100% offline
+# Corre un corpus de preguntas reales contra un MODELO_BOT sintético usando el mismo ruteo de app.py
+# (utils.router), mide latencia por etapa y compara SQL + resultados contra un golden.
+#
+#   python -m bench.e2e                                  # stub LLM local (latencia 200 ms)
+#   python -m bench.e2e --record --cassette c.jsonl      # graba respuestas (stub o --live)
+#   python -m bench.e2e --replay --cassette c.jsonl      # reproduce sin red ni servidor
+#   python -m bench.e2e --update-golden                  # regraba bench/golden_e2e.json
+# Los datos y el corpus son relativos a la fecha ancla (hoy): el golden sirve cualquier día.
+# Los cassettes, en cambio, incluyen fechas absolutas (resumen): grabar y reproducir el mismo día.
+import os, sys, json, time, hashlib, argparse, logging, warnings
+from datetime import date
+import pandas as pd
+
+MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+         "septiembre", "octubre", "noviembre", "diciembre"]
+
+def load_corpus(path: str, anchor: date) -> list[dict]:
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            # meses relativos al ancla: el corpus no envejece
+            item["q"] = item["q"].format(mes_nombre=MESES[anchor.month - 1], anio=anchor.year)
+            item.setdefault("mes", anchor.month)
+            item.setdefault("anio", anchor.year)
+            out.append(item)
+    return out
+
+def fingerprint(df: pd.DataFrame | None, anchor: date) -> str | None:
+    # fechas como desfase en días respecto al ancla: el golden no cambia de un día a otro
+    if df is None:
+        return None
+    t = df.copy()
+    for c in t.columns:
+        if pd.api.types.is_datetime64_any_dtype(t[c]):
+            t[c] = (t[c] - pd.Timestamp(anchor)).dt.days
+    return hashlib.sha1(t.to_csv(index=False).encode("utf-8")).hexdigest()[:16]
+
+def _pct(vals: list[float], p: float) -> float:
+    if not vals:
+        return 0.0
+    s = sorted(vals)
+    return s[min(len(s) - 1, int(round(p * (len(s) - 1))))]
+
+def run(args) -> int:
+    from bench.synthetic import make_data
+    from bench import mock_llm_server
+
+    if args.replay:
+        os.environ["FENIX_LLM_REPLAY"] = "replay"
+        os.environ["FENIX_LLM_CASSETTE"] = args.cassette
+    else:
+        if args.record:
+            os.environ["FENIX_LLM_REPLAY"] = "record"
+            os.environ["FENIX_LLM_CASSETTE"] = args.cassette
+        if not args.live:
+            _, base_url = mock_llm_server.start(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                                fail_rate=args.fail_rate)
+            os.environ["OPENAI_BASE_URL"] = base_url
+            os.environ["OPENAI_API_KEY"] = "mock"
+
+    from utils.router import answer_question, summarize_result
+    from utils.llm import llm_debug_info
+
+    anchor = date.fromisoformat(args.anchor) if args.anchor else date.today()
+    semantic_text = open("semantic.yaml", "r", encoding="utf-8").read()
+    t0 = time.perf_counter()
+    data = make_data(args.rows, args.seed, anchor)
+    load_s = time.perf_counter() - t0
+    corpus = load_corpus(args.corpus, anchor)
+
+    results, stage_times = [], {}
+    for item in corpus:
+        q = item["q"]
+        t1 = time.perf_counter()
+        ans = answer_question(data, q, item["mes"], item["anio"], semantic_text)
+        summary = None
+        if any(kind == "summary" for kind, _ in ans["events"]):
+            summary = summarize_result(ans["df"], q, ans["timings"], full=ans["full"])
+        total = time.perf_counter() - t1
+        for stage, secs in ans["timings"].items():
+            stage_times.setdefault(stage, []).append(secs)
+        stage_times.setdefault("total", []).append(total)
+        df = ans["df"]
+        results.append({
+            "q": q,
+            "path": ans["path"],
+            "sql": ans["sql"],
+            "rows": None if df is None else int(len(df)),
+            "fingerprint": fingerprint(df, anchor),
+            "summary": bool(summary),
+            "timings_ms": {k: round(v * 1000, 1) for k, v in ans["timings"].items()},
+            "total_ms": round(total * 1000, 1),
+        })
+
+    # ---- reporte de latencias
+    print(f"\nDatos sintéticos: {args.rows} filas (semilla {args.seed}, ancla {anchor}) en {load_s*1000:.0f} ms")
+    print(f"{'etapa':<16}{'n':>4}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for stage, vals in sorted(stage_times.items(), key=lambda kv: -sum(kv[1])):
+        print(f"{stage:<16}{len(vals):>4}{_pct(vals, .5)*1000:>10.1f}{_pct(vals, .95)*1000:>10.1f}{max(vals)*1000:>10.1f}")
+    print("\n" + llm_debug_info())
+
+    report = {"rows": args.rows, "seed": args.seed, "anchor": str(anchor), "results": results,
+              "stages": {k: {"p50_ms": round(_pct(v, .5) * 1000, 1), "p95_ms": round(_pct(v, .95) * 1000, 1)}
+                         for k, v in stage_times.items()}}
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    # ---- estabilidad: SQL generada + resultados vs golden
+    stable_keys = ("path", "sql", "rows", "fingerprint")
+    current = {r["q"]: {k: r[k] for k in stable_keys} for r in results}
+    golden_key = f"{args.rows}:{args.seed}"
+    golden = {}
+    if os.path.exists(args.golden):
+        with open(args.golden, "r", encoding="utf-8") as f:
+            golden = json.load(f)
+    if args.update_golden or golden_key not in golden:
+        golden[golden_key] = current
+        with open(args.golden, "w", encoding="utf-8") as f:
+            json.dump(golden, f, ensure_ascii=False, indent=2)
+        print(f"\nGolden actualizado: {args.golden} [{golden_key}]")
+        return 0
+    diffs = []
+    for q, cur in current.items():
+        exp = golden[golden_key].get(q)
+        if exp is None:
+            diffs.append((q, "nueva pregunta (sin golden)"))
+        elif exp != cur:
+            changed = [k for k in stable_keys if exp.get(k) != cur.get(k)]
+            diffs.append((q, f"cambió {', '.join(changed)}"))
+    if diffs:
+        print(f"\n✗ {len(diffs)} preguntas difieren del golden:")
+        for q, why in diffs:
+            print(f"  - {q}: {why}")
+        return 1
+    print(f"\n✓ {len(current)} preguntas estables vs golden [{golden_key}]")
+    return 0
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark end-to-end offline del pipeline de preguntas")
+    ap.add_argument("--rows", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--anchor", default=None, help="fecha ancla YYYY-MM-DD de los datos (hoy por defecto)")
+    ap.add_argument("--corpus", default="bench/corpus.jsonl")
+    ap.add_argument("--golden", default="bench/golden_e2e.json")
+    ap.add_argument("--report", default="bench/out/e2e_report.json")
+    ap.add_argument("--cassette", default="bench/cassettes/llm.jsonl")
+    ap.add_argument("--latency-ms", type=float, default=200.0)
+    ap.add_argument("--jitter-ms", type=float, default=50.0)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    g = ap.add_mutually_exclusive_group()
+    g.add_argument("--record", action="store_true", help="graba respuestas LLM en el cassette")
+    g.add_argument("--replay", action="store_true", help="reproduce respuestas LLM desde el cassette")
+    ap.add_argument("--live", action="store_true", help="usa el proveedor real (OPENAI_API_KEY) en vez del stub")
+    ap.add_argument("--update-golden", action="store_true")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    warnings.simplefilter("ignore")
+    return run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# bench/freeform.py — parser libre: tiempo de parseo y exactitud por slot (actual vs. anterior)
+# El parser anterior (búsquedas regex sucesivas) se conserva aquí solo como referencia de comparación.
+#
+#   python -m bench.freeform                 # corpus bench/freeform_corpus.jsonl, 2000 repeticiones
+#   python -m bench.freeform --verbose       # lista los slots que cada parser falla
+import re, sys, json, time, argparse
+import pandas as pd
+
+from utils.skills import _parse_freeform, _norm_text, SPANISH_MONTHS, _DATE_RE
+
+SLOTS = ["date_focus", "entregado", "facturado", "mes", "anio", "start", "end", "prox_dias", "ult_dias",
+         "cliente", "marca", "patente", "tipo_cliente", "sucursal", "estado_servicio"]
+
+def legacy_parse_freeform(question: str):
+    s = _norm_text(question)
+    date_focus = None
+    if "factur" in s:     date_focus = "FECHA_FACTURACION"
+    if "entreg" in s:     date_focus = "FECHA_ENTREGA"
+    if "recep"  in s:     date_focus = "FECHA_RECEPCION"
+    if "pago"   in s:     date_focus = "FECHA_PAGO_FACTURA"
+    entregado = None
+    if "entreg" in s:                      entregado = True
+    if "en taller" in s or "no entreg" in s: entregado = False
+    facturado = None
+    if "sin factura" in s or "no factur" in s or "pendiente de factur" in s: facturado = False
+    if re.search(r"\bfacturad", s) and "no factur" not in s and "sin factura" not in s: facturado = True
+    mes, anio = None, None
+    for name, num in SPANISH_MONTHS.items():
+        if re.search(rf"\b{name}\b", s): mes = num; break
+    m = re.search(r"\b(20\d{2}|19\d{2})\b", s)
+    if m: anio = int(m.group(1))
+    d1 = re.search(r"desde\s+" + _DATE_RE, s)
+    d2 = re.search(r"hasta\s+" + _DATE_RE, s)
+    start = pd.to_datetime(d1.group(1), dayfirst=True, errors="coerce") if d1 else None
+    end   = pd.to_datetime(d2.group(1), dayfirst=True, errors="coerce") if d2 else None
+    d12 = re.search(r"del\s+" + _DATE_RE + r"\s+al\s+" + _DATE_RE, s)
+    if d12:
+        start = pd.to_datetime(d12.group(1), dayfirst=True, errors="coerce")
+        end   = pd.to_datetime(d12.group(2), dayfirst=True, errors="coerce")
+    prox_dias = None
+    m = re.search(r"proxim[oa]s?\s+(\d+)\s+d[ií]as", s)
+    if m: prox_dias = int(m.group(1))
+    ult_dias = None
+    m = re.search(r"[uú]ltim[oa]s?\s+(\d+)\s+d[ií]as", s)
+    if m: ult_dias = int(m.group(1))
+    def pick(pattern):
+        m = re.search(pattern, s)
+        return m.group(1).strip() if m else None
+    return {
+        "date_focus": date_focus, "entregado": entregado, "facturado": facturado,
+        "mes": mes, "anio": anio, "start": start, "end": end,
+        "prox_dias": prox_dias, "ult_dias": ult_dias,
+        "cliente": pick(r"cliente\s+([a-z0-9\-\. ]+)"),
+        "marca": pick(r"marca\s+([a-z0-9\-\. ]+)"),
+        "patente": pick(r"patente\s+([a-z0-9\-]+)"),
+        "tipo_cliente": pick(r"tipo (?:de )?cliente\s+([a-z0-9\-\. ]+)"),
+        "sucursal": pick(r"(?:sucursal|sede)\s+([a-z0-9\-\. ]+)"),
+        "estado_servicio": pick(r"estado (?:servicio|del servicio)\s+([a-z0-9\-\. ]+)"),
+    }
+
+def _comparable(slot: str, v):
+    if v is None or (isinstance(v, float) and pd.isna(v)) or v is pd.NaT:
+        return None
+    if slot in ("start", "end"):
+        return pd.Timestamp(v).date().isoformat()
+    return v
+
+def score(parser, corpus: list[dict]) -> tuple[int, int, list[tuple[str, str, object, object]]]:
+    ok, misses = 0, []
+    for item in corpus:
+        got = parser(item["q"])
+        for slot in SLOTS:
+            exp, val = item["expect"].get(slot), _comparable(slot, got.get(slot))
+            if exp == val:
+                ok += 1
+            else:
+                misses.append((item["q"], slot, exp, val))
+    return ok, ok + len(misses), misses
+
+def timeit(parser, questions: list[str], repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for q in questions:
+            parser(q)
+    return (time.perf_counter() - t0) / (repeat * len(questions))
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark del parser libre (tiempo + exactitud por slot)")
+    ap.add_argument("--corpus", default="bench/freeform_corpus.jsonl")
+    ap.add_argument("--repeat", type=int, default=2000)
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args(argv)
+
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    questions = [c["q"] for c in corpus]
+
+    print(f"{len(corpus)} preguntas × {len(SLOTS)} slots, {args.repeat} repeticiones")
+    print(f"{'parser':<10}{'µs/pregunta':>14}{'slots ok':>12}{'exactitud':>12}")
+    rows = {}
+    for name, parser in (("anterior", legacy_parse_freeform), ("actual", _parse_freeform)):
+        us = timeit(parser, questions, args.repeat) * 1e6
+        ok, total, misses = score(parser, corpus)
+        rows[name] = misses
+        print(f"{name:<10}{us:>14.1f}{f'{ok}/{total}':>12}{ok / total:>12.1%}")
+    if args.verbose:
+        for name, misses in rows.items():
+            print(f"\n{name}: {len(misses)} slots distintos del esperado")
+            for q, slot, exp, val in misses:
+                print(f"  - {q!r} [{slot}] esperado={exp!r} obtenido={val!r}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
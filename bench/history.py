@@ -0,0 +1,127 @@
+# bench/history.py — historial de snapshots (utils.history): espacio en disco, exactitud y costo por ventana
+# Simula --days días de la planilla: cada día una fracción --churn de los vehículos en taller se entrega, entran
+# vehículos nuevos y salen algunos entregados. Registra un snapshot por día en una carpeta temporal y compara:
+#   - espacio del historial vs. guardar cada snapshot completo
+#   - history_trend("en_taller") vs. el conteo real de cada día y history_asof vs. MB base del día
+#   - tiempo de history_trend para ventanas de 7/30/90 días (debe crecer con la ventana, no con el historial)
+#
+#   python -m bench.history                        # 20k filas, 120 días, 1 % diario
+#   python -m bench.history --rows 200000 --days 365 --json bench/out/history.json
+import os, sys, json, time, shutil, argparse, logging, tempfile, warnings
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+def _best(fn, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def _next_day(raw: pd.DataFrame, cols: dict, rng, churn: float, day: pd.Timestamp, next_ot: int):
+    raw = raw.copy()
+    estado = raw[cols["estado_servicio"]]
+    taller = np.flatnonzero(~estado.str.upper().str.contains("ENTREG").to_numpy())
+    k = max(1, int(churn * len(raw)))
+    done = rng.choice(taller, min(k, len(taller)), replace=False)
+    raw.iloc[done, raw.columns.get_loc(cols["estado_servicio"])] = "ENTREGADO"
+    raw.iloc[done, raw.columns.get_loc(cols["fecha_entrega"])] = day.strftime("%d/%m/%Y")
+    entregados = np.setdiff1d(np.flatnonzero(~np.isin(np.arange(len(raw)), taller)), done)
+    gone = rng.choice(entregados, min(k // 4, len(entregados)), replace=False)
+    new = raw.iloc[rng.choice(len(raw), k, replace=False)].copy()
+    new[cols["ot"]] = [str(next_ot + i) for i in range(k)]
+    new[cols["estado_servicio"]] = "EN REPARACIÓN"
+    new[cols["fecha_recepcion"]] = day.strftime("%d/%m/%Y")
+    new[cols["fecha_entrega"]] = ""
+    raw = pd.concat([raw.drop(raw.index[gone]), new], ignore_index=True)
+    return raw, next_ot + k
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Historial de snapshots: espacio, exactitud y costo por ventana")
+    ap.add_argument("--rows", type=int, default=20_000)
+    ap.add_argument("--days", type=int, default=120)
+    ap.add_argument("--churn", type=float, default=0.01, help="fracción de filas que cambia por día")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--keep", help="carpeta del historial (por defecto temporal, se borra al terminar)")
+    ap.add_argument("--json", help="guardar resultados en este archivo")
+    args = ap.parse_args(argv)
+    warnings.simplefilter("ignore")
+    logging.getLogger("fenix.columns").setLevel(logging.ERROR)
+
+    from bench.synthetic import make_modelo_bot
+    from utils.snapshot import stamp_snapshot
+    from utils.skills import mb_base, mb_plan
+    from utils import history
+
+    root = args.keep or tempfile.mkdtemp(prefix="fenix-history-")
+    rng = np.random.default_rng(args.seed)
+    first = pd.Timestamp.today().normalize() - timedelta(days=args.days - 1)
+    raw = make_modelo_bot(args.rows, seed=args.seed, anchor=first.date())
+    cols = mb_plan(raw)["cols"]
+    next_ot = 900_000
+    truth, checks, record_s, full_bytes = {}, {}, 0.0, 0
+    check_days = {first + timedelta(days=d) for d in (0, args.days // 3, args.days - 1)}
+    for d in range(args.days):
+        day = first + timedelta(days=d)
+        if d:
+            raw, next_ot = _next_day(raw, cols, rng, args.churn, day, next_ot)
+        stamp_snapshot({"MODELO_BOT": raw}, loaded_at=(day + timedelta(hours=18)).to_pydatetime())
+        MB = mb_base(raw)
+        truth[day.date()] = (int((~MB["entregado_bool"]).sum()), float(MB.loc[~MB["entregado_bool"], "MONTO_NETO"].sum()))
+        if day in check_days:
+            checks[day.date()] = MB
+        t0 = time.perf_counter()
+        st = history.record_snapshot({"MODELO_BOT": raw}, root=root)
+        record_s += time.perf_counter() - t0
+        if d == 0:
+            full_bytes = st["bytes"]
+    stored = sum(os.path.getsize(os.path.join(dp, f)) for dp, _, fs in os.walk(root) for f in fs if f.endswith(".parquet"))
+    print(f"{args.rows} filas · {args.days} días · {args.churn:.1%} diario → historial {stored / 2**20:.1f} MB "
+          f"vs {full_bytes * args.days / 2**20:.1f} MB con snapshots completos · registrar {record_s / args.days * 1000:.0f} ms/día")
+
+    last = first + timedelta(days=args.days - 1)
+    trend = history.history_trend(first, last, root=root)
+    got = {r.fecha.date() if hasattr(r.fecha, "date") else r.fecha: (int(r.vehiculos), float(r.monto_neto))
+           for r in trend.itertuples()}
+    ok_trend = len(got) == len(truth) and all(got[k][0] == v[0] and abs(got[k][1] - v[1]) < 1e-3 * max(1, v[1])
+                                               for k, v in truth.items())
+    ok_asof = True
+    for day, MB in checks.items():
+        H = history.history_asof(day, root=root).drop(columns=["_key", "snapshot_ts", "snapshot_version"])
+        E = MB[[c for c in H.columns]]
+        key = ["OT", "PATENTE"]
+        a = H.sort_values(key).reset_index(drop=True)
+        b = E.sort_values(key).reset_index(drop=True)
+        try:
+            pd.testing.assert_frame_equal(a, b, check_dtype=False)
+        except AssertionError as e:
+            ok_asof = False
+            print(f"  ✗ estado al {day} difiere: {str(e).splitlines()[0]}")
+    print(f"tendencia en_taller {'✓' if ok_trend else '✗ DIFIERE'} · estado a una fecha {'✓' if ok_asof else '✗ DIFIERE'}")
+
+    rows = []
+    print(f"{'ventana':>9}{'ms':>9}{'fechas':>8}")
+    for w in (7, 30, 90):
+        if w > args.days:
+            continue
+        secs, t = _best(lambda: history.history_trend(last - timedelta(days=w - 1), last, root=root), args.repeat)
+        rows.append({"dias": w, "ms": round(secs * 1000, 1), "fechas": int(len(t))})
+        print(f"{w:>9}{secs * 1000:>9.1f}{len(t):>8}")
+    secs, _ = _best(lambda: history.history_asof(last, root=root), args.repeat)
+    print(f"{'estado':>9}{secs * 1000:>9.1f}")
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"rows": args.rows, "days": args.days, "churn": args.churn, "stored_bytes": stored,
+                       "full_bytes": full_bytes * args.days, "record_ms_dia": round(record_s / args.days * 1000, 1),
+                       "tendencia_ok": ok_trend, "estado_ok": ok_asof, "ventanas": rows,
+                       "estado_ms": round(secs * 1000, 1)}, f, ensure_ascii=False, indent=2)
+    if not args.keep:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0 if ok_trend and ok_asof else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
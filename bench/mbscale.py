@@ -0,0 +1,63 @@
+# bench/mbscale.py — escala de _build_mb por núcleos: en serie vs bloques de filas en procesos
+# MODELO_BOT sintético "sucio" (como bench.perf). Para cada cantidad de procesos mide el mejor de
+# --repeat (con el pool ya levantado; el arranque del pool se informa aparte), el speedup contra la
+# construcción en serie y verifica que el resultado sea idéntico al serial (assert_frame_equal).
+#
+#   python -m bench.mbscale                              # 1M filas, 1/2/4/8 procesos
+#   python -m bench.mbscale --rows 200000 --workers 1 2 4 --json bench/out/mbscale.json
+# Con menos núcleos que procesos el speedup se aplana (o empeora): el resultado depende de la máquina.
+import os, sys, json, time, argparse, logging, platform, warnings
+import pandas as pd
+
+def _best(fn, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Escala de la construcción de MB por núcleos")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", help="guardar resultados en este archivo")
+    args = ap.parse_args(argv)
+    warnings.simplefilter("ignore")
+    logging.getLogger("fenix.columns").setLevel(logging.ERROR)
+
+    from bench.synthetic import make_data
+    from utils.skills import _build_mb, _mb_pool, mb_workers
+    raw = make_data(args.rows, seed=args.seed, messy=True)["MODELO_BOT"]
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(f"{args.rows} filas · {cpus} núcleos disponibles")
+
+    serial_s, ref = _best(lambda: _build_mb(raw, workers=1), args.repeat)
+    rows = [{"workers": 1, "s": round(serial_s, 3), "speedup": 1.0, "identico": True}]
+    print(f"{'procesos':>9}{'s':>9}{'speedup':>9}  idéntico")
+    print(f"{1:>9}{serial_s:>9.2f}{1.0:>9.2f}  ✓")
+    for w in sorted(set(args.workers) - {1}):
+        t0 = time.perf_counter()
+        list(_mb_pool(w).map(mb_workers, [0] * w))  # levanta los procesos fuera de la medición
+        startup = time.perf_counter() - t0
+        secs, mb = _best(lambda: _build_mb(raw, workers=w), args.repeat)
+        try:
+            pd.testing.assert_frame_equal(ref, mb)
+            same = True
+        except AssertionError:
+            same = False
+        rows.append({"workers": w, "s": round(secs, 3), "speedup": round(serial_s / secs, 2),
+                     "identico": same, "arranque_pool_s": round(startup, 3)})
+        print(f"{w:>9}{secs:>9.2f}{serial_s / secs:>9.2f}  {'✓' if same else '✗ DIFIERE'}"
+              f"   (arranque del pool {startup:.2f} s)")
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"rows": args.rows, "cpus": cpus, "machine": f"{platform.machine()} · py{platform.python_version()}",
+                       "pandas": pd.__version__, "resultados": rows}, f, ensure_ascii=False, indent=2)
+    return 0 if all(r["identico"] for r in rows) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# bench/mock_llm_server.py — stub local compatible con /v1/chat/completions (OpenAI) con latencia configurable
+# Respuestas deterministas por reglas, suficientes para ejercitar el pipeline de app.py sin red:
+#   - tools=resolve_question   → tool call con la métrica del catálogo
+#   - response_format json     → QuerySpec armado con el parser libre
+#   - prompt de nl2sql         → SQL DuckDB por plantillas
+#   - resto (resumen)          → texto breve
+# Uso: python -m bench.mock_llm_server --port 8765 --latency-ms 300 --jitter-ms 100
+#      OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock streamlit run app.py
+import json, re, time, random, threading, unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _norm(s: str) -> str:
+    s = unicodedata.normalize("NFKD", str(s or ""))
+    return "".join(c for c in s if not unicodedata.category(c).startswith("M")).lower()
+
+def _question(messages: list[dict]) -> str:
+    user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    for marker in ("Ahora devuelve la SQL para:", "Pregunta del usuario:", "Pregunta:"):
+        if marker in user:
+            return user.rsplit(marker, 1)[1].strip().strip('"')
+    return user.strip()
+
+def _metric_for(q: str) -> str:
+    s = _norm(q)
+    if "aprob" in s:
+        return "sin_aprobacion"
+    if "proxim" in s and "entreg" in s:
+        return "entregas_proximas_sin_factura"
+    if "tipo de cliente" in s or "tipo cliente" in s:
+        return "facturacion_mensual_tipo_cliente"
+    if "taller" in s:
+        return "en_taller"
+    if "entreg" in s and ("sin factura" in s or "no factur" in s or "aun no" in s or "sin factur" in s):
+        return "entregados_sin_factura"
+    if "entreg" in s and "factur" in s:
+        return "entregados_facturados"
+    return ""  # sin métrica → Auto-SQL
+
+_SQL = {
+    "entregados_sin_factura": "SELECT DISTINCT COALESCE(MB.patente, MB.ot) AS id, MB.cliente, MB.fecha_entrega, MB.dias_desde_entrega FROM MB WHERE MB.entregado_bool = TRUE AND MB.no_facturado_bool = TRUE ORDER BY MB.fecha_entrega DESC, id LIMIT 200",
+    "entregados_facturados": "SELECT COALESCE(MB.patente, MB.ot) AS id, MB.cliente, MB.factura_num, MB.factura_fecha, MB.monto FROM MB WHERE MB.entregado_bool = TRUE AND MB.no_facturado_bool = FALSE ORDER BY MB.factura_fecha DESC, id LIMIT 200",
+    "en_taller": "SELECT COALESCE(MB.patente, MB.ot) AS id, MB.cliente, MB.fecha_recepcion, MB.dias_en_taller FROM MB WHERE MB.entregado_bool = FALSE ORDER BY MB.dias_en_taller DESC, id LIMIT 200",
+    "facturacion_mensual_tipo_cliente": "SELECT MB.tipo_cliente, SUM(MB.monto) AS monto FROM MB WHERE EXTRACT(month FROM MB.fecha_op) = MES_SELECCIONADO AND EXTRACT(year FROM MB.fecha_op) = ANIO_SELECCIONADO GROUP BY MB.tipo_cliente ORDER BY monto DESC LIMIT 200",
+    "cuantos": "SELECT COUNT(*) AS cantidad FROM MB WHERE MB.entregado_bool = TRUE",
+    "cliente": "SELECT COALESCE(MB.patente, MB.ot) AS id, MB.cliente, MB.fecha_entrega, MB.monto FROM MB WHERE LOWER(MB.cliente) LIKE '%{term}%' ORDER BY MB.fecha_entrega DESC NULLS LAST, id LIMIT 200",
+}
+
+def _sql_for(q: str) -> str:
+    s = _norm(q)
+    m = re.search(r"cliente\s+([a-z0-9 ]+)", s)
+    if m:
+        return _SQL["cliente"].replace("{term}", m.group(1).strip().replace("'", ""))
+    if s.startswith("cuant"):
+        return _SQL["cuantos"]
+    return _SQL.get(_metric_for(q), _SQL["entregados_sin_factura"])
+
+def _queryspec_for(q: str) -> dict:
+    from utils.skills import _parse_freeform
+    f = _parse_freeform(q)
+    return {
+        "delivered": f["entregado"], "invoiced": f["facturado"],
+        "date_field": f["date_focus"] or "fecha_op",
+        "date_range": {"proximos_dias": f["prox_dias"], "ultimos_dias": f["ult_dias"]},
+        "filters": {"cliente_contains": f["cliente"], "patente_contains": f["patente"]},
+        "group_by": "tipo_cliente" if "tipo de cliente" in _norm(q) else "ninguno",
+        "metrics": "conteo" if _norm(q).startswith("cuant") else "lista",
+    }
+
+def respond(body: dict) -> dict:
+    """Arma la respuesta chat.completion para el cuerpo recibido."""
+    messages = body.get("messages") or []
+    q = _question(messages)
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    message: dict = {"role": "assistant", "content": None}
+    finish = "stop"
+    if body.get("tools"):
+        args = {"metric": _metric_for(q), "filters": {}}
+        message["tool_calls"] = [{"id": "call_mock", "type": "function",
+                                  "function": {"name": "resolve_question", "arguments": json.dumps(args)}}]
+        finish = "tool_calls"
+    elif (body.get("response_format") or {}).get("type") == "json_object":
+        message["content"] = json.dumps(_queryspec_for(q), ensure_ascii=False)
+    elif "SQL" in system:
+        message["content"] = _sql_for(q)
+    else:
+        message["content"] = f"Resumen (mock): resultado para «{q[:80]}»."
+    prompt_chars = sum(len(str(m.get("content") or "")) for m in messages)
+    completion_chars = len(message.get("content") or json.dumps(message.get("tool_calls") or ""))
+    return {
+        "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish}],
+        "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": completion_chars // 4,
+                  "total_tokens": (prompt_chars + completion_chars) // 4},
+    }
+
+def make_handler(latency_ms: float = 0.0, jitter_ms: float = 0.0, fail_rate: float = 0.0, seed: int = 0):
+    rnd = random.Random(seed)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *a):  # silencioso
+            pass
+
+        def _send(self, code: int, payload: dict):
+            raw = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with lock:
+                delay = max(0.0, latency_ms + rnd.uniform(-jitter_ms, jitter_ms)) / 1000.0
+                fail = rnd.random() < fail_rate
+            time.sleep(delay)
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": f"ruta no soportada: {self.path}"}})
+            if fail:
+                return self._send(503, {"error": {"message": "mock: falla inyectada", "type": "server_error"}})
+            self._send(200, respond(body))
+
+    return Handler
+
+def start(port: int = 0, latency_ms: float = 0.0, jitter_ms: float = 0.0, fail_rate: float = 0.0):
+    """Levanta el stub en un hilo daemon. Devuelve (server, base_url)."""
+    srv = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency_ms, jitter_ms, fail_rate))
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Stub local compatible con OpenAI chat.completions")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    a = ap.parse_args()
+    srv = ThreadingHTTPServer(("127.0.0.1", a.port), make_handler(a.latency_ms, a.jitter_ms, a.fail_rate))
+    print(f"mock LLM en http://127.0.0.1:{a.port}/v1 (latencia {a.latency_ms}±{a.jitter_ms} ms)")
+    srv.serve_forever()
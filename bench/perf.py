@@ -0,0 +1,153 @@
+# bench/perf.py — escalamiento por tamaño de hoja: tiempo y memoria pico por función
+# MODELO_BOT sintético "sucio" (fechas en formatos mezclados, montos CLP con/sin "$", SI/NO variables)
+# de 1k a 1M filas. Mide _build_mb, las seis skills, el parser libre, execute_queryspec, el prelude +
+# run_duckdb de Auto-SQL y el formateo de tablas; compara contra una línea base guardada y falla si
+# una métrica empeora más que el umbral.
+#
+#   python -m bench.perf                                   # 1k, 10k, 100k vs bench/perf_baseline.json
+#   python -m bench.perf --sizes 1000 10000 100000 1000000
+#   python -m bench.perf --update-baseline                 # regraba la línea base (misma máquina)
+#   python -m bench.perf --only build_mb skill_            # filtra funciones por prefijo
+# Los tiempos dependen de la máquina: la línea base se compara en la máquina donde se grabó.
+import os, sys, json, time, argparse, logging, platform, tracemalloc, warnings
+from datetime import date
+import pandas as pd
+
+BASELINE = "bench/perf_baseline.json"
+SPEC = {  # QuerySpec típico de "lista": entregados sin factura de un cliente, últimos 90 días
+    "delivered": True, "invoiced": False, "filters": {"cliente": "inmobiliaria"},
+    "date_field": "FECHA_ENTREGA",
+    "date_range": {"start": None, "end": None, "proximos_dias": None, "ultimos_dias": 90},
+    "metrics": "lista", "group_by": "ninguno",
+}
+FREEFORM_Q = "entregados sin factura de toyota en los últimos 90 días"
+SQL = ("SELECT tipo_cliente, COUNT(*) AS n, SUM(monto) AS neto FROM MB "
+       "WHERE entregado_bool AND no_facturado_bool GROUP BY 1 ORDER BY 3 DESC")
+
+def _cases(data: dict, anchor: date) -> dict:
+    """nombre → función sin argumentos. Las skills usan MB ya cacheado (_build_mb se mide aparte)."""
+    from utils.skills import (
+        _build_mb, mb_for, skill_entregados_sin_factura, skill_entregados_facturados, skill_top_en_taller,
+        skill_facturacion_por_mes_tipo, skill_entregas_proximos_dias_sin_factura, skill_sin_aprobacion,
+        skill_consulta_vehiculos_freeform,
+    )
+    from utils.intent import execute_queryspec
+    from utils.schema import build_duckdb_prelude_and_schema
+    from utils.llm import run_duckdb
+    from utils.formatters import display_frame, format_df
+
+    raw = data["MODELO_BOT"]
+    MB = mb_for(raw)
+    listado = skill_entregados_sin_factura(raw, limit=None)[0]
+
+    def duckdb_route():
+        prelude, _ = build_duckdb_prelude_and_schema(data)
+        return run_duckdb(SQL, data, prelude_sql=prelude)
+
+    return {
+        "build_mb": lambda: _build_mb(raw, workers=1),  # en serie: la escala por núcleos la mide bench.mbscale
+        "skill_entregados_sin_factura": lambda: skill_entregados_sin_factura(raw),
+        "skill_entregados_facturados": lambda: skill_entregados_facturados(raw),
+        "skill_top_en_taller": lambda: skill_top_en_taller(raw, topn=10),
+        "skill_facturacion_por_mes_tipo": lambda: skill_facturacion_por_mes_tipo(raw, anchor.month, anchor.year),
+        "skill_entregas_proximos_dias": lambda: skill_entregas_proximos_dias_sin_factura(raw, 7),
+        "skill_sin_aprobacion": lambda: skill_sin_aprobacion(raw),
+        "freeform": lambda: skill_consulta_vehiculos_freeform(raw, FREEFORM_Q),
+        "execute_queryspec": lambda: execute_queryspec(MB, SPEC),
+        "duckdb_prelude_run": duckdb_route,
+        "format_table": lambda: (display_frame(listado), format_df(listado)),
+    }
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def _peak(fn) -> float:
+    # asignaciones de Python/numpy/pandas; la memoria interna de DuckDB (C++) no la ve tracemalloc
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def measure(sizes, repeat: int, seed: int, only=None) -> dict:
+    from bench.synthetic import make_data
+    anchor = date.today()
+    metrics = {}
+    print(f"{'función':<32}{'filas':>9}{'ms':>10}{'pico MB':>10}")
+    for n in sizes:
+        t0 = time.perf_counter()
+        data = make_data(n, seed=seed, anchor=anchor, messy=True)
+        cases = _cases(data, anchor)  # incluye MB cacheado y snapshot_version calculados
+        print(f"-- {n} filas (datos + MB en {time.perf_counter() - t0:.1f} s)")
+        for name, fn in cases.items():
+            if only and not any(name.startswith(p) for p in only):
+                continue
+            fn()  # calentamiento (imports, índices perezosos)
+            secs = _time(fn, repeat if n < 1_000_000 else 1)
+            peak = _peak(fn) / 2**20
+            metrics[f"{name}@{n}"] = {"ms": round(secs * 1000, 2), "peak_mb": round(peak, 2)}
+            print(f"{name:<32}{n:>9}{secs * 1000:>10.1f}{peak:>10.1f}")
+    return metrics
+
+def compare(metrics: dict, baseline: dict, threshold: float, mem_threshold: float,
+            min_ms: float, min_mb: float) -> list[str]:
+    """Regresiones: métrica > base·(1+umbral) y además peor por más que el ruido mínimo absoluto."""
+    out = []
+    for key, cur in metrics.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if cur["ms"] > base["ms"] * (1 + threshold) and cur["ms"] - base["ms"] > min_ms:
+            out.append(f"{key}: {base['ms']:.1f} → {cur['ms']:.1f} ms")
+        if cur["peak_mb"] > base["peak_mb"] * (1 + mem_threshold) and cur["peak_mb"] - base["peak_mb"] > min_mb:
+            out.append(f"{key}: pico {base['peak_mb']:.1f} → {cur['peak_mb']:.1f} MB")
+    return out
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark de escalamiento (tiempo y memoria pico)")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--only", nargs="+", help="prefijos de función a medir")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--update-baseline", action="store_true")
+    # el tiempo es ruidoso en máquinas compartidas (mejor de --repeat); la memoria pico es casi determinista
+    ap.add_argument("--threshold", type=float, default=0.50, help="empeoramiento de tiempo tolerado (0.50 = 50%%)")
+    ap.add_argument("--mem-threshold", type=float, default=0.20, help="empeoramiento de memoria pico tolerado")
+    ap.add_argument("--min-ms", type=float, default=5.0, help="diferencia mínima en ms para contar como regresión")
+    ap.add_argument("--min-mb", type=float, default=1.0, help="diferencia mínima en MB para contar como regresión")
+    args = ap.parse_args(argv)
+    warnings.simplefilter("ignore")
+    logging.getLogger("fenix.columns").setLevel(logging.ERROR)
+
+    metrics = measure(args.sizes, args.repeat, args.seed, args.only)
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    if args.update_baseline or not stored:
+        stored = {"machine": f"{platform.machine()} · {os.cpu_count()} cpu · py{platform.python_version()}",
+                  "pandas": pd.__version__, "metrics": {**stored.get("metrics", {}), **metrics}}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(stored, f, ensure_ascii=False, indent=2)
+        print(f"\nLínea base actualizada: {args.baseline}")
+        return 0
+    regressions = compare(metrics, stored.get("metrics", {}), args.threshold, args.mem_threshold,
+                          args.min_ms, args.min_mb)
+    if regressions:
+        print(f"\n✗ {len(regressions)} regresiones (tiempo > {args.threshold:.0%}, memoria > "
+              f"{args.mem_threshold:.0%} vs {args.baseline}):")
+        for r in regressions:
+            print(f"  - {r}")
+        return 1
+    print(f"\n✓ sin regresiones vs {args.baseline} (tiempo {args.threshold:.0%}, memoria {args.mem_threshold:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# bench/render.py — costo de preparar una tabla para st.dataframe (300 y 10k filas)
+# "anterior": _fmt_df de app.py (copia + map celda a celda con strptime) de todas las filas; "actual": lo que
+# hace _show en app.py: pager sobre el resultado y display_frame de la página visible (PAGE_ROWS filas, montos a
+# texto vectorizado) + Arrow. También mide el formateo a texto vectorizado de todo el frame (markdown/exportes).
+#
+#   python -m bench.render                  # 300 y 10000 filas
+#   python -m bench.render --rows 300 50000
+import sys, time, argparse, warnings
+from datetime import datetime
+import pandas as pd
+
+from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes
+
+from bench.synthetic import make_data
+from utils.skills import mb_for
+from utils.formatters import display_frame, format_df
+from utils.paging import make_pager
+
+COLS = ["id", "NOMBRE_CLIENTE", "PATENTE", "MARCA", "FECHA_RECEPCION", "FECHA_ENTREGA", "NUMERO_FACTURA",
+        "FECHA_FACTURACION", "MONTO_NETO", "NUMERO_DIAS_EN_PLANTA", "ESTADO_SERVICIO", "FACTURADO_FLAG"]
+
+# ---- referencia: formateadores y _fmt_df anteriores (tal como estaban)
+def legacy_format_currency_clp(x):
+    if x is None: return ""
+    try:
+        v = float(str(x).replace(".", "").replace(",", "."))
+    except:
+        return str(x)
+    return f"$ {int(round(v)):n}".replace(",", ".")
+
+def legacy_format_date_ddmmyyyy(x):
+    if not x: return ""
+    s = str(x)
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%m/%d/%Y"):
+        try:
+            return datetime.strptime(s, fmt).strftime("%d-%m-%Y")
+        except:
+            continue
+    return s
+
+def legacy_fmt_df(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy()
+    for c in out.columns:
+        lc = c.lower()
+        if any(k in lc for k in ["monto", "total", "valor", "neto", "bruto", "importe"]):
+            out[c] = out[c].map(legacy_format_currency_clp)
+        if "fecha" in lc:
+            out[c] = out[c].map(legacy_format_date_ddmmyyyy)
+    return out
+
+def _render(df: pd.DataFrame) -> bytes:
+    # primera página de un resultado nuevo (pager por FECHA_ENTREGA, como el listado) → display_frame → Arrow
+    rows, _ = make_pager(lambda: iter([df]), ("FECHA_ENTREGA", False)).page(0)
+    data, _ = display_frame(rows)
+    return convert_pandas_df_to_arrow_bytes(data)
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark de formateo/render de tablas")
+    ap.add_argument("--rows", type=int, nargs="+", default=[300, 10000])
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+    warnings.simplefilter("ignore")
+
+    MB = mb_for(make_data(max(args.rows), seed=7)["MODELO_BOT"])
+    MB = MB[MB["MONTO_NETO"].notna()]  # el formateador anterior falla con NaN
+    print(f"{'filas':>7}  {'anterior ms':>12}  {'actual ms':>10}  {'texto vect. ms':>15}  {'x':>6}")
+    for n in args.rows:
+        df = MB[[c for c in COLS if c in MB.columns]].head(n)
+        old = _best(lambda: convert_pandas_df_to_arrow_bytes(legacy_fmt_df(df)), args.repeat)
+        new = _best(lambda: _render(df), args.repeat)
+        txt = _best(lambda: format_df(df), args.repeat)
+        print(f"{len(df):>7}  {old*1000:>12.1f}  {new*1000:>10.1f}  {txt*1000:>15.1f}  {old/new:>6.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
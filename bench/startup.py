@@ -0,0 +1,78 @@
+# bench/startup.py — arranque en frío: inicio del proceso → primer render de app.py
+# Cada corrida es un proceso nuevo que ejecuta app.py con streamlit.testing (AppTest), sesión ya
+# autenticada y load_sheets reemplazado por datos sintéticos (sin red). Reporta la mediana y qué
+# dependencias pesadas quedaron importadas tras el primer render (deberían cargarse al primer uso).
+#
+#   python -m bench.startup                # 5 corridas
+#   python -m bench.startup --runs 9 --json bench/out/startup.json
+import os, sys, json, time, argparse, statistics, subprocess
+
+HEAVY = ("plotly.express", "openai", "httpx", "duckdb", "openpyxl", "xlsxwriter", "tiktoken")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# script que AppTest ejecuta como app (datos sintéticos en lugar de Google Sheets)
+_APP = """
+import os, sys, runpy
+sys.path.insert(0, {root!r})
+os.environ["FENIX_HISTORY"] = "0"  # las hojas sintéticas no van al historial
+import utils.gsheets as g
+from bench.synthetic import make_data
+data = make_data({rows}, seed=7, finanzas=True)
+g.load_sheets = lambda *a, **k: data
+runpy.run_path({root!r} + "/app.py", run_name="__main__")
+"""
+
+_CHILD = r"""
+import sys, time, json, warnings
+warnings.simplefilter("ignore")
+from streamlit.testing.v1 import AppTest
+t0 = time.perf_counter()
+at = AppTest.from_string(SCRIPT, default_timeout=120)
+at.secrets["SHEET_ID"] = "bench"
+at.session_state["authenticated"] = True
+at.run()
+render = time.perf_counter() - t0
+print(json.dumps({
+    "render_s": render,
+    "errors": [str(e.value)[:200] for e in at.exception],
+    "loaded": [m for m in HEAVY if m in sys.modules],
+}))
+"""
+
+def _one(rows: int) -> dict:
+    code = f"SCRIPT = {_APP.format(root=ROOT, rows=rows)!r}\nHEAVY = {HEAVY!r}\n" + _CHILD
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    total = time.perf_counter() - t0
+    res = json.loads(out.stdout.strip().splitlines()[-1])
+    res["total_s"] = total
+    return res
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark de arranque en frío de app.py")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--rows", type=int, default=3000)
+    ap.add_argument("--json", help="guardar resultados en este archivo")
+    args = ap.parse_args(argv)
+
+    runs = [_one(args.rows) for _ in range(args.runs)]
+    errors = [e for r in runs for e in r["errors"]]
+    report = {
+        "runs": args.runs,
+        "total_s_p50": statistics.median(r["total_s"] for r in runs),
+        "render_s_p50": statistics.median(r["render_s"] for r in runs),
+        "loaded_after_first_render": runs[-1]["loaded"],
+        "errors": errors[:3],
+    }
+    print(f"inicio → primer render (p50): {report['total_s_p50']*1000:.0f} ms "
+          f"(script: {report['render_s_p50']*1000:.0f} ms, {args.runs} corridas)")
+    print(f"pesadas importadas tras el primer render: {', '.join(report['loaded_after_first_render']) or '-'}")
+    if errors:
+        print(f"⚠ errores en el render: {errors[0]}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# bench/synthetic.py — MODELO_BOT sintético y reproducible (semilla) con los encabezados de column_map.yaml
+import os
+from datetime import date
+import numpy as np
+import pandas as pd
+import yaml
+
+MARCAS = ["Toyota", "Chevrolet", "Hyundai", "Kia", "Nissan", "Suzuki", "Peugeot", "Ford", "Mazda", "Mitsubishi"]
+MODELOS = ["Yaris", "Sail", "Accent", "Rio", "Versa", "Swift", "208", "Ranger", "CX-5", "L200"]
+TIPOS_CLIENTE = ["Particular", "Empresa", "Compañía de Seguros", "Leasing"]
+CLIENTES = [
+    "Inmobiliaria Los Andes SpA", "Constructora Ñuble Ltda", "Transportes Peñalolén", "Seguros Magallanes",
+    "Juan Pérez", "María González", "Comercial Araucanía", "Rent a Car Austral", "Minera Atacama",
+    "Inmobiliaria Costanera", "Agrícola Maule", "Distribuidora Bío Bío", "Pedro Soto", "Forestal Valdivia",
+]
+TIPOS_VEHICULO = ["Liviano", "SUV", "Camioneta", "Pesado"]
+ESTADOS_PRESUPUESTO = ["APROBADO", "PENDIENTE", "RECHAZADO"]
+ESTADOS_TALLER = ["EN REPARACIÓN", "EN ESPERA DE REPUESTOS", "PRESUPUESTO", "LISTO PARA ENTREGA"]
+
+def _headers(path: str = "column_map.yaml") -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return {k: v for k, v in (yaml.safe_load(f) or {}).get("MODELO_BOT", {}).items() if v}
+
+def _patentes(rng, n: int) -> np.ndarray:
+    letras = np.array(list("BCDFGHJKLPRSTVWXYZ"))
+    l4 = rng.choice(letras, size=(n, 4))
+    num = rng.integers(10, 100, n)
+    return np.char.add(np.char.add(np.char.add(l4[:, 0], l4[:, 1]), np.char.add(l4[:, 2], l4[:, 3])), num.astype(str))
+
+# orden de caracteres de 'YYYY-MM-DD' para cada formato de texto (posiciones 2/5 o 4/7 = separador)
+_DATE_LAYOUTS = {
+    "%d/%m/%Y": ([8, 9, 7, 5, 6, 4, 0, 1, 2, 3], "/"),
+    "%d-%m-%Y": ([8, 9, 7, 5, 6, 4, 0, 1, 2, 3], "-"),
+    "%Y-%m-%d": ([0, 1, 2, 3, 4, 5, 6, 7, 8, 9], "-"),
+}
+
+def _fmt_dates(d: pd.Series, fmt="%d/%m/%Y") -> pd.Series:
+    # igual que d.dt.strftime(fmt).fillna(""), pero reordenando caracteres en numpy (1M filas en ms).
+    # fmt puede ser un arreglo de formatos (uno por fila) para mezclar formatos en la misma columna.
+    iso = np.datetime_as_string(d.to_numpy().astype("datetime64[D]")).astype("U10")
+    src = iso.view(np.uint32).reshape(-1, 10)
+    fmts = np.broadcast_to(np.asarray(fmt, dtype=object), len(d))
+    codes = np.empty_like(src)
+    for f, (order, sep) in _DATE_LAYOUTS.items():
+        rows = fmts == f
+        if rows.any():
+            part = src[rows][:, order]
+            part[:, [2, 5] if order[0] == 8 else [4, 7]] = ord(sep)
+            codes[rows] = part
+    out = pd.Series(codes.view("U10").ravel(), index=d.index, dtype=object)
+    return out.where(d.notna().to_numpy(), "")
+
+def _fmt_dates_mixed(rng, d: pd.Series) -> pd.Series:
+    # planilla real: mayoría dd/mm/aaaa, algunas celdas ISO o con guiones
+    return _fmt_dates(d, rng.choice(np.array(["%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y"], dtype=object),
+                                    size=len(d), p=[0.8, 0.1, 0.1]))
+
+def _fmt_clp(x: np.ndarray) -> pd.Series:
+    # "1.234.567" (como llega desde la planilla)
+    s = pd.Series(np.round(x).astype("int64")).map("{:,}".format).str.replace(",", ".", regex=False)
+    return s
+
+def make_modelo_bot(n: int = 5000, seed: int = 7, anchor: date | None = None,
+                    column_map: str = "column_map.yaml", messy: bool = False) -> pd.DataFrame:
+    """
+    Hoja MODELO_BOT cruda (todo texto, como get_all_records) con fechas relativas a `anchor`
+    (hoy por defecto): así las preguntas relativas ("próximos 7 días") devuelven lo mismo cada día.
+    messy=True imita la planilla a mano: formatos de fecha mezclados, montos con "$ " y SI/NO
+    con mayúsculas/acentos/espacios variables (lo usa bench.perf; el golden e2e usa el formato limpio).
+    """
+    rng = np.random.default_rng(seed)
+    anchor = pd.Timestamp(anchor or date.today())
+    h = _headers(column_map)
+
+    recep = anchor - pd.to_timedelta(rng.integers(0, 400, n), unit="D")
+    dias_planta = rng.gamma(2.0, 9.0, n).round().astype(int) + 1
+    ingreso = recep + pd.to_timedelta(rng.integers(0, 3, n), unit="D")
+    salida = ingreso + pd.to_timedelta(dias_planta, unit="D")
+    entrega = salida + pd.to_timedelta(rng.integers(0, 4, n), unit="D")
+
+    # entregados: la entrega ya ocurrió (o está agendada dentro de los próximos 10 días)
+    entregado = (entrega <= anchor + pd.Timedelta(days=10)) & (rng.random(n) < 0.85)
+    facturado = entregado & (rng.random(n) < 0.7)
+    pagado = facturado & (rng.random(n) < 0.6)
+    fact_fecha = entrega + pd.to_timedelta(rng.integers(0, 20, n), unit="D")
+    pago_fecha = fact_fecha + pd.to_timedelta(rng.integers(5, 60, n), unit="D")
+
+    neto = rng.lognormal(13.5, 0.8, n)
+    iva = neto * 0.19
+    estado = np.where(entregado, "ENTREGADO", rng.choice(ESTADOS_TALLER, n))
+    fmt_d = (lambda d: _fmt_dates_mixed(rng, d)) if messy else _fmt_dates
+
+    raw = {
+        "ot": pd.Series(np.arange(100001, 100001 + n)).astype(str),
+        "patente": _patentes(rng, n),
+        "marca": rng.choice(MARCAS, n),
+        "modelo": rng.choice(MODELOS, n),
+        "tipo_cliente": rng.choice(TIPOS_CLIENTE, n, p=[0.35, 0.3, 0.25, 0.1]),
+        "nombre_cliente": rng.choice(CLIENTES, n),
+        "tipo_vehiculo": rng.choice(TIPOS_VEHICULO, n),
+        "siniestro": np.where(rng.random(n) < 0.4, "SI", "NO"),
+        "estado_servicio": estado,
+        "estado_presupuesto": rng.choice(ESTADOS_PRESUPUESTO, n, p=[0.7, 0.2, 0.1]),
+        "fecha_ingreso_planta": fmt_d(pd.Series(ingreso)),
+        "fecha_salida_planta": fmt_d(pd.Series(salida.where(entregado))),
+        "fecha_inspeccion": fmt_d(pd.Series(recep)),
+        "fecha_recepcion": fmt_d(pd.Series(recep)),
+        "fecha_entrega": fmt_d(pd.Series(entrega.where(entregado))),
+        "numero_factura": pd.Series(np.where(facturado, rng.integers(1000, 99999, n).astype(str), "")),
+        "fecha_facturacion": fmt_d(pd.Series(fact_fecha.where(facturado))),
+        "fecha_pago_factura": fmt_d(pd.Series(pago_fecha.where(pagado))),
+        "facturado_flag": np.where(facturado, "SI", "NO"),
+        "monto_neto": _fmt_clp(neto),
+        "iva_f": _fmt_clp(iva),
+        "monto_bruto_f": _fmt_clp(neto + iva),
+        "numero_dias_en_planta": pd.Series(dias_planta).astype(str),
+        "dias_en_dominio": pd.Series(rng.integers(0, 30, n)).astype(str),
+        "cantidad_vehiculo": "1",
+        "dias_pago_factura": pd.Series(np.where(pagado, (pago_fecha - fact_fecha).days, 0)).astype(str),
+    }
+    if messy:
+        for k in ("monto_neto", "iva_f", "monto_bruto_f"):
+            raw[k] = raw[k].where(rng.random(n) >= 0.1, "$ " + raw[k])
+        si = rng.choice(np.array(["SI", "Sí", "si", "SI "]), n)
+        no = rng.choice(np.array(["NO", "No", "no", " NO"]), n)
+        raw["facturado_flag"] = np.where(facturado, si, no)
+    df = pd.DataFrame({h[k]: v for k, v in raw.items() if k in h})
+    return df.astype(str)
+
+def make_finanzas(mb: pd.DataFrame, seed: int = 7, anchor: date | None = None) -> pd.DataFrame:
+    """
+    Hoja FINANZAS cruda a partir de las facturas de `mb`: folios en formatos mixtos ("F-000123",
+    "FE 123", "123"), vencimiento a 30 días de la facturación y estado según la fecha de pago.
+    Incluye notas de crédito "NC-123" con el mismo número que una factura: no deben cruzarse con ella.
+    """
+    rng = np.random.default_rng(seed + 1)
+    h = _headers()
+    fact = mb[mb[h["numero_factura"]] != ""]
+    n = len(fact)
+    num = fact[h["numero_factura"]].astype(int).to_numpy()
+    fmt = rng.integers(0, 3, n)
+    folio = np.where(fmt == 0, [f"F-{x:06d}" for x in num], np.where(fmt == 1, [f"FE {x}" for x in num], num.astype(str)))
+    fecha_fact = pd.to_datetime(fact[h["fecha_facturacion"]], format="%d/%m/%Y")
+    pagada = (fact[h["fecha_pago_factura"]] != "").to_numpy()
+    # algunas "pagadas" en MODELO_BOT aún figuran pendientes en FINANZAS (desfase de conciliación)
+    pendiente = ~pagada | (rng.random(n) < 0.05)
+    fin = pd.DataFrame({
+        "N° FACTURA": folio,
+        "RAZON SOCIAL": fact[h["nombre_cliente"]].to_numpy(),
+        "FECHA VENCIMIENTO": _fmt_dates(pd.Series(fecha_fact + pd.Timedelta(days=30))).to_numpy(),
+        "ESTADO PAGO": np.where(pendiente, "PENDIENTE", "PAGADO"),
+        "MONTO": fact[h["monto_bruto_f"]].to_numpy(),
+    }).astype(str)
+    nc = fin.iloc[np.flatnonzero(rng.random(n) < 0.03)].copy()
+    nc["N° FACTURA"] = [f"NC-{x:06d}" for x in num[nc.index.to_numpy()]]
+    nc["ESTADO PAGO"] = "PAGADO"
+    return pd.concat([fin, nc], ignore_index=True)
+
+def make_data(n: int = 5000, seed: int = 7, anchor: date | None = None, finanzas: bool = False,
+              messy: bool = False) -> dict:
+    """Mismo formato que utils.gsheets.load_sheets: {nombre_hoja: DataFrame}."""
+    data = {"MODELO_BOT": make_modelo_bot(n, seed, anchor, messy=messy)}
+    if finanzas:
+        data["FINANZAS"] = make_finanzas(data["MODELO_BOT"], seed, anchor)
+    return data
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Genera un MODELO_BOT sintético (CSV)")
+    ap.add_argument("--rows", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--messy", action="store_true", help="formatos mezclados como en la planilla real")
+    ap.add_argument("--out", default="bench/out/modelo_bot.csv")
+    a = ap.parse_args()
+    os.makedirs(os.path.dirname(a.out) or ".", exist_ok=True)
+    make_modelo_bot(a.rows, a.seed, messy=a.messy).to_csv(a.out, index=False)
+    print(a.out)
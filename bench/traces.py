@@ -0,0 +1,34 @@
+# bench/traces.py — p50/p95 por ruta (y por etapa) desde el log de trazas por pregunta
+#   python -m bench.traces                              # logs/traces.jsonl (o FENIX_TRACE_LOG)
+#   python -m bench.traces --log otra.jsonl --last 500 --json bench/out/traces.json
+#   python -m bench.traces --kind api                   # solicitudes de api.py (ruta = endpoint)
+import sys, json, argparse
+from utils.tracing import read_log, route_percentiles
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Percentiles de latencia por ruta desde el log de trazas")
+    ap.add_argument("--log", help="archivo JSONL de trazas")
+    ap.add_argument("--last", type=int, default=0, help="solo las últimas N trazas")
+    ap.add_argument("--kind", default="pregunta", help="tipo de traza: pregunta (app) o api")
+    ap.add_argument("--json", help="guardar el reporte en este archivo")
+    args = ap.parse_args(argv)
+
+    traces = [t for t in read_log(args.log) if t.get("kind") == args.kind]
+    if args.last:
+        traces = traces[-args.last:]
+    if not traces:
+        print("Sin trazas (¿FENIX_TRACE_LOG=off o log vacío?)")
+        return 1
+    report = route_percentiles(traces)
+    for route, r in sorted(report.items(), key=lambda kv: -kv[1]["n"]):
+        print(f"{route}  (n={r['n']}, p50 {r['p50_ms']:.0f} ms, p95 {r['p95_ms']:.0f} ms)")
+        for name, e in r["etapas"].items():
+            peak = f"{e['p95_peak_mb']:>9.1f} MB p95" if "p95_peak_mb" in e else ""
+            print(f"    {name:<24}{e['p50_ms']:>9.1f}{e['p95_ms']:>9.1f} ms{peak}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
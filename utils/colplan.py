@@ -0,0 +1,64 @@
+# utils/colplan.py — plan de resolución de columnas (campo lógico → columna física), cacheado por encabezados
+# Antes cada lookup re-normalizaba todos los encabezados por sinónimo (find_col); ahora se resuelve
+# una vez por firma de encabezados y se reutiliza en pandas (_build_mb) y en DuckDB (map_cols).
+import logging
+from functools import lru_cache
+from .nlp import _norm
+
+log = logging.getLogger("fenix.columns")
+
+@lru_cache(maxsize=256)
+def normalized_headers(columns: tuple[str, ...]) -> tuple[str, ...]:
+    return tuple(_norm(c) for c in columns)
+
+@lru_cache(maxsize=4096)
+def match_synonyms(columns: tuple[str, ...], synonyms: tuple[str, ...]) -> tuple[str | None, tuple[str, ...]]:
+    """
+    Misma semántica que find_col: primer sinónimo (en orden) contenido en algún encabezado,
+    primer encabezado que lo contiene. Devuelve (columna, otras columnas que también calzaban).
+    """
+    ncols = normalized_headers(columns)
+    for syn in synonyms:
+        ns = _norm(syn)
+        hits = [columns[i] for i, nc in enumerate(ncols) if ns in nc]
+        if hits:
+            return hits[0], tuple(hits[1:])
+    return None, ()
+
+_REPORTED: set = set()
+
+@lru_cache(maxsize=128)
+def _resolve(columns: tuple[str, ...], spec: tuple, label: str) -> dict:
+    cols, source, ambiguous = {}, {}, {}
+    for field, synonyms, exact in spec:
+        if exact and exact in columns:
+            cols[field], source[field] = exact, "column_map"
+            continue
+        col, others = match_synonyms(columns, synonyms)
+        cols[field] = col
+        source[field] = "sinónimo" if col else None
+        if col and others:
+            ambiguous[field] = [col, *others]
+    missing = [f for f, c in cols.items() if c is None]
+    shared = {}
+    for f, c in cols.items():
+        if c is not None:
+            shared.setdefault(c, []).append(f)
+    shared = {c: fs for c, fs in shared.items() if len(fs) > 1}
+    plan = {"cols": cols, "source": source, "missing": missing, "ambiguous": ambiguous, "shared": shared}
+
+    # se reporta una sola vez por (encabezados, conjunto de campos)
+    key = (hash(columns), label)
+    if key not in _REPORTED and (missing or ambiguous or shared):
+        _REPORTED.add(key)
+        log.warning("columnas %s: faltan %s; ambiguas %s; compartidas %s", label or "-", missing, ambiguous, shared)
+    return plan
+
+def resolve_plan(columns, fields: dict[str, list[str]], exact: dict[str, str] | None = None, label: str = "") -> dict:
+    """
+    fields: campo → sinónimos (en orden de preferencia); exact: campo → encabezado exacto (column_map.yaml).
+    Devuelve {"cols": {campo: columna|None}, "source", "missing", "ambiguous", "shared"} (no mutar: está cacheado).
+    """
+    exact = exact or {}
+    spec = tuple((f, tuple(syns), exact.get(f) or "") for f, syns in fields.items())
+    return _resolve(tuple(map(str, columns)), spec, label)
@@ -0,0 +1,178 @@
+# utils/exports.py — exportes CSV / XLSX / Parquet generados solo al pedirlos y cacheados por huella
+# Renderizar una tabla ya no serializa el resultado dos veces: el archivo se arma cuando el usuario
+# lo pide y se reutiliza mientras el resultado (huella de contenido) no cambie.
+import io, os, tempfile, threading
+from collections import OrderedDict
+import pandas as pd
+
+from .singleflight import flight
+from .snapshot import frame_fingerprint
+from .tracing import span, note_cache
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "XLSX": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode("utf-8")
+
+def _xlsx_writers(ws, df: pd.DataFrame, date_fmt):
+    """Un escritor por columna (según dtype), para no inspeccionar el tipo en cada celda."""
+    out = []
+    for c in df.columns:
+        s = df[c]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            out.append(lambda r, j, v: ws.write_datetime(r, j, v.to_pydatetime().replace(tzinfo=None), date_fmt))
+        elif pd.api.types.is_bool_dtype(s):
+            out.append(lambda r, j, v: ws.write_boolean(r, j, bool(v)))
+        elif pd.api.types.is_numeric_dtype(s):
+            out.append(lambda r, j, v: ws.write_number(r, j, float(v)))
+        else:
+            out.append(lambda r, j, v: ws.write_string(r, j, str(v)))
+    return out
+
+def to_xlsx_bytes(df: pd.DataFrame, sheet_name: str = "Datos") -> bytes:
+    """XLSX con xlsxwriter en modo constant_memory: se escribe fila a fila y cada fila se descarga a disco."""
+    import xlsxwriter
+    buff = io.BytesIO()
+    wb = xlsxwriter.Workbook(buff, {"constant_memory": True, "nan_inf_to_errors": True})
+    ws = wb.add_worksheet(sheet_name)
+    bold = wb.add_format({"bold": True})
+    date_fmt = wb.add_format({"num_format": "dd-mm-yyyy"})
+    ws.write_row(0, 0, [str(c) for c in df.columns], bold)
+    writers = _xlsx_writers(ws, df, date_fmt)
+    nulls = df.isna().to_numpy()
+    for i, row in enumerate(df.itertuples(index=False, name=None)):
+        for j, v in enumerate(row):
+            if not nulls[i, j]:
+                writers[j](i + 1, j, v)
+    wb.close()
+    return buff.getvalue()
+
+def to_parquet_bytes(df: pd.DataFrame) -> bytes:
+    buff = io.BytesIO()
+    try:
+        df.to_parquet(buff, index=False)
+    except Exception:
+        # columnas object con tipos mezclados: se exportan como texto
+        buff = io.BytesIO()
+        obj = df.select_dtypes(include="object").columns
+        df.astype({c: str for c in obj}).to_parquet(buff, index=False)
+    return buff.getvalue()
+
+_WRITERS = {"CSV": to_csv_bytes, "XLSX": to_xlsx_bytes, "Parquet": to_parquet_bytes}
+
+_CACHE: "OrderedDict[tuple, bytes]" = OrderedDict()
+_CACHE_BYTES = 0
+_LOCK = threading.Lock()
+
+def export_bytes(df: pd.DataFrame, fmt: str) -> bytes:
+    """Archivo `fmt` (CSV/XLSX/Parquet) del resultado, cacheado por (huella, formato)."""
+    key = (frame_fingerprint(df), fmt)
+    with _LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key)
+            note_cache(f"export:{fmt}", True)
+            return hit
+    note_cache(f"export:{fmt}", False)
+
+    def build():
+        global _CACHE_BYTES
+        with span("export", fmt=fmt, rows=int(len(df))) as s:
+            data = _WRITERS[fmt](df)
+            s["bytes"] = len(data)
+        with _LOCK:
+            if key not in _CACHE:
+                _CACHE[key] = data
+                _CACHE_BYTES += len(data)
+            while _CACHE_BYTES > _CACHE_MAX_BYTES and len(_CACHE) > 1:
+                _, old = _CACHE.popitem(last=False)
+                _CACHE_BYTES -= len(old)
+        return data
+    return flight("export").do(key, build)
+
+def export_file(df: pd.DataFrame, name: str, fmt: str) -> tuple[bytes, str, str]:
+    """(bytes, nombre de archivo, mime) listo para st.download_button."""
+    ext, mime = EXPORT_FORMATS[fmt]
+    return export_bytes(df, fmt), f"{name}.{ext}", mime
+
+# --------- exportes completos (sin tope de pantalla) en streaming ----------
+# Las filas llegan en bloques (DuckDB fetch_record_batch o cortes del frame) y se escriben a un archivo
+# temporal bloque a bloque: la serialización nunca tiene el archivo entero en memoria.
+STREAM_FORMATS = ("CSV", "Parquet")
+CHUNK_ROWS = 50_000
+_SPOOL_MAX = 8
+
+def frame_chunks(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS):
+    if df.empty:
+        yield df
+    for i in range(0, len(df), chunk_rows):
+        yield df.iloc[i:i + chunk_rows]
+
+def iter_csv(chunks):
+    """Bytes CSV bloque a bloque (encabezado solo en el primero)."""
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header).encode("utf-8")
+        header = False
+
+def _arrow_chunk(chunk: pd.DataFrame, schema=None):
+    import pyarrow as pa
+    # object → string: el esquema no depende de si un bloque trae la columna completa en nulos
+    obj = chunk.select_dtypes(include="object").columns
+    table = pa.Table.from_pandas(chunk.astype({c: "string" for c in obj}), preserve_index=False)
+    return table if schema is None else table.cast(schema)
+
+def write_parquet_stream(chunks, path: str) -> int:
+    """Un row group por bloque con ParquetWriter; devuelve filas escritas."""
+    import pyarrow.parquet as pq
+    writer, rows = None, 0
+    try:
+        for chunk in chunks:
+            table = _arrow_chunk(chunk, writer.schema if writer else None)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, use_dictionary=True)
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:  # resultado vacío: archivo válido sin filas
+        pq.write_table(_arrow_chunk(pd.DataFrame()), path)
+    return rows
+
+_SPOOL: "OrderedDict[str, None]" = OrderedDict()
+
+def _spool_path(ext: str) -> str:
+    fd, path = tempfile.mkstemp(prefix="fenix_export_", suffix=f".{ext}")
+    os.close(fd)
+    with _LOCK:
+        _SPOOL[path] = None
+        while len(_SPOOL) > _SPOOL_MAX:
+            old, _ = _SPOOL.popitem(last=False)
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return path
+
+def stream_export(chunks, name: str, fmt: str) -> tuple[str, str, str]:
+    """
+    Escribe los bloques a un archivo temporal (CSV o Parquet) y devuelve (ruta, nombre, mime).
+    Los últimos _SPOOL_MAX archivos se conservan; los anteriores se borran.
+    """
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"Formato no soportado para exporte completo: {fmt}")
+    ext, mime = EXPORT_FORMATS[fmt]
+    path = _spool_path(ext)
+    if fmt == "CSV":
+        with open(path, "wb") as f:
+            for part in iter_csv(chunks):
+                f.write(part)
+    else:
+        write_parquet_stream(chunks, path)
+    return path, f"{name}_completo.{ext}", mime
@@ -0,0 +1,108 @@
+# utils/finance.py — cruce MODELO_BOT ↔ FINANZAS por número de factura (índice cacheado por snapshot)
+# El folio se normaliza igual en ambos lados ("F-000123", "FE 123", "123.0" → "123"; "NC-12" queda "NC12")
+# y el cruce se calcula una sola vez por par de snapshots; las skills solo filtran/agrupan sobre el resultado.
+import threading
+from collections import OrderedDict
+from datetime import date
+import numpy as np
+import pandas as pd
+
+from .schema import FIN_KEYS, map_cols
+from .singleflight import flight
+from .snapshot import snapshot_version
+from .tracing import note_cache
+
+FIN_SHEET = "FINANZAS"
+AGING_BUCKETS = [(-10**6, 0, "Por vencer"), (1, 30, "1-30"), (31, 60, "31-60"), (61, 90, "61-90"), (91, 10**6, "+90")]
+# mismos valores que por_pagar_bool de la vista FIN de DuckDB (schema.build_fin_view_sql)
+_POR_PAGAR = {"pendiente", "por pagar", "no", "impago", "abierta", "abierto", "sin pago", ""}
+_CACHE_SIZE = 4
+
+# prefijos de factura que no son parte del folio ("F-000123", "FE 123", "Factura N° 123"); cualquier otra letra
+# (NC-12 nota de crédito, A-12 otra serie) queda en la clave para no cruzarse con la factura 12
+_FOLIO_PREFIX = r"^(?:(?:FACTURA|FACT|FAC|FE|F)\s*(?:N[°ºO]\.?|NRO\.?)?|N[°º]\.?|NRO\.?|#)?[\s\-.#:°º]*(?=\d)"
+
+def normalize_folio(s: pd.Series) -> pd.Series:
+    """
+    Folio canónico: sin prefijo de factura, separadores ni ceros a la izquierda ("F-000123", "FE 123",
+    "123.0" → "123"); otra letra inicial se conserva ("NC-0012" → "NC12"). Sin dígitos: alfanumérico.
+    """
+    txt = s.astype(str).str.upper().str.strip().str.replace(r"\.0$", "", regex=True)
+    out = (txt.str.replace(_FOLIO_PREFIX, "", regex=True)
+              .str.replace(r"[^0-9A-Z]", "", regex=True)
+              .str.replace(r"^([A-Z]*)0+(?=\d)", r"\1", regex=True))
+    return out.where(~out.isin({"", "NAN", "NONE", "NAT"}))
+
+def _fin_sheet(data: dict) -> pd.DataFrame | None:
+    return next((df for name, df in data.items() if name.upper() == FIN_SHEET), None)
+
+_CACHE: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+_LOCK = threading.Lock()
+
+def _cached(key, build):
+    with _LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key)
+            note_cache("finance", True)
+            return hit
+    note_cache("finance", False)
+
+    def run():
+        out = build()
+        with _LOCK:
+            _CACHE[key] = out
+            while len(_CACHE) > _CACHE_SIZE:
+                _CACHE.popitem(last=False)
+        return out
+    return flight("finance").do(key, run)
+
+def fin_for(df_fin: pd.DataFrame) -> pd.DataFrame:
+    """Vista FIN normalizada en pandas (mismas columnas que la vista FIN de DuckDB + folio)."""
+    def build():
+        m = map_cols(df_fin, FIN_KEYS, label="FIN_KEYS")
+        col = lambda k: df_fin[m[k]] if m.get(k) else pd.Series(np.nan, index=df_fin.index)
+        fin = pd.DataFrame(index=df_fin.index)
+        fin["factura_num"] = col("factura_num")
+        fin["proveedor"] = col("proveedor")
+        fin["estado_pago"] = col("estado_pago")
+        fin["vencimiento"] = pd.to_datetime(col("vencimiento"), errors="coerce", dayfirst=True)
+        fin["monto"] = pd.to_numeric(
+            col("monto").astype(str).str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+            errors="coerce",
+        )
+        estado = fin["estado_pago"].fillna("").astype(str).str.strip().str.lower()
+        fin["por_pagar_bool"] = estado.isin(_POR_PAGAR)
+        fin["folio"] = normalize_folio(fin["factura_num"])
+        return fin
+    return _cached(("fin", snapshot_version(df_fin)), build)
+
+def mb_fin_join(data: dict) -> pd.DataFrame | None:
+    """
+    MB ⋈ FIN por folio (inner), cacheado por (snapshot MB, snapshot FIN, día). Una fila por par
+    MB–FIN; si FIN trae el mismo folio repetido (cuotas), se conserva cada línea.
+    """
+    from .skills import mb_for
+    df_mb = data.get("MODELO_BOT", next(iter(data.values())))
+    df_fin = _fin_sheet(data)
+    if df_fin is None:
+        return None
+
+    def build():
+        MB = mb_for(df_mb)
+        fin = fin_for(df_fin)
+        left = pd.DataFrame({"_mb": np.arange(len(MB)), "folio": normalize_folio(MB["NUMERO_FACTURA"]).values})
+        right = pd.DataFrame({"_fin": np.arange(len(fin)), "folio": fin["folio"].values})
+        pairs = left.dropna(subset=["folio"]).merge(right.dropna(subset=["folio"]), on="folio", how="inner")
+        mb_cols = ["id", "NOMBRE_CLIENTE", "TIPO_CLIENTE", "PATENTE", "OT", "NUMERO_FACTURA", "FECHA_FACTURACION",
+                   "FECHA_ENTREGA", "MONTO_NETO", "entregado_bool", "facturado_bool"]
+        out = MB.iloc[pairs["_mb"].values][[c for c in mb_cols if c in MB.columns]].reset_index(drop=True)
+        fin_part = fin.iloc[pairs["_fin"].values][["folio", "estado_pago", "vencimiento", "monto", "por_pagar_bool"]]
+        return pd.concat([out, fin_part.reset_index(drop=True)], axis=1)
+    return _cached(("join", snapshot_version(df_mb), snapshot_version(df_fin), date.today()), build)
+
+def aging_bucket(dias_vencida: pd.Series) -> pd.Series:
+    labels = pd.Series(pd.NA, index=dias_vencida.index, dtype="object")
+    for lo, hi, label in AGING_BUCKETS:
+        labels[dias_vencida.between(lo, hi)] = label
+    return labels
@@ -1,21 +1,110 @@
 from datetime import datetime
+import math
+import numpy as np
+import pandas as pd
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%m/%d/%Y")
+MONEY_KEYS = ("monto", "total", "valor", "neto", "bruto", "importe")
+
+def _group_thousands(n: int) -> str:
+    return f"{n:,}".replace(",", ".")
 
 def format_currency_clp(x):
     if x is None: return ""
-    try:
-        v = float(str(x).replace(".", "").replace(",", "."))
-    except:
-        return str(x)
+    if isinstance(x, (int, float)):
+        if isinstance(x, float) and math.isnan(x): return ""
+        v = float(x)
+    else:
+        try:
+            v = float(str(x).replace(".", "").replace(",", "."))
+        except:
+            return str(x)
+        if math.isnan(v): return ""
     # Formato: $ 1.234.567 (sin decimales)
-    return f"$ {int(round(v)):n}".replace(",", ".")
-    
+    return f"$ {_group_thousands(int(round(v)))}"
+
 def format_date_ddmmyyyy(x):
+    if x is None or x is pd.NaT: return ""
+    if isinstance(x, (datetime, pd.Timestamp)):
+        return x.strftime("%d-%m-%Y")
     if not x: return ""
     s = str(x)
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%m/%d/%Y"):
+    for fmt in DATE_FORMATS:
         try:
             d = datetime.strptime(s, fmt)
             return d.strftime("%d-%m-%Y")
         except:
             continue
     return s
+
+# ---------- versiones vectorizadas (columnas completas) ----------
+def format_currency_clp_series(s: pd.Series) -> pd.Series:
+    """Igual que format_currency_clp, pero por columna: '$ 1.234.567' (vacío para nulos)."""
+    if pd.api.types.is_numeric_dtype(s):
+        v, fallback = s.astype("float64"), ""
+    else:
+        txt = s.astype(str).str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+        v = pd.to_numeric(txt, errors="coerce")
+        fallback = s.astype(str).where(s.notna(), "")  # lo que no es número se muestra tal cual
+    ok = v.notna().to_numpy()
+    ints = np.round(v.to_numpy()[ok]).astype("int64")
+    out = pd.Series(fallback, index=s.index, dtype=object)
+    out[ok] = [f"$ {_group_thousands(n)}" for n in ints.tolist()]
+    return out
+
+def format_date_series(s: pd.Series) -> pd.Series:
+    """dd-mm-YYYY por columna; columnas de texto se parsean por formato (vectorizado)."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        if getattr(s.dt, "tz", None) is not None:
+            s = s.dt.tz_localize(None)
+        # ISO 'YYYY-MM-DD' en C (numpy) y reordenado de caracteres → 'DD-MM-YYYY', sin strftime por celda
+        iso = np.datetime_as_string(s.to_numpy().astype("datetime64[D]")).astype("U10")
+        dmy = iso.view(np.uint32).reshape(-1, 10)[:, [8, 9, 7, 5, 6, 4, 0, 1, 2, 3]].copy().view("U10").ravel()
+        return pd.Series(dmy, index=s.index, dtype=object).where(s.notna(), "")
+    txt = s.astype(str)
+    parsed = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+    for fmt in DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed = parsed.fillna(pd.to_datetime(txt.where(missing), format=fmt, errors="coerce"))
+    return format_date_series(parsed).where(parsed.notna(), txt.where(s.notna() & (txt != ""), ""))
+
+def is_money_col(name) -> bool:
+    lc = str(name).lower()
+    return any(k in lc for k in MONEY_KEYS)
+
+def is_date_col(name) -> bool:
+    return "fecha" in str(name).lower()
+
+def format_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Copia con montos y fechas como texto (para markdown/exportes legibles), columna a columna."""
+    out = df.copy()
+    for c in out.columns:
+        if is_money_col(c):
+            out[c] = format_currency_clp_series(out[c])
+        if is_date_col(c) or pd.api.types.is_datetime64_any_dtype(out[c]):
+            out[c] = format_date_series(out[c])
+    return out
+
+def display_frame(df: pd.DataFrame):
+    """
+    (datos, column_config) para st.dataframe de la página visible (≤ utils.paging.PAGE_ROWS filas): copia
+    con los montos como texto "$ 745.050" (column_config de Streamlit 1.37 no agrupa miles) y las fechas
+    DD-MM-YYYY por column_config. Se formatea solo lo que va al navegador; el orden y los exportes salen del
+    frame numérico.
+    """
+    cols = list(enumerate(df.columns))  # por posición: tolera encabezados repetidos
+    money = [j for j, c in cols if is_money_col(c) and pd.api.types.is_numeric_dtype(df.iloc[:, j])
+             and not pd.api.types.is_bool_dtype(df.iloc[:, j])]
+    dates = [c for j, c in cols if pd.api.types.is_datetime64_any_dtype(df.iloc[:, j])]
+    if not (money or dates):
+        return df, None
+    import streamlit as st
+    cfg = {c: st.column_config.DateColumn(format="DD-MM-YYYY") for c in dates} or None
+    if not money:
+        return df, cfg
+    out = df.copy(deep=False)
+    for j in money:
+        out.isetitem(j, format_currency_clp_series(df.iloc[:, j]))
+    return out, cfg
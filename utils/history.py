@@ -0,0 +1,301 @@
+# utils/history.py — historial de snapshots de MB en Parquet particionado por fecha (viaje en el tiempo y tendencias)
+# Cada snapshot recargado agrega a <FENIX_HISTORY_DIR>/snapshot_date=AAAA-MM-DD/ un archivo con solo las filas
+# nuevas o cambiadas respecto del último registrado (clave OT/PATENTE de mb_rowkeys + hash de la fila) y una
+# marca "D" por fila eliminada; un snapshot sin cambios no escribe archivo, solo su línea en _snapshots.jsonl.
+# Cada FENIX_HISTORY_CHECKPOINT_DAYS días (30) el snapshot se guarda completo ("S"): el estado a una fecha se
+# arma desde el último completo anterior, así que una consulta lee ese completo + las particiones de su
+# ventana (DuckDB descarta el resto por snapshot_date) y su costo no crece con la antigüedad del historial.
+#   _key       clave de fila          _op   "S" completo · "U" nueva/cambiada · "D" eliminada
+#   _hash      hash de la fila        snapshot_ts / snapshot_version: hora de carga y versión del snapshot
+# Columnas de texto con diccionario (marca, estado, cliente… se repiten mucho). FENIX_HISTORY=0 lo apaga.
+import os, json, logging, threading
+from contextlib import contextmanager
+from datetime import date
+import numpy as np
+import pandas as pd
+
+from .snapshot import snapshot_version
+from .tracing import span
+from .skills import mb_base, mb_rowkeys
+
+log = logging.getLogger("fenix.history")
+
+HISTORY_DIR = os.environ.get("FENIX_HISTORY_DIR", os.path.join("data", "history"))
+CHECKPOINT_DAYS = int(os.environ.get("FENIX_HISTORY_CHECKPOINT_DAYS", 30))
+_MANIFEST = "_snapshots.jsonl"
+_STATE = "_state.parquet"
+_SKIP = ("_estado_servicio_norm", "_facturado_flag_norm")  # diagnóstico: se derivan de las columnas guardadas
+
+# filtros y agrupaciones de history_trend (mismos criterios que las skills del catálogo)
+TREND_FILTERS = {
+    "en_taller": "NOT entregado_bool",
+    "sin_aprobacion": "NOT entregado_bool AND no_facturado_bool",
+    "entregados_sin_factura": "entregado_bool AND no_facturado_bool",
+    "entregados_facturados": "entregado_bool AND facturado_bool",
+    "todos": "TRUE",
+}
+TREND_GROUPS = ("MARCA", "TIPO_CLIENTE", "SUCURSAL", "TIPO_VEHICULO", "ESTADO_SERVICIO", "ESTADO_PRESUPUESTO")
+
+_LOCK = threading.Lock()
+_DONE: set = set()  # (carpeta, snapshot, fecha) ya registrados por este proceso: los reruns no releen el disco
+_SESSIONS: dict = {}
+
+def enabled() -> bool:
+    return os.environ.get("FENIX_HISTORY", "1").lower() not in ("0", "false", "off")
+
+@contextmanager
+def _dir_lock(root: str):
+    # app, API y batch pueden escribir la misma carpeta: lock de archivo entre procesos (POSIX)
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, "_lock"), "a+") as f:
+        try:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+        except ImportError:
+            pass
+        yield
+
+def _manifest(root: str) -> list[dict]:
+    try:
+        with open(os.path.join(root, _MANIFEST), "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+# ---------------------- escritura ----------------------
+def _arrow(df: pd.DataFrame):
+    """DataFrame → tabla Arrow: texto como diccionario, fechas en µs (mismo esquema en todos los archivos)."""
+    import pyarrow as pa
+    cols = {}
+    for c in df.columns:
+        s = df[c]
+        if pd.api.types.is_bool_dtype(s) or pd.api.types.is_numeric_dtype(s):
+            cols[c] = pa.array(s, from_pandas=True)
+        elif pd.api.types.is_datetime64_any_dtype(s):
+            cols[c] = pa.array(s, type=pa.timestamp("us"), from_pandas=True)
+        else:
+            cols[c] = pa.array(s.where(s.isna(), s.astype(str)), type=pa.string(), from_pandas=True).dictionary_encode()
+    return pa.table(cols)
+
+def _write_parquet(table, path: str) -> int:
+    import pyarrow.parquet as pq
+    tmp = f"{path}.tmp"
+    pq.write_table(table, tmp, compression="zstd", use_dictionary=True)
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+def _load_state(root: str, man: list[dict]) -> pd.DataFrame | None:
+    """(_key, _hash) del último snapshot registrado; si falta el archivo, se reconstruye del historial."""
+    path = os.path.join(root, _STATE)
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+    if not any(m.get("archivo") for m in man):
+        return None
+    return _asof_frame(root, man, date.fromisoformat(man[-1]["fecha"]), "_key, _hash")
+
+def _batch(root: str, raw: pd.DataFrame, ver: str, ts: pd.Timestamp) -> dict | None:
+    fecha = ts.date()
+    man = _manifest(root)
+    if any(m["snapshot"] == ver and m["fecha"] == fecha.isoformat() for m in man):
+        return None
+    if man and pd.Timestamp(man[-1]["ts"]) > ts:
+        log.warning("historial: snapshot %s (%s) es anterior al último registrado; se omite", ver, ts)
+        return None
+    MB = mb_base(raw)
+    H = MB[[c for c in MB.columns if c not in _SKIP]]
+    keys = mb_rowkeys(raw)
+    dup = pd.Index(keys).duplicated()
+    if dup.any():  # colisión de hash de clave: sin clave única no hay cómo seguir la fila
+        log.warning("historial: %d filas con clave repetida no se registran", int(dup.sum()))
+        H, keys = H[~dup], keys[~dup]
+    hashes = pd.util.hash_pandas_object(H, index=False).to_numpy()
+
+    state = _load_state(root, man)
+    last_cp = max((m["fecha"] for m in man if m.get("checkpoint")), default=None)
+    checkpoint = state is None or last_cp is None or (fecha - date.fromisoformat(last_cp)).days >= CHECKPOINT_DAYS
+    if state is None:
+        new, changed, deleted = np.ones(len(H), bool), np.zeros(len(H), bool), np.array([], np.uint64)
+    else:
+        pos = pd.Index(state["_key"]).get_indexer(keys)
+        new = pos < 0
+        changed = ~new
+        changed[changed] = state["_hash"].to_numpy()[pos[changed]] != hashes[changed]
+        deleted = state["_key"].to_numpy()[pd.Index(keys).get_indexer(state["_key"]) < 0]
+    write = np.ones(len(H), bool) if checkpoint else (new | changed)
+    stats = {"fecha": fecha.isoformat(), "ts": ts.isoformat(), "snapshot": ver, "filas": int(len(H)),
+             "nuevas": int(new.sum()), "cambiadas": int(changed.sum()),
+             "eliminadas": int(len(deleted)), "escritas": int(write.sum()), "checkpoint": bool(checkpoint),
+             "archivo": None, "bytes": 0}
+
+    if write.any() or len(deleted):
+        import pyarrow as pa
+        W = H[write]
+        body = _arrow(W)
+        n = body.num_rows + len(deleted)
+        ops = np.concatenate([np.full(body.num_rows, 0 if checkpoint else 1, np.int8), np.full(len(deleted), 2, np.int8)])
+        if len(deleted):
+            body = pa.concat_tables([body, pa.table({f.name: pa.nulls(len(deleted), f.type) for f in body.schema})])
+        table = pa.table({
+            "_key": pa.array(np.concatenate([keys[write], deleted]).astype(np.uint64)),
+            "_op": pa.DictionaryArray.from_arrays(pa.array(ops), pa.array(["S", "U", "D"])),
+            **{name: body.column(name) for name in body.column_names},
+            "_hash": pa.array(np.concatenate([hashes[write], np.zeros(len(deleted), np.uint64)])),
+            "snapshot_ts": pa.array(np.full(n, np.datetime64(ts.to_datetime64(), "us"))),
+            "snapshot_version": pa.DictionaryArray.from_arrays(pa.array(np.zeros(n, np.int32)), pa.array([ver])),
+        })
+        part = os.path.join(root, f"snapshot_date={fecha.isoformat()}")
+        os.makedirs(part, exist_ok=True)
+        name = f"{ts.strftime('%H%M%S')}-{ver}.parquet"  # mismo nombre al reintentar: se sobrescribe
+        stats["bytes"] = _write_parquet(table, os.path.join(part, name))
+        stats["archivo"] = f"snapshot_date={fecha.isoformat()}/{name}"
+    _write_parquet(_arrow(pd.DataFrame({"_key": keys, "_hash": hashes})), os.path.join(root, _STATE))
+    with open(os.path.join(root, _MANIFEST), "a", encoding="utf-8") as f:
+        f.write(json.dumps(stats, ensure_ascii=False) + "\n")
+    return stats
+
+def _record(root: str, raw: pd.DataFrame, ver: str, ts: pd.Timestamp) -> dict | None:
+    try:
+        with span("history_record", snapshot=ver) as s, _dir_lock(root):
+            stats = _batch(root, raw, ver, ts)
+            s.update(stats or {"omitido": True})
+    except Exception:
+        with _LOCK:
+            _DONE.discard((root, ver, ts.date()))
+        log.exception("historial: no se pudo registrar el snapshot %s", ver)
+        return None
+    if stats:
+        log.info("historial %s: %s escritas (%s nuevas, %s cambiadas, %s eliminadas%s)", stats["fecha"],
+                 stats["escritas"], stats["nuevas"], stats["cambiadas"], stats["eliminadas"],
+                 ", completo" if stats["checkpoint"] else "")
+    return stats
+
+def record_snapshot(data, background: bool = False, at=None, root: str | None = None) -> dict | None:
+    """
+    Registra el snapshot (dict de hojas o MODELO_BOT crudo) en el historial, una vez por (snapshot, día).
+    Fecha/hora = `at` o loaded_at del snapshot. Devuelve las estadísticas de lo escrito, o None si ya estaba
+    (o si corre en segundo plano: background=True lanza un hilo daemon y vuelve enseguida).
+    """
+    root = root or HISTORY_DIR
+    raw = data.get("MODELO_BOT", next(iter(data.values()))) if isinstance(data, dict) else data
+    ver = snapshot_version(raw)
+    loaded = raw.attrs.get("loaded_at")
+    ts = pd.Timestamp(at if at is not None else (loaded or pd.Timestamp.now())).floor("s")
+    key = (root, ver, ts.date())
+    with _LOCK:
+        if key in _DONE:
+            return None
+        _DONE.add(key)
+    if background:
+        threading.Thread(target=_record, args=(root, raw, ver, ts), name="fenix-history", daemon=True).start()
+        return None
+    return _record(root, raw, ver, ts)
+
+# ---------------------- consultas (DuckDB) ----------------------
+def _sql_path(path: str) -> str:
+    return path.replace("'", "''")
+
+def history_session(root: str | None = None):
+    """
+    Conexión DuckDB del historial con las vistas MB_HIST (todas las versiones de fila, snapshot_date como
+    columna de partición: filtrarla descarta archivos completos) y HIST_SNAPSHOTS (una fila por snapshot).
+    None si todavía no hay nada registrado. Las vistas releen la carpeta en cada consulta.
+    """
+    root = root or HISTORY_DIR
+    if not any(m.get("archivo") for m in _manifest(root)):
+        return None
+    with _LOCK:
+        con = _SESSIONS.get(root)
+        if con is None:
+            import duckdb
+            con = duckdb.connect()
+            files = _sql_path(os.path.join(root, "snapshot_date=*", "*.parquet"))
+            con.execute(f"CREATE VIEW MB_HIST AS SELECT * FROM read_parquet('{files}', hive_partitioning = true, "
+                        "hive_types = {'snapshot_date': DATE})")
+            con.execute(f"CREATE VIEW HIST_SNAPSHOTS AS SELECT CAST(fecha AS DATE) AS fecha, CAST(ts AS TIMESTAMP) "
+                        f"AS ts, * EXCLUDE (fecha, ts) FROM read_json_auto('{_sql_path(os.path.join(root, _MANIFEST))}')")
+            _SESSIONS[root] = con
+        return con.cursor()
+
+def _query(root: str, sql: str) -> pd.DataFrame:
+    cur = history_session(root)
+    if cur is None:
+        return pd.DataFrame()
+    try:
+        with span("history_query") as s:
+            df = cur.execute(sql).df()
+            s["rows"] = int(len(df))
+        return df
+    finally:
+        cur.close()
+
+def _window_start(man: list[dict], desde: date) -> date | None:
+    """Primera partición a leer para reconstruir el estado en `desde`: el último completo hasta esa fecha."""
+    cps = [m["fecha"] for m in man if m.get("checkpoint") and m["fecha"] <= desde.isoformat()]
+    return date.fromisoformat(cps[-1]) if cps else None
+
+def _asof_frame(root: str, man: list[dict], fecha: date, columns: str = "* EXCLUDE (_op, _hash, snapshot_date)"):
+    start = _window_start(man, fecha)
+    if start is None:
+        return pd.DataFrame()
+    return _query(root, f"""
+        SELECT {columns} FROM MB_HIST
+        WHERE snapshot_date BETWEEN DATE '{start}' AND DATE '{fecha}'
+        QUALIFY row_number() OVER (PARTITION BY _key ORDER BY snapshot_ts DESC) = 1 AND _op <> 'D'
+        ORDER BY _key""")
+
+def _as_date(value) -> date:
+    return pd.Timestamp(value).date()
+
+def history_snapshots(root: str | None = None) -> pd.DataFrame:
+    """Snapshots registrados: fecha, hora, versión, filas y nuevas/cambiadas/eliminadas/escritas."""
+    return pd.DataFrame(_manifest(root or HISTORY_DIR))
+
+def history_asof(fecha=None, root: str | None = None) -> pd.DataFrame:
+    """
+    MB base tal como estaba al cierre de `fecha` (por defecto hoy), con _key, snapshot_ts y snapshot_version
+    de la versión vigente de cada fila. with_asof(df, fecha) agrega las columnas relativas a esa fecha.
+    """
+    root = root or HISTORY_DIR
+    df = _asof_frame(root, _manifest(root), date.today() if fecha is None else _as_date(fecha))
+    for c in df.columns:  # DuckDB entrega µs; MB usa ns
+        if pd.api.types.is_datetime64_any_dtype(df[c]):
+            df[c] = df[c].astype("datetime64[ns]")
+    if "NUMERO_DIAS_EN_PLANTA" in df.columns:  # como mb_base: decidido con el estado completo, no con un recorte
+        df.attrs["dias_en_planta_desde_fechas"] = bool(df["NUMERO_DIAS_EN_PLANTA"].isna().all())
+    return df
+
+def history_trend(desde, hasta=None, filtro: str = "en_taller", por: str | None = None,
+                  root: str | None = None) -> pd.DataFrame:
+    """
+    Evolución entre `desde` y `hasta` (por defecto hoy): para cada fecha con snapshot, vehículos y MONTO_NETO
+    que cumplían `filtro` (TREND_FILTERS) al cierre del día, opcionalmente por una columna de TREND_GROUPS.
+    Lee el último completo anterior a `desde` y las particiones de la ventana.
+    """
+    if filtro not in TREND_FILTERS:
+        raise ValueError(f"filtro desconocido {filtro!r}; opciones: {', '.join(TREND_FILTERS)}")
+    if por is not None and por not in TREND_GROUPS:
+        raise ValueError(f"por: {por!r} no es agrupable; opciones: {', '.join(TREND_GROUPS)}")
+    root = root or HISTORY_DIR
+    desde, hasta = _as_date(desde), date.today() if hasta is None else _as_date(hasta)
+    if hasta < desde:
+        raise ValueError("hasta es anterior a desde")
+    man = _manifest(root)
+    start = _window_start(man, desde)
+    if start is None:  # ventana que empieza antes del historial: desde el primer completo
+        start = next((date.fromisoformat(m["fecha"]) for m in man if m.get("checkpoint")), None)
+    if start is None or start > hasta:
+        return pd.DataFrame(columns=["fecha", *([por] if por else []), "vehiculos", "monto_neto"])
+    col, group = (f", {por}", f", v.{por}") if por else ("", "")
+    return _query(root, f"""
+        WITH v AS (
+            SELECT _key, _op, snapshot_ts, entregado_bool, facturado_bool, no_facturado_bool, MONTO_NETO{col},
+                   lead(snapshot_ts) OVER (PARTITION BY _key ORDER BY snapshot_ts) AS _hasta
+            FROM MB_HIST WHERE snapshot_date BETWEEN DATE '{start}' AND DATE '{hasta}'
+        ), d AS (
+            SELECT fecha, max(ts) AS ts FROM HIST_SNAPSHOTS
+            WHERE fecha BETWEEN DATE '{desde}' AND DATE '{hasta}' GROUP BY fecha
+        )
+        SELECT d.fecha{group}, count(v._key) AS vehiculos, coalesce(sum(v.MONTO_NETO), 0) AS monto_neto
+        FROM d LEFT JOIN v ON v.snapshot_ts <= d.ts AND (v._hasta IS NULL OR v._hasta > d.ts)
+                          AND v._op <> 'D' AND ({TREND_FILTERS[filtro]})
+        GROUP BY ALL ORDER BY ALL""")
@@ -1,11 +1,12 @@
 # utils/intent.py — IA → JSON (intención) → filtros deterministas con auto-reparación
 from __future__ import annotations
-import os, re, json, unicodedata
+import re, json, unicodedata
 from typing import Any, Dict, List, Optional
 import pandas as pd
 
-# Usa el SDK oficial de OpenAI (ya lo tienes en el proyecto)
-from openai import OpenAI
+from .nlp import ilike
+from .prompts import build_messages, relevant_values
+from .textindex import index_for, suggest_values, did_you_mean
 
 # ---------- helpers ----------
 def _norm(s: str) -> str:
@@ -40,89 +41,105 @@ def _collect_enums(MB: pd.DataFrame) -> Dict[str, List[str]]:
         "sucursal": _distinct(MB.get("SUCURSAL")) if "SUCURSAL" in MB.columns else [],
     }
 
-def _client() -> OpenAI:
-    os.environ.setdefault("OPENAI_MODEL", os.environ.get("OPENAI_MODEL", "gpt-4o-mini"))
-    return OpenAI()
+def _compact_example(spec: Dict[str, Any]) -> Dict[str, Any]:
+    # los nulos se omiten: _validate_and_repair_spec los completa
+    out = {}
+    for k, v in spec.items():
+        if isinstance(v, dict):
+            v = {kk: vv for kk, vv in v.items() if vv is not None}
+            if not v: continue
+        if v is None: continue
+        out[k] = v
+    return out
 
 # ---------- LLM: pregunta → QuerySpec (JSON cerrado) ----------
-def llm_question_to_queryspec(question: str, MB: pd.DataFrame) -> Dict[str, Any]:
-    enums = _collect_enums(MB)
+_QS_SYSTEM = (
+    "Eres un parser de consultas en español para una planilla de vehículos.\n"
+    "Devuelves SOLO un JSON válido con este esquema (sin texto adicional):\n"
+    "{\n"
+    '  "delivered": true|false|null,                // ENTREGADOS (True), EN TALLER (False) o no especifica (null)\n'
+    '  "invoiced":  true|false|null,                // FACTURADOS (True), SIN FACTURA (False) o null\n'
+    '  "date_field": "FECHA_FACTURACION|FECHA_ENTREGA|FECHA_RECEPCION|FECHA_PAGO_FACTURA|fecha_op",\n'
+    '  "date_range": {"start":"YYYY-MM-DD|null","end":"YYYY-MM-DD|null","proximos_dias":int|null,"ultimos_dias":int|null},\n'
+    '  "filters": {\n'
+    '     "cliente_contains": "string|null", "patente_contains":"string|null",\n'
+    '     "marca_exact":"string|null", "tipo_cliente_exact":"string|null",\n'
+    '     "sucursal_exact":"string|null", "estado_servicio_contains":"string|null"\n'
+    "  },\n"
+    '  "group_by": "ninguno|tipo_cliente|marca|estado_servicio",\n'
+    '  "metrics": "lista|conteo|suma_neto",\n'
+    '  "top_n": int|null,\n'
+    '  "sort_desc": true|false\n'
+    "}\n"
+    "REGLAS:\n"
+    "- Reconoce sinónimos: entregados→delivered=true; en taller/no entregados→delivered=false; con factura→invoiced=true; sin factura/no facturados→invoiced=false.\n"
+    "- Si habla de facturación → date_field=FECHA_FACTURACION; entrega→FECHA_ENTREGA; recepción→FECHA_RECEPCION; pago→FECHA_PAGO_FACTURA; si no dice, usa fecha_op.\n"
+    "- Para marca/tipo_cliente/sucursal usa SOLO valores exactos de los catálogos entregados (si no hay match, deja null).\n"
+    f"- group_by ∈ {{ninguno,tipo_cliente,marca,estado_servicio}}. metrics ∈ {METRICS_OPTS}.\n"
+    "- Si el usuario pide una LISTA, usa metrics='lista' y group_by='ninguno'.\n"
+    "- Si pide 'cuántos', usa metrics='conteo'. Si pide 'monto' o 'facturación por', usa metrics='suma_neto' (por group_by si aplica).\n"
+    "- No inventes campos ni valores fuera del esquema. Las claves omitidas en los ejemplos valen null.\n"
+    "Ejemplos (pregunta → JSON):\n"
+)
 
-    system = (
-        "Eres un parser de consultas en español para una planilla de vehículos.\n"
-        "Devuelves SOLO un JSON válido con este esquema (sin texto adicional):\n"
-        "{\n"
-        '  "delivered": true|false|null,                // ENTREGADOS (True), EN TALLER (False) o no especifica (null)\n'
-        '  "invoiced":  true|false|null,                // FACTURADOS (True), SIN FACTURA (False) o null\n'
-        '  "date_field": "FECHA_FACTURACION|FECHA_ENTREGA|FECHA_RECEPCION|FECHA_PAGO_FACTURA|fecha_op",\n'
-        '  "date_range": {"start":"YYYY-MM-DD|null","end":"YYYY-MM-DD|null","proximos_dias":int|null,"ultimos_dias":int|null},\n'
-        '  "filters": {\n'
-        '     "cliente_contains": "string|null", "patente_contains":"string|null",\n'
-        '     "marca_exact":"string|null", "tipo_cliente_exact":"string|null",\n'
-        '     "sucursal_exact":"string|null", "estado_servicio_contains":"string|null"\n'
-        "  },\n"
-        '  "group_by": "ninguno|tipo_cliente|marca|estado_servicio",\n'
-        '  "metrics": "lista|conteo|suma_neto",\n'
-        '  "top_n": int|null,\n'
-        '  "sort_desc": true|false\n'
-        "}\n"
-        "REGLAS:\n"
-        "- Reconoce sinónimos: entregados→delivered=true; en taller/no entregados→delivered=false; con factura→invoiced=true; sin factura/no facturados→invoiced=false.\n"
-        "- Si habla de facturación → date_field=FECHA_FACTURACION; entrega→FECHA_ENTREGA; recepción→FECHA_RECEPCION; pago→FECHA_PAGO_FACTURA; si no dice, usa fecha_op.\n"
-        "- Usa SOLO valores exactos de estos catálogos (si no hay match, deja null):\n"
-        f"  marcas: {enums['marcas']}\n"
-        f"  tipo_cliente: {enums['tipo_cliente']}\n"
-        f"  estado_servicio (ejemplos): {enums['estado_servicio'][:10]}\n"
-        f"  sucursal: {enums['sucursal']}\n"
-        "- group_by ∈ {ninguno,tipo_cliente,marca,estado_servicio}. metrics ∈ {METRICS_OPTS}.\n"
-        "- Si el usuario pide una LISTA, usa metrics='lista' y group_by='ninguno'.\n"
-        "- Si pide 'cuántos', usa metrics='conteo'. Si pide 'monto' o 'facturación por', usa metrics='suma_neto' (por group_by si aplica).\n"
-        "- No inventes campos ni valores fuera del esquema."
-    )
+# Pocos ejemplos críticos de referencia (cadenas típicas del negocio)
+_QS_EXAMPLES = [
+    ("¿Cuáles son los vehículos entregados sin factura?",
+     {"delivered": True, "invoiced": False, "date_field":"fecha_op",
+      "date_range":{"start":None,"end":None,"proximos_dias":None,"ultimos_dias":None},
+      "filters":{"cliente_contains":None,"patente_contains":None,"marca_exact":None,"tipo_cliente_exact":None,"sucursal_exact":None,"estado_servicio_contains":None},
+      "group_by":"ninguno","metrics":"lista","top_n":200,"sort_desc":True}),
+    ("En taller sin aprobación (sin factura), últimos 10 días",
+     {"delivered": False, "invoiced": False, "date_field":"fecha_op",
+      "date_range":{"start":None,"end":None,"proximos_dias":None,"ultimos_dias":10},
+      "filters":{"cliente_contains":None,"patente_contains":None,"marca_exact":None,"tipo_cliente_exact":None,"sucursal_exact":None,"estado_servicio_contains":"aprob"},
+      "group_by":"ninguno","metrics":"lista","top_n":200,"sort_desc":True}),
+    ("Facturación de marzo por tipo de cliente",
+     {"delivered": None, "invoiced": True, "date_field":"FECHA_FACTURACION",
+      "date_range":{"start":None,"end":None,"proximos_dias":None,"ultimos_dias":None},
+      "filters":{"cliente_contains":None,"patente_contains":None,"marca_exact":None,"tipo_cliente_exact":None,"sucursal_exact":None,"estado_servicio_contains":None},
+      "group_by":"tipo_cliente","metrics":"suma_neto","top_n":100,"sort_desc":True}),
+    ("Próximos 7 días entregas sin facturar",
+     {"delivered": True, "invoiced": False, "date_field":"FECHA_ENTREGA",
+      "date_range":{"start":None,"end":None,"proximos_dias":7,"ultimos_dias":None},
+      "filters":{"cliente_contains":None,"patente_contains":None,"marca_exact":None,"tipo_cliente_exact":None,"sucursal_exact":None,"estado_servicio_contains":None},
+      "group_by":"ninguno","metrics":"lista","top_n":200,"sort_desc":False}),
+    ("Cuántos vehículos livianos con factura en Toyota",
+     {"delivered": None, "invoiced": True, "date_field":"fecha_op",
+      "date_range":{"start":None,"end":None,"proximos_dias":None,"ultimos_dias":None},
+      "filters":{"cliente_contains":None,"patente_contains":None,"marca_exact":"toyota","tipo_cliente_exact":None,"sucursal_exact":None,"estado_servicio_contains":"liviano"},
+      "group_by":"ninguno","metrics":"conteo","top_n":None,"sort_desc":True}),
+]
 
-    # Pocos ejemplos críticos de referencia (cadenas típicas del negocio)
-    examples = [
-        ("¿Cuáles son los vehículos entregados sin factura?",
-         {"delivered": True, "invoiced": False, "date_field":"fecha_op",
-          "date_range":{"start":None,"end":None,"proximos_dias":None,"ultimos_dias":None},
-          "filters":{"cliente_contains":None,"patente_contains":None,"marca_exact":None,"tipo_cliente_exact":None,"sucursal_exact":None,"estado_servicio_contains":None},
-          "group_by":"ninguno","metrics":"lista","top_n":200,"sort_desc":True}),
-        ("En taller sin aprobación (sin factura), últimos 10 días",
-         {"delivered": False, "invoiced": False, "date_field":"fecha_op",
-          "date_range":{"start":None,"end":None,"proximos_dias":None,"ultimos_dias":10},
-          "filters":{"cliente_contains":None,"patente_contains":None,"marca_exact":None,"tipo_cliente_exact":None,"sucursal_exact":None,"estado_servicio_contains":"aprob"},
-          "group_by":"ninguno","metrics":"lista","top_n":200,"sort_desc":True}),
-        ("Facturación de marzo por tipo de cliente",
-         {"delivered": None, "invoiced": True, "date_field":"FECHA_FACTURACION",
-          "date_range":{"start":None,"end":None,"proximos_dias":None,"ultimos_dias":None},
-          "filters":{"cliente_contains":None,"patente_contains":None,"marca_exact":None,"tipo_cliente_exact":None,"sucursal_exact":None,"estado_servicio_contains":None},
-          "group_by":"tipo_cliente","metrics":"suma_neto","top_n":100,"sort_desc":True}),
-        ("Próximos 7 días entregas sin facturar",
-         {"delivered": True, "invoiced": False, "date_field":"FECHA_ENTREGA",
-          "date_range":{"start":None,"end":None,"proximos_dias":7,"ultimos_dias":None},
-          "filters":{"cliente_contains":None,"patente_contains":None,"marca_exact":None,"tipo_cliente_exact":None,"sucursal_exact":None,"estado_servicio_contains":None},
-          "group_by":"ninguno","metrics":"lista","top_n":200,"sort_desc":False}),
-        ("Cuántos vehículos livianos con factura en Toyota",
-         {"delivered": None, "invoiced": True, "date_field":"fecha_op",
-          "date_range":{"start":None,"end":None,"proximos_dias":None,"ultimos_dias":None},
-          "filters":{"cliente_contains":None,"patente_contains":None,"marca_exact":"toyota","tipo_cliente_exact":None,"sucursal_exact":None,"estado_servicio_contains":"liviano"},
-          "group_by":"ninguno","metrics":"conteo","top_n":None,"sort_desc":True}),
-    ]
-
-    user = "Pregunta del usuario:\n" + question + "\n\n" + "Ejemplos JSON de salida:\n" + "\n".join(
-        [json.dumps(e[1], ensure_ascii=False) for e in examples]
-    )
+# Prefijo estático: esquema + reglas + ejemplos (idéntico entre llamadas → cacheable)
+_QS_SYSTEM += "\n".join(
+    f"{q} → {json.dumps(_compact_example(e), ensure_ascii=False)}" for q, e in _QS_EXAMPLES
+)
 
-    client = _client()
-    rsp = client.responses.create(
-        model=os.environ["OPENAI_MODEL"],
-        temperature=0,
-        response_format={"type": "json_object"},
-        input=[{"role":"system","content":system},{"role":"user","content":user}],
+def _enum_context(enums: Dict[str, List[str]], question: str) -> str:
+    # solo valores mencionados en la pregunta + algunos ejemplos, no las 80 distintas por catálogo
+    lines = ["Catálogos (valores exactos):"]
+    for key, limit in [("marcas", 12), ("tipo_cliente", 12), ("estado_servicio", 8), ("sucursal", 12)]:
+        vals = relevant_values(enums.get(key) or [], question, limit=limit)
+        if vals:
+            lines.append(f"  {key}: {vals}")
+    return "\n".join(lines)
+
+def llm_question_to_queryspec(question: str, MB: pd.DataFrame) -> Dict[str, Any]:
+    from .llm import _chat, _content, _note_error
+    enums = _collect_enums(MB)
+    messages = build_messages(
+        "queryspec",
+        _QS_SYSTEM,
+        [_enum_context(enums, question)],
+        "Pregunta del usuario:\n" + question,
     )
     try:
-        spec = json.loads(rsp.output_text)
-    except Exception:
+        msg = _chat("queryspec", messages, temperature=0, response_format={"type": "json_object"})
+        spec = json.loads(_content(msg))
+    except Exception as e:
+        # circuito abierto / timeout / JSON inválido → spec vacío (reparado con defaults)
+        _note_error("queryspec", e)
         spec = {}
 
     return _validate_and_repair_spec(spec)
@@ -164,11 +181,13 @@ def _apply_state_filters(df: pd.DataFrame, delivered, invoiced) -> pd.DataFrame:
     if invoiced is False:  t = t[t["no_facturado_bool"]]
     return t
 
-def _apply_text_filters(t: pd.DataFrame, f: Dict[str, Any]) -> pd.DataFrame:
+def _apply_text_filters(t: pd.DataFrame, f: Dict[str, Any], MB: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    # cliente/patente: mismo "contiene" sin acentos que el fallback libre (exacto: sin sustituir por parecidos)
+    base = MB if MB is not None else t
     if f.get("cliente_contains"):
-        t = t[t["NOMBRE_CLIENTE"].astype(str).str.contains(f["cliente_contains"], case=False, na=False)]
+        t = t[ilike(t["NOMBRE_CLIENTE"], f["cliente_contains"], index=index_for(base, "NOMBRE_CLIENTE"))]
     if f.get("patente_contains"):
-        t = t[t["PATENTE"].astype(str).str.contains(f["patente_contains"], case=False, na=False)]
+        t = t[ilike(t["PATENTE"], f["patente_contains"], index=index_for(base, "PATENTE"))]
     if f.get("marca_exact"):
         t = t[t["MARCA"].astype(str).str.lower()==f["marca_exact"].lower()]
     if f.get("tipo_cliente_exact"):
@@ -176,7 +195,7 @@ def _apply_text_filters(t: pd.DataFrame, f: Dict[str, Any]) -> pd.DataFrame:
     if f.get("sucursal_exact") and "SUCURSAL" in t.columns:
         t = t[t["SUCURSAL"].astype(str).str.lower()==f["sucursal_exact"].lower()]
     if f.get("estado_servicio_contains"):
-        t = t[t["ESTADO_SERVICIO"].astype(str).str.contains(f["estado_servicio_contains"], case=False, na=False)]
+        t = t[ilike(t["ESTADO_SERVICIO"], f["estado_servicio_contains"])]
     return t
 
 def _apply_time_filters(t: pd.DataFrame, date_col: str, dr: Dict[str,Any]) -> pd.DataFrame:
@@ -194,14 +213,25 @@ def _apply_time_filters(t: pd.DataFrame, date_col: str, dr: Dict[str,Any]) -> pd
     if end:   t = t[t[date_col] <= pd.to_datetime(end)]
     return t
 
-def execute_queryspec(MB: pd.DataFrame, spec: Dict[str, Any]) -> pd.DataFrame:
+def execute_queryspec(MB: pd.DataFrame, spec: Dict[str, Any], full: bool = False) -> pd.DataFrame:
+    """
+    full=True: sin el tope de pantalla (100/300) para exportes; un top_n explícito se respeta. Si el cliente
+    pedido no aparece en la hoja, el resultado vacío lleva attrs["quisiste_decir"] con los más parecidos.
+    """
+    out = _execute_queryspec(MB, spec, full)
+    cliente = (spec.get("filters") or {}).get("cliente_contains")
+    if out.empty and cliente and (sug := suggest_values(MB, "NOMBRE_CLIENTE", cliente)):
+        out.attrs["quisiste_decir"] = did_you_mean(cliente, sug)
+    return out
+
+def _execute_queryspec(MB: pd.DataFrame, spec: Dict[str, Any], full: bool = False) -> pd.DataFrame:
     t = MB.copy()
 
     # 1) estado (entregado / facturado)
     t = _apply_state_filters(t, spec.get("delivered"), spec.get("invoiced"))
 
     # 2) filtros de texto
-    t = _apply_text_filters(t, spec.get("filters", {}))
+    t = _apply_text_filters(t, spec.get("filters", {}), MB)
 
     # 3) tiempo
     date_col = spec.get("date_field") or "fecha_op"
@@ -211,7 +241,7 @@ def execute_queryspec(MB: pd.DataFrame, spec: Dict[str, Any]) -> pd.DataFrame:
     if t.empty:
         # 3a) quitar rango de fechas
         t1 = _apply_state_filters(MB, spec.get("delivered"), spec.get("invoiced"))
-        t1 = _apply_text_filters(t1, spec.get("filters", {}))
+        t1 = _apply_text_filters(t1, spec.get("filters", {}), MB)
         if not t1.empty:
             t = t1  # sin fechas
         else:
@@ -227,7 +257,8 @@ def execute_queryspec(MB: pd.DataFrame, spec: Dict[str, Any]) -> pd.DataFrame:
     # 4) salida según métrica/agrupación
     metric = spec.get("metrics","lista")
     gb = spec.get("group_by","ninguno")
-    topn = spec.get("top_n") or (100 if metric != "lista" else 300)
+    topn = spec.get("top_n") or (None if full else (100 if metric != "lista" else 300))
+    cap = lambda d: d if topn is None else d.head(topn)
     sort_desc = bool(spec.get("sort_desc", True))
 
     if metric == "lista" and gb == "ninguno":
@@ -239,16 +270,16 @@ def execute_queryspec(MB: pd.DataFrame, spec: Dict[str, Any]) -> pd.DataFrame:
         sort_cols = [c for c in ["FECHA_ENTREGA","FECHA_FACTURACION","FECHA_RECEPCION"] if c in t.columns]
         if sort_cols:
             t = t.sort_values(sort_cols, ascending=[not sort_desc]*len(sort_cols), kind="stable")
-        return t[cols].head(topn)
+        return cap(t[cols])
 
     if gb != "ninguno":
         key = {"tipo_cliente":"TIPO_CLIENTE","marca":"MARCA","estado_servicio":"ESTADO_SERVICIO"}[gb]
         if metric == "conteo":
             g = t.groupby(key, dropna=False, as_index=False).size().rename(columns={"size":"CANTIDAD"})
-            return g.sort_values("CANTIDAD", ascending=not sort_desc).head(topn)
+            return cap(g.sort_values("CANTIDAD", ascending=not sort_desc))
         if metric == "suma_neto":
             g = t.groupby(key, dropna=False, as_index=False)["MONTO_NETO"].sum()
-            return g.sort_values("MONTO_NETO", ascending=not sort_desc).head(topn)
+            return cap(g.sort_values("MONTO_NETO", ascending=not sort_desc))
 
     # fallback
-    return t.head(topn)
+    return cap(t)
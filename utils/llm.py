@@ -1,6 +1,15 @@
 # utils/llm.py — detección por versión (v1/v0) + debug + duckdb perezoso
-import os, re
+import os, re, time, threading
+from collections import OrderedDict
 import pandas as pd
+from .prompts import (
+    build_messages, completion_budget, estimate_tokens, messages_tokens,
+    record_usage, usage_summary,
+)
+from .resilience import BREAKER, CircuitOpenError, call_with_policy
+from .llm_replay import active_cassette
+from .singleflight import flight, singleflight_stats
+from .snapshot import snapshot_version
 
 _LAST_LLM_ERROR: str | None = None
 _OPENAI_VERSION: str | None = None
@@ -8,7 +17,16 @@ _OPENAI_MODE: str | None = None  # "v1" o "v0"
 
 # ---------------------- utilidades de estado/debug ----------------------
 def has_openai() -> bool:
-    return bool(os.environ.get("OPENAI_API_KEY"))
+    # en modo replay no hace falta key: las respuestas salen del cassette
+    return bool(os.environ.get("OPENAI_API_KEY")) or os.environ.get("FENIX_LLM_REPLAY", "").lower() == "replay"
+
+def llm_available() -> bool:
+    """Hay API key y el circuit breaker no está abierto (si lo está → fallback local)."""
+    return has_openai() and not BREAKER.is_open()
+
+def _note_error(route: str, e: Exception) -> None:
+    global _LAST_LLM_ERROR
+    _LAST_LLM_ERROR = f"LLM {route} error: {e}"
 
 def _get_openai_version() -> str:
     global _OPENAI_VERSION
@@ -28,16 +46,32 @@ def _get_openai_version() -> str:
 def llm_debug_info() -> str:
     parts = [f"OPENAI_API_KEY presente: {'sí' if has_openai() else 'no'}"]
     global _OPENAI_MODE, _LAST_LLM_ERROR
-    try:
-        import openai  # noqa: F401
+    # sin importar openai (~1 s): se importa recién al crear el cliente (_make_client)
+    from importlib.util import find_spec
+    if find_spec("openai") is not None:
         ver = _get_openai_version()
-        parts.append(f"openai import: ok (v{ver})")
+        parts.append(f"openai instalado (v{ver})" + ("" if _OPENAI_MODE else ", se importa al primer uso"))
         if _OPENAI_MODE:
             parts.append(f"modo: {_OPENAI_MODE}")
-    except Exception as e:
-        parts.append(f"openai import: ERROR ({e})")
+    else:
+        parts.append("openai import: ERROR (paquete no instalado)")
     if _LAST_LLM_ERROR:
         parts.append(f"último error LLM: {_LAST_LLM_ERROR}")
+    parts.append(f"circuito: {BREAKER.describe()}")
+    cassette = active_cassette()
+    if cassette is not None:
+        c = cassette.stats()
+        parts.append(f"cassette {c['mode']}: {c['hits']} hits, {c['misses']} misses, {c['recorded']} grabadas")
+    flights = {n: f for n, f in singleflight_stats().items() if f["deduped"]}
+    if flights:
+        parts.append("coalescidas: " + ", ".join(
+            f"{n} {f['deduped']}/{f['executed'] + f['deduped']}" for n, f in sorted(flights.items())
+        ))
+    usage = usage_summary()
+    if usage:
+        parts.append("tokens: " + ", ".join(
+            f"{r} {u['calls']}× {u['prompt_tokens']}→{u['completion_tokens']}" for r, u in sorted(usage.items())
+        ))
     return " | ".join(parts)
 
 # ---------------------- duckdb perezoso ----------------------
@@ -49,6 +83,8 @@ def _import_duckdb():
         return None, e
 
 # ---------------------- helpers SQL ----------------------
+DISPLAY_LIMIT = 200  # LIMIT por defecto de Auto-SQL (solo pantalla)
+
 def _normalize_sql(sql: str, params: dict | None = None) -> str:
     if not isinstance(sql, str):
         return ""
@@ -69,18 +105,32 @@ def _normalize_sql(sql: str, params: dict | None = None) -> str:
     sql = re.sub(r"\s+", " ", sql).strip()
     sql = re.sub(r"(?:\s+limit\s+\d+\s*)+$", "", sql, flags=re.I)
     if re.search(r"\blimit\b", sql, flags=re.I) is None:
-        sql += " LIMIT 200"
+        sql += f" LIMIT {DISPLAY_LIMIT}"
     return sql
 
+def unlimited_sql(sql: str) -> str:
+    """Quita el LIMIT de pantalla final (el que agrega _normalize_sql o el prompt); otro LIMIT es intención del usuario."""
+    return re.sub(rf"\s+limit\s+{DISPLAY_LIMIT}\s*$", "", sql or "", flags=re.I)
+
 # ---------------------- cliente openai compatible por VERSIÓN ----------------------
+_CLIENT_CACHE: dict[tuple, tuple] = {}
+
+def _model() -> str:
+    return os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+
 def _make_client():
     """
     Devuelve (modo, cliente):
       - 'v1' → from openai import OpenAI; usar client.chat.completions.create(...)
       - 'v0' → import openai; usar openai.ChatCompletion.create(...)
     La elección se hace por número de versión (>=1 => v1, 0.x => v0).
+    El cliente se reutiliza por API key (mantiene el pool de conexiones entre llamadas).
     """
     global _OPENAI_MODE
+    key = (os.environ.get("OPENAI_API_KEY"), os.environ.get("OPENAI_BASE_URL"))
+    if key in _CLIENT_CACHE:
+        _OPENAI_MODE = _CLIENT_CACHE[key][0]
+        return _CLIENT_CACHE[key]
     try:
         ver = _get_openai_version()
         # Parse simple: si empieza con "0." → v0; en otro caso → v1
@@ -89,57 +139,75 @@ def _make_client():
             import openai as _oa
             _OPENAI_MODE = "v0"
             _oa.api_key = os.environ.get("OPENAI_API_KEY")
-            return "v0", _oa
+            _CLIENT_CACHE[key] = ("v0", _oa)
         else:
             from openai import OpenAI
             _OPENAI_MODE = "v1"
-            return "v1", OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+            # sin reintentos del SDK: los maneja call_with_policy (deadline + breaker)
+            _CLIENT_CACHE[key] = ("v1", OpenAI(api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0))
+        return _CLIENT_CACHE[key]
     except Exception as e:
         raise RuntimeError(f"No se pudo inicializar openai: {e}")
 
-# ---------------------- funciones públicas LLM ----------------------
-def summarize_markdown(table_md: str, question: str) -> str:
-    global _LAST_LLM_ERROR
-    if not has_openai():
-        return "Resumen: (sin OPENAI_API_KEY) Se muestran los resultados solicitados."
-    _LAST_LLM_ERROR = None
-    try:
-        mode, client = _make_client()
-        prompt = (
-            "Eres un analista. Resume y prioriza para gestión la siguiente tabla "
-            f"respecto a la pregunta: \"{question}\". Sé claro y accionable.\n\n{table_md}"
-        )
+def _field(obj, name, default=None):
+    # acceso uniforme a respuestas v1 (atributos) y v0 (dict)
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+def _chat(route: str, messages: list[dict], temperature: float = 0.1, **extra):
+    """
+    Chat completion compartido por todas las rutas (nl2sql, summarize, parse_question, queryspec).
+    Aplica el tope de tokens de salida de la ruta, el deadline/reintentos/circuit breaker
+    (utils.resilience) y registra tokens de prompt/completion. Devuelve el mensaje del primer choice.
+    """
+    kwargs = dict(model=_model(), messages=messages, temperature=temperature,
+                  max_tokens=completion_budget(route), **extra)
+    cassette = active_cassette()
+    if cassette is not None and cassette.mode == "replay":
+        msg, usage = cassette.lookup(route, kwargs)
+        record_usage(route, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), estimated=True)
+        return msg
+
+    mode, client = _make_client()
+
+    def _once(timeout: float):
         if mode == "v1":
-            resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-            )
-            return resp.choices[0].message.content
-        else:  # v0
-            resp = client.ChatCompletion.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-            )
-            return resp["choices"][0]["message"]["content"]
-    except Exception as e:
-        _LAST_LLM_ERROR = f"LLM summarize error: {e}"
-        return f"(Error LLM: {e})"
+            return client.chat.completions.create(timeout=timeout, **kwargs)
+        return client.ChatCompletion.create(request_timeout=timeout, **kwargs)  # v0
 
-def nl2sql(question: str, schema_hint: str, params: dict | None = None) -> str | None:
-    global _LAST_LLM_ERROR
-    if not has_openai():
-        _LAST_LLM_ERROR = "OPENAI_API_KEY no presente en entorno"
-        return None
+    t0 = time.perf_counter()
+    resp = call_with_policy(route, _once)
+    latency = time.perf_counter() - t0
+    msg = _field(_field(resp, "choices")[0], "message")
+    usage = _field(resp, "usage")
+    pt, ct = _field(usage, "prompt_tokens"), _field(usage, "completion_tokens")
+    cached = _field(_field(usage, "prompt_tokens_details"), "cached_tokens", 0)
+    estimated = pt is None
+    if estimated:
+        pt = messages_tokens(messages)
+        ct = estimate_tokens(_field(msg, "content") or "")
+    record_usage(route, pt, ct, cached_tokens=cached or 0, latency_s=latency, estimated=estimated)
+    if cassette is not None:  # record
+        cassette.record(route, kwargs, msg, {"prompt_tokens": pt, "completion_tokens": ct})
+    return msg
 
-    _LAST_LLM_ERROR = None
-    p = params or {}
-    H = p.get("HORIZONTE_DIAS", 7)
+def _content(msg) -> str:
+    return (_field(msg, "content") or "").strip()
+
+# ---------------------- prompts estáticos (prefijo estable) ----------------------
+_SUMMARY_SYSTEM = (
+    "Eres un analista. Resume y prioriza para gestión el resultado que te entregan "
+    "respecto a la pregunta del usuario. Recibes agregados calculados sobre TODAS las filas "
+    "(conteos, sumas, percentiles, rangos de fechas, top clientes/marcas) y unas pocas filas "
+    "de ejemplo: basa las cifras en los agregados. Sé claro y accionable."
+)
 
-    examples = f"""
-# Esquema disponible
-{schema_hint}
+# Sin valores variables: HORIZONTE_DIAS/MES_SELECCIONADO se reemplazan en _normalize_sql,
+# así el prefijo es idéntico en todas las llamadas y el proveedor puede cachearlo.
+_NL2SQL_SYSTEM = """Devuelve SOLO SQL DuckDB seguro; nada de texto extra.
 
 # Instrucciones
 - Devuelve SOLO una consulta SQL DuckDB válida y segura (sin comentarios ni explicación).
@@ -152,6 +220,7 @@ def nl2sql(question: str, schema_hint: str, params: dict | None = None) -> str |
 - 'por pagar' = FIN.por_pagar_bool = TRUE
 - Para facturación mensual usa COALESCE(MB.factura_fecha, MB.fecha_entrega) = MB.fecha_op
 - Un solo LIMIT (200) si no se especifica. No agregues ';'.
+- Para "próximos días" sin número usa el literal HORIZONTE_DIAS.
 
 # Ejemplos
 Q: ¿Cuáles son los vehículos entregados que aún no han sido facturas?
@@ -184,45 +253,135 @@ A:
 SELECT FIN.factura_num, FIN.proveedor, FIN.vencimiento, FIN.monto
 FROM FIN
 WHERE FIN.por_pagar_bool = TRUE
-  AND FIN.vencimiento BETWEEN CURRENT_DATE AND CURRENT_DATE + INTERVAL {H} DAY
+  AND FIN.vencimiento BETWEEN CURRENT_DATE AND CURRENT_DATE + INTERVAL HORIZONTE_DIAS DAY
 ORDER BY FIN.vencimiento ASC
 LIMIT 200
 """
+
+# ---------------------- funciones públicas LLM ----------------------
+def _local_summary(table_md: str) -> str:
+    # sin proveedor: los primeros agregados del digest ya son un resumen útil
+    head = [l for l in (table_md or "").splitlines() if l.strip()][:8]
+    return "Resumen (local, LLM no disponible):\n\n" + "\n".join(f"- {l}" for l in head if not l.startswith("|"))
+
+def summarize_markdown(table_md: str, question: str) -> str:
+    from .nlp import norm_question
+    key = (norm_question(question), hash(table_md))
+    return flight("summarize").do(key, lambda: _summarize_markdown(table_md, question))
+
+def _summarize_markdown(table_md: str, question: str) -> str:
+    global _LAST_LLM_ERROR
+    if not has_openai():
+        return "Resumen: (sin OPENAI_API_KEY) Se muestran los resultados solicitados."
+    _LAST_LLM_ERROR = None
     try:
-        mode, client = _make_client()
-        if mode == "v1":
-            resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "Devuelve SOLO SQL DuckDB seguro; nada de texto extra."},
-                    {"role": "user", "content": examples + f"\n\nAhora devuelve la SQL para:\n{question}"},
-                ],
-                temperature=0.1,
-            )
-            raw = resp.choices[0].message.content.strip()
-        else:  # v0
-            resp = client.ChatCompletion.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "Devuelve SOLO SQL DuckDB seguro; nada de texto extra."},
-                    {"role": "user", "content": examples + f"\n\nAhora devuelve la SQL para:\n{question}"},
-                ],
-                temperature=0.1,
-            )
-            raw = resp["choices"][0]["message"]["content"].strip()
+        messages = build_messages("summarize", _SUMMARY_SYSTEM, [table_md], f"Pregunta: \"{question}\"")
+        return _content(_chat("summarize", messages, temperature=0.2))
+    except CircuitOpenError as e:
+        _LAST_LLM_ERROR = f"LLM summarize: {e}"
+        return _local_summary(table_md)
+    except Exception as e:
+        _LAST_LLM_ERROR = f"LLM summarize error: {e}"
+        return f"(Error LLM: {e})"
 
+def nl2sql(question: str, schema_hint: str, params: dict | None = None) -> str | None:
+    from .nlp import norm_question
+    key = (norm_question(question), schema_hint, tuple(sorted((params or {}).items())))
+    return flight("nl2sql").do(key, lambda: _nl2sql(question, schema_hint, params))
+
+def _nl2sql(question: str, schema_hint: str, params: dict | None = None) -> str | None:
+    global _LAST_LLM_ERROR
+    if not has_openai():
+        _LAST_LLM_ERROR = "OPENAI_API_KEY no presente en entorno"
+        return None
+
+    _LAST_LLM_ERROR = None
+    p = params or {}
+    try:
+        messages = build_messages(
+            "nl2sql",
+            _NL2SQL_SYSTEM,
+            [f"# Esquema disponible\n{schema_hint}"],
+            f"Ahora devuelve la SQL para:\n{question}",
+        )
+        raw = _content(_chat("nl2sql", messages, temperature=0.1))
         return _normalize_sql(raw, params=p)
     except Exception as e:
         _LAST_LLM_ERROR = f"LLM nl2sql error: {e}"
         return None
 
 def run_duckdb(sql: str, tables: dict[str, pd.DataFrame], prelude_sql: str | None = None) -> pd.DataFrame:
+    # misma SQL sobre el mismo snapshot en vuelo → una sola ejecución compartida
+    key = (sql, prelude_sql, snapshot_version(tables))
+    return flight("run_duckdb").do(key, lambda: _run_duckdb(sql, tables, prelude_sql))
+
+# ---------------------- sesión DuckDB por snapshot ----------------------
+# Una base en memoria por (snapshot, prelude) con las vistas MB/FIN ya creadas; cada consulta abre un
+# cursor (conexión hija, segura entre hilos) y registra los DataFrames sin copiarlos: los registros son
+# por conexión, las vistas son de la base compartida.
+_SESSIONS: "OrderedDict[tuple, object]" = OrderedDict()
+_SESSIONS_LOCK = threading.Lock()
+_SESSIONS_MAX = 4
+
+def duckdb_session(tables: dict[str, pd.DataFrame], prelude_sql: str | None = None):
     duckdb, err = _import_duckdb()
     if err is not None:
         raise RuntimeError(f"DuckDB no disponible: {err}")
-    con = duckdb.connect()
+    key = (snapshot_version(tables), prelude_sql)
+    with _SESSIONS_LOCK:
+        con = _SESSIONS.get(key)
+        if con is not None:
+            _SESSIONS.move_to_end(key)
+            return con
+
+    def build():
+        con = duckdb.connect()
+        for name, df in tables.items():
+            con.register(name, df)
+        if prelude_sql:
+            con.execute(prelude_sql)
+        with _SESSIONS_LOCK:
+            _SESSIONS[key] = con
+            while len(_SESSIONS) > _SESSIONS_MAX:
+                _SESSIONS.popitem(last=False)
+        return con
+    return flight("duckdb_session").do(key, build)
+
+_READONLY_RE = re.compile(r"^\s*\(?\s*(select|with|from)\b[^;]*$", re.I | re.S)
+
+def _cursor(tables: dict[str, pd.DataFrame], prelude_sql: str | None = None, sql: str = ""):
+    if not _READONLY_RE.match(sql or ""):
+        # DDL/varias sentencias (SQL del LLM sin validar) → conexión aislada: no tocan la base compartida
+        duckdb, err = _import_duckdb()
+        if err is not None:
+            raise RuntimeError(f"DuckDB no disponible: {err}")
+        cur = duckdb.connect()
+        for name, df in tables.items():
+            cur.register(name, df)
+        if prelude_sql:
+            cur.execute(prelude_sql)
+        return cur
+    con = duckdb_session(tables, prelude_sql)
+    with _SESSIONS_LOCK:
+        cur = con.cursor()
     for name, df in tables.items():
-        con.register(name, df)
-    if prelude_sql:
-        con.execute(prelude_sql)
-    return con.execute(sql).df()
+        cur.register(name, df)
+    return cur
+
+def _run_duckdb(sql: str, tables: dict[str, pd.DataFrame], prelude_sql: str | None = None) -> pd.DataFrame:
+    cur = _cursor(tables, prelude_sql, sql)
+    try:
+        return cur.execute(sql).df()
+    finally:
+        cur.close()
+
+def iter_duckdb(sql: str, tables: dict[str, pd.DataFrame], prelude_sql: str | None = None,
+                chunk_rows: int = 50_000):
+    """Resultado de `sql` en bloques de `chunk_rows` filas (DataFrames), sin materializarlo completo."""
+    con = _cursor(tables, prelude_sql, sql)
+    try:
+        reader = con.execute(sql).fetch_record_batch(chunk_rows)
+        for batch in reader:
+            yield batch.to_pandas()
+    finally:
+        con.close()
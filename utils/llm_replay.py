@@ -0,0 +1,80 @@
+# utils/llm_replay.py — grabación/reproducción de llamadas LLM (benchmarks y regresión sin OpenAI)
+#   FENIX_LLM_REPLAY=record  → llama al proveedor y guarda cada respuesta en el cassette
+#   FENIX_LLM_REPLAY=replay  → responde solo desde el cassette (sin red); si falta → ReplayMiss
+#   FENIX_LLM_CASSETTE=ruta.jsonl (por defecto bench/cassettes/llm.jsonl)
+import os, json, hashlib, threading
+from types import SimpleNamespace
+
+DEFAULT_CASSETTE = "bench/cassettes/llm.jsonl"
+
+class ReplayMiss(LookupError):
+    """No hay respuesta grabada para esta llamada (modo replay)."""
+
+def _key(route: str, kwargs: dict) -> str:
+    # timeout/request_timeout no forman parte de la identidad de la llamada
+    ident = {k: v for k, v in kwargs.items() if k not in ("timeout", "request_timeout")}
+    raw = json.dumps({"route": route, **ident}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _as_message(rec: dict) -> SimpleNamespace:
+    calls = [
+        SimpleNamespace(function=SimpleNamespace(name=c.get("name"), arguments=c.get("arguments")))
+        for c in rec.get("tool_calls") or []
+    ]
+    return SimpleNamespace(content=rec.get("content"), tool_calls=calls or None)
+
+class Cassette:
+    def __init__(self, path: str, mode: str):
+        self.path, self.mode = path, mode
+        self._lock = threading.Lock()
+        self._records: dict[str, dict] = {}
+        self.hits = self.misses = self.recorded = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        rec = json.loads(line)
+                        self._records[rec["key"]] = rec
+
+    def lookup(self, route: str, kwargs: dict) -> tuple[SimpleNamespace, dict]:
+        rec = self._records.get(_key(route, kwargs))
+        with self._lock:
+            if rec is None:
+                self.misses += 1
+                raise ReplayMiss(f"{route}: llamada no grabada en {self.path}")
+            self.hits += 1
+        return _as_message(rec), rec.get("usage") or {}
+
+    def record(self, route: str, kwargs: dict, msg, usage: dict) -> None:
+        get = (lambda o, n: o.get(n) if isinstance(o, dict) else getattr(o, n, None))
+        calls = [
+            {"name": get(get(c, "function"), "name"), "arguments": get(get(c, "function"), "arguments")}
+            for c in (get(msg, "tool_calls") or [])
+        ]
+        rec = {"key": _key(route, kwargs), "route": route, "content": get(msg, "content"),
+               "tool_calls": calls, "usage": usage}
+        with self._lock:
+            self._records[rec["key"]] = rec
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self.recorded += 1
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "path": self.path, "entries": len(self._records),
+                "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+_ACTIVE: Cassette | None = None
+_ACTIVE_LOCK = threading.Lock()
+
+def active_cassette() -> Cassette | None:
+    """Cassette según el entorno (se reabre si cambia modo o ruta)."""
+    global _ACTIVE
+    mode = os.environ.get("FENIX_LLM_REPLAY", "").strip().lower()
+    if mode not in ("record", "replay"):
+        return None
+    path = os.environ.get("FENIX_LLM_CASSETTE", DEFAULT_CASSETTE)
+    with _ACTIVE_LOCK:
+        if _ACTIVE is None or _ACTIVE.mode != mode or _ACTIVE.path != path:
+            _ACTIVE = Cassette(path, mode)
+        return _ACTIVE
@@ -0,0 +1,115 @@
+# utils/lookup.py — índice hash por clave (PATENTE / OT / NUMERO_FACTURA) → filas de MB
+# Se construye una vez por snapshot (vectorizado) y responde cada búsqueda en O(1):
+# "estado de la patente XX1234" ya no recorre la hoja completa con un "contiene".
+import re, threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+from .nlp import _norm
+from .finance import normalize_folio
+from .singleflight import flight
+from .snapshot import snapshot_version
+from .tracing import span, note_cache
+
+KEY_COLUMNS = {"patente": "PATENTE", "ot": "OT", "factura": "NUMERO_FACTURA"}
+_MAX_INDEXES = 4
+
+def _clean_key(s: pd.Series) -> pd.Series:
+    # mismo resultado que normalize_key (claves ASCII), pero vectorizado
+    out = s.astype(str).str.upper().str.replace(r"\.0$", "", regex=True).str.replace(r"[^0-9A-Z]", "", regex=True)
+    return out.where(~out.isin({"", "NAN", "NONE", "NAT"}))
+
+def normalize_key(kind: str, value) -> str:
+    """PATENTE 'ab-12·34' → 'AB1234'; OT '# 000123' → '123'; factura 'F-000123' → '123' (folio)."""
+    if kind == "factura":
+        v = normalize_folio(pd.Series([_norm(value)])).iloc[0]
+        return "" if pd.isna(v) else v
+    v = re.sub(r"[^0-9A-Z]", "", re.sub(r"\.0$", "", _norm(value).upper()))
+    if kind == "ot":
+        v = v.lstrip("0") or v
+    return v
+
+class KeyIndex:
+    def __init__(self, MB: pd.DataFrame):
+        self.frame = MB
+        self.maps: dict[str, dict[str, np.ndarray]] = {}
+        pos = pd.Series(np.arange(len(MB)), index=MB.index)
+        for kind, col in KEY_COLUMNS.items():
+            if col not in MB.columns:
+                self.maps[kind] = {}
+                continue
+            if kind == "factura":
+                keys = normalize_folio(MB[col])  # mismo folio que el cruce con FINANZAS
+            else:
+                keys = _clean_key(MB[col])
+            if kind == "ot":
+                stripped = keys.str.lstrip("0")
+                keys = stripped.where(stripped != "", keys)
+            self.maps[kind] = pos.groupby(keys.values, sort=False).indices
+
+    def positions(self, value, kinds=("patente", "ot", "factura")) -> tuple[str | None, np.ndarray]:
+        """(tipo de clave que calzó, posiciones de fila). Se prueba en orden patente → OT → factura."""
+        for kind in kinds:
+            hit = self.maps.get(kind, {}).get(normalize_key(kind, value))
+            if hit is not None:
+                return kind, hit
+        return None, np.empty(0, dtype=np.int64)
+
+    def rows(self, value, kinds=("patente", "ot", "factura")) -> pd.DataFrame:
+        _, pos = self.positions(value, kinds)
+        return self.frame.iloc[pos]
+
+_INDEXES: "OrderedDict[str, KeyIndex]" = OrderedDict()
+_LOCK = threading.Lock()
+
+def key_index(MB: pd.DataFrame) -> KeyIndex:
+    """KeyIndex de MB cacheado por versión de snapshot (MB viene de skills.mb_for)."""
+    key = (snapshot_version(MB), len(MB))
+    with _LOCK:
+        idx = _INDEXES.get(key)
+        if idx is not None:
+            _INDEXES.move_to_end(key)
+            note_cache("key_index", True)
+            return idx
+    note_cache("key_index", False)
+
+    def build():
+        with span("key_index", rows=int(len(MB))):
+            idx = KeyIndex(MB)
+        with _LOCK:
+            _INDEXES[key] = idx
+            while len(_INDEXES) > _MAX_INDEXES:
+                _INDEXES.popitem(last=False)
+        return idx
+    return flight("key_index").do(key, build)
+
+# --------- claves en texto libre / listas pegadas ----------
+_Q_KEY_RE = re.compile(
+    r"\b(?:(?P<patente>patente|placa|matricula)|(?P<ot>ot|orden de trabajo)|(?P<factura>factura|folio))\b"
+    r"\s*(?:n[°ºo]?\.?|numero|nro\.?|#)?\s*:?\s*(?P<valor>[a-z0-9][a-z0-9\-\.·]{2,})",
+)
+
+def keys_in_question(q: str) -> list[tuple[str, str]]:
+    """[(tipo, valor)] para 'estado de la patente XX1234', 'OT 4512', 'factura n° 00123'."""
+    s = _norm(q)
+    out = []
+    for m in _Q_KEY_RE.finditer(s):
+        val = m.group("valor").strip(".-·")
+        if not any(ch.isdigit() for ch in val):  # "patente del cliente ..." no es una clave
+            continue
+        out.append((next(k for k in KEY_COLUMNS if m.group(k)), val))
+    return out
+
+def split_keys(text: str) -> list[str]:
+    """
+    Lista pegada (una por línea, o separadas por coma/punto y coma), normalizada y sin duplicados.
+    Los espacios no separan: 'AB 1234' es una sola clave (normalize_key los quita).
+    """
+    seen, out = set(), []
+    for tok in re.split(r"[\r\n,;]+", str(text or "")):
+        key = normalize_key("patente", tok)  # limpieza común a los tres tipos; positions() ajusta por tipo
+        if key and key not in seen:
+            seen.add(key)
+            out.append(key)
+    return out
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 def df_to_md(df: pd.DataFrame) -> str:
@@ -5,3 +6,114 @@ def df_to_md(df: pd.DataFrame) -> str:
         return df.head(50).to_markdown(index=False)
     except Exception:
         return df.head(50).to_csv(index=False)
+
+# ---------------- Digest estadístico (para resumir con LLM) ----------------
+_AMOUNT_KEYS = ["monto", "total", "valor", "neto", "bruto", "importe"]
+_DAYS_KEYS   = ["dias", "días"]
+_TOPK_KEYS   = ["cliente", "marca", "tipo_cliente", "sucursal", "estado"]
+
+def _num(x) -> str:
+    if pd.isna(x): return "-"
+    return f"{x:,.0f}".replace(",", ".") if abs(x) >= 100 else f"{x:.1f}".rstrip("0").rstrip(".")
+
+def _is_amount(c: str) -> bool:
+    return any(k in c.lower() for k in _AMOUNT_KEYS)
+
+def _is_days(c: str) -> bool:
+    return any(k in c.lower() for k in _DAYS_KEYS)
+
+def _min(a, b):
+    return b if pd.isna(a) else a if pd.isna(b) else min(a, b)
+
+def _max(a, b):
+    return b if pd.isna(a) else a if pd.isna(b) else max(a, b)
+
+def _as_dates(s: pd.Series) -> pd.Series:
+    return s if pd.api.types.is_datetime64_any_dtype(s) else pd.to_datetime(s, errors="coerce")
+
+def df_digest(df: pd.DataFrame, k: int = 5, sample_rows: int = 5, chunks=None) -> str:
+    """
+    Resumen compacto de TODO el resultado: conteos, sumas de montos, percentiles de días,
+    rangos de fechas, top-k de clientes/marcas y unas pocas filas de ejemplo.
+    Reemplaza al volcado de 50 filas en markdown: cubre todas las filas con una fracción de tokens.
+    `chunks`: bloques del resultado sin tope (p. ej. iter_duckdb sin el LIMIT de pantalla); las estadísticas
+    se acumulan bloque a bloque sobre ellos y `df` (lo que se muestra) solo aporta los ejemplos.
+    """
+    n, first, acc = 0, None, {}
+    for ch in ([df] if chunks is None else chunks):
+        if ch is None or ch.empty:
+            continue
+        if first is None:
+            first = ch
+            num_cols = [c for c in ch.columns
+                        if pd.api.types.is_numeric_dtype(ch[c]) and not pd.api.types.is_bool_dtype(ch[c])]
+            amount_cols = [c for c in num_cols if _is_amount(str(c))]
+            days_cols = [c for c in num_cols if _is_days(str(c)) and c not in amount_cols]
+            other_num = [c for c in num_cols if c not in amount_cols and c not in days_cols]
+            bool_cols = [c for c in ch.columns if pd.api.types.is_bool_dtype(ch[c])]
+            date_cols = [c for c in ch.columns if pd.api.types.is_datetime64_any_dtype(ch[c])
+                         or ("fecha" in str(c).lower() and ch[c].dtype == object)]
+            amount = amount_cols[0] if amount_cols else None
+            topk_cols = [c for c in ch.columns
+                         if any(key in str(c).lower() for key in _TOPK_KEYS) and c not in num_cols]
+        n += len(ch)
+        for c in amount_cols + other_num:
+            s, a = ch[c], acc.setdefault(c, {"sum": 0, "count": 0, "min": float("nan"), "max": float("nan")})
+            a["sum"] += s.sum()
+            a["count"] += int(s.count())
+            a["min"], a["max"] = _min(a["min"], s.min()), _max(a["max"], s.max())
+        for c in days_cols:  # percentiles: se guardan los valores (una columna numérica)
+            acc.setdefault(c, []).append(ch[c].dropna().to_numpy())
+        for c in bool_cols:
+            acc[c] = acc.get(c, 0) + int(ch[c].sum())
+        for c in date_cols:
+            d, a = _as_dates(ch[c]), acc.setdefault(c, {"min": pd.NaT, "max": pd.NaT, "na": 0})
+            a["min"], a["max"] = _min(a["min"], d.min()), _max(a["max"], d.max())
+            a["na"] += int(d.isna().sum())
+        for c in topk_cols:
+            key = ch[c].astype("string").fillna("(vacío)")
+            g = ch.groupby(key, dropna=False)[amount].agg(["size", "sum"]) if amount else \
+                key.value_counts().to_frame("size")
+            acc[c] = g if c not in acc else acc[c].add(g, fill_value=0)
+    if first is None:
+        return "Resultado vacío (0 filas)."
+    lines = [f"Filas: {n} | Columnas: {', '.join(map(str, first.columns))}"]
+
+    for c in amount_cols:
+        a = acc[c]
+        mean = a["sum"] / a["count"] if a["count"] else float("nan")
+        lines.append(
+            f"{c}: suma {_num(a['sum'])} | media {_num(mean)} | min {_num(a['min'])} | max {_num(a['max'])} | nulos {n - a['count']}"
+        )
+    for c in days_cols:
+        s = pd.Series(np.concatenate(acc[c]))
+        if s.empty: continue
+        q = s.quantile([0.5, 0.9])
+        lines.append(
+            f"{c}: min {_num(s.min())} | p50 {_num(q.loc[0.5])} | p90 {_num(q.loc[0.9])} | max {_num(s.max())} | media {_num(s.mean())}"
+        )
+    for c in other_num:
+        a = acc[c]
+        lines.append(f"{c}: suma {_num(a['sum'])} | min {_num(a['min'])} | max {_num(a['max'])}")
+
+    for c in bool_cols:
+        lines.append(f"{c}: {acc[c]} verdaderos de {n}")
+
+    for c in date_cols:
+        a = acc[c]
+        if not pd.isna(a["min"]):
+            lines.append(f"{c}: {a['min']:%Y-%m-%d} → {a['max']:%Y-%m-%d} (sin fecha: {a['na']})")
+
+    for c in topk_cols:
+        g = acc[c].sort_values("size", ascending=False, kind="stable")
+        if amount:
+            top = [f"{idx} ({int(r['size'])}; {_num(r['sum'])})" for idx, r in g.head(k).iterrows()]
+        else:
+            top = [f"{idx} ({int(v)})" for idx, v in g["size"].head(k).items()]
+        lines.append(f"Top {c} (filas{'; ' + str(amount) if amount else ''}): " + ", ".join(top)
+                     + f" | distintos: {len(g)}")
+
+    sample = df if df is not None and not df.empty else first
+    lines.append(f"\nEjemplos ({min(sample_rows, n)} de {n} filas):")
+    lines.append(df_to_md(sample.head(sample_rows)))
+    return "\n".join(lines)
@@ -0,0 +1,177 @@
+# utils/memprof.py — perfilado de memoria opcional por etapa: tracemalloc (pico/neto) + muestreo de RSS
+# Apagado por defecto: tracemalloc hace más lento todo el proceso (~2×), así que se activa a pedido
+# (FENIX_MEMPROF=1 al arrancar, o el toggle del sidebar con ?debug=1) y se apaga igual.
+# Las cifras son del proceso completo: con varios usuarios en paralelo incluyen sus asignaciones.
+# utils.tracing llama a stage_start/stage_end en cada span y a question_start/question_end por traza.
+import os, time, threading, tracemalloc
+
+NFRAMES = 4  # frames por asignación: alcanza para llegar al sitio propio bajo pandas; más frames = más lento
+TOP_SITES = 10
+RSS_INTERVAL_S = 0.01
+_PKG = os.path.dirname(os.path.abspath(__file__))
+_ROOT = os.path.dirname(_PKG)
+_IGNORE = (tracemalloc.__file__, "<frozen importlib", "<unknown>")
+_lock = threading.Lock()
+_owner = False  # tracemalloc lo inició este módulo (y por lo tanto puede detenerlo)
+
+def enabled() -> bool:
+    return tracemalloc.is_tracing()
+
+def enable(nframes: int = NFRAMES) -> None:
+    global _owner
+    with _lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(nframes)
+            _owner = True
+
+def disable() -> None:
+    global _owner
+    with _lock:
+        if _owner and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        _owner = False
+
+if os.environ.get("FENIX_MEMPROF", "").lower() in ("1", "true", "on"):
+    enable()
+
+# ---------------------- RSS ----------------------
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def rss_bytes() -> int:
+    """RSS actual (Linux: /proc/self/statm); en otros sistemas, el máximo histórico de getrusage."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, IndexError, ValueError):
+        import resource, sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+class RssSampler:
+    """Hilo que muestrea RSS cada `interval` s mientras dura una pregunta; peak(t0, t1) usa la ventana."""
+    def __init__(self, interval: float = RSS_INTERVAL_S):
+        self.interval = interval
+        self.samples: list[tuple[float, int]] = [(time.perf_counter(), rss_bytes())]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="fenix-rss", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.samples.append((time.perf_counter(), rss_bytes()))
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
+        self.samples.append((time.perf_counter(), rss_bytes()))
+
+    def peak(self, t0: float, t1: float | None = None) -> int:
+        t1 = time.perf_counter() if t1 is None else t1
+        window = [r for t, r in list(self.samples) if t0 <= t <= t1]
+        return max(window) if window else rss_bytes()
+
+# ---------------------- etapas ----------------------
+_MB = 2**20
+
+def stage_start(parent: dict | None) -> dict | None:
+    """
+    Marca de inicio de una etapa. tracemalloc tiene un solo pico global: se guarda el pico que llevaba
+    la etapa contenedora antes de reiniciarlo, y al cerrar la hija se le devuelve (carry).
+    """
+    if not tracemalloc.is_tracing():
+        return None
+    cur, outer_peak = tracemalloc.get_traced_memory()
+    if parent is not None:
+        parent["carry"] = max(parent.get("carry", 0), outer_peak)
+    tracemalloc.reset_peak()
+    return {"cur0": cur, "t0": time.perf_counter(), "carry": 0}
+
+def stage_end(mark: dict | None, parent: dict | None, sampler: RssSampler | None = None) -> dict:
+    """{mem_peak_mb, mem_net_mb[, rss_peak_mb]} de la etapa (pico sobre lo vivo al empezar)."""
+    if mark is None or not tracemalloc.is_tracing():
+        return {}
+    cur, peak = tracemalloc.get_traced_memory()
+    peak = max(peak, mark["carry"])
+    if parent is not None:
+        parent["carry"] = max(parent.get("carry", 0), peak)
+    out = {"mem_peak_mb": round((peak - mark["cur0"]) / _MB, 2), "mem_net_mb": round((cur - mark["cur0"]) / _MB, 2)}
+    if sampler is not None:
+        out["rss_peak_mb"] = round(sampler.peak(mark["t0"]) / _MB, 1)
+    return out
+
+# ---------------------- por pregunta ----------------------
+def _site(tb) -> str | None:
+    # frame propio (app.py/utils/bench) más interno; si no hay, el más interno.
+    # tracemalloc.Traceback va del más antiguo al más reciente: tb[-1] es el que asignó
+    if tb[-1].filename.startswith(_IGNORE):
+        return None
+    for fr in reversed(tb):
+        if fr.filename.startswith(_ROOT) and "site-packages" not in fr.filename:
+            return f"{os.path.relpath(fr.filename, _ROOT)}:{fr.lineno}"
+    fr = tb[-1]
+    return f"{fr.filename.rsplit('site-packages/', 1)[-1]}:{fr.lineno}"
+
+def _by_site() -> dict[str, list[int]]:
+    """{sitio: [bytes, bloques]} de lo vivo ahora. Agrupa a mano: Snapshot.filter_traces/compare_to
+    son lentos con cientos de miles de bloques (MB completo trazado)."""
+    snap = tracemalloc.take_snapshot()
+    # Snapshot.traces._traces es interno de CPython: tuplas crudas (dominio, tamaño, frames, n), sin crear un
+    # Trace/Traceback por bloque (~3× más rápido con ~1M bloques). Probado con CPython 3.11; si el atributo
+    # falta o cambia de forma se usa snap.traces, que es la ruta soportada (mismo resultado, más lenta)
+    raw = getattr(snap.traces, "_traces", None)
+    if not (isinstance(raw, list) and (not raw or (isinstance(raw[0], tuple) and len(raw[0]) >= 3
+                                                   and isinstance(raw[0][2], tuple)))):
+        raw = None
+    rows = ((r[1], r[2]) for r in raw) if raw is not None else ((t.size, t.traceback) for t in snap.traces)
+    per_tb: dict = {}
+    for size, frames in rows:
+        agg = per_tb.get(frames)
+        if agg is None:
+            per_tb[frames] = [size, 1]
+        else:
+            agg[0] += size
+            agg[1] += 1
+    sites: dict[str, list[int]] = {}
+    for frames, (size, n) in per_tb.items():
+        tb = frames if isinstance(frames, tracemalloc.Traceback) else tracemalloc.Traceback(frames)
+        site = _site(tb)
+        if site is not None:
+            agg = sites.setdefault(site, [0, 0])
+            agg[0] += size
+            agg[1] += n
+    return sites
+
+def question_start() -> dict | None:
+    if not tracemalloc.is_tracing():
+        return None
+    mark = stage_start(None)
+    mark["sites"] = _by_site()
+    mark["rss0"] = rss_bytes()
+    mark["sampler"] = RssSampler()
+    return mark
+
+def question_end(mark: dict | None, top: int = TOP_SITES) -> dict:
+    """
+    Resumen de la pregunta: pico/neto, RSS inicial/pico y los sitios que más memoria retienen al final
+    (diferencia de snapshots agrupada por la línea propia que originó la asignación).
+    """
+    if mark is None:
+        return {}
+    sampler = mark.pop("sampler")
+    sampler.stop()
+    out = stage_end(mark, None)
+    if not tracemalloc.is_tracing():
+        return out
+    before = mark.pop("sites")
+    grown = []
+    for site, (size, n) in _by_site().items():
+        b0, n0 = before.get(site, (0, 0))
+        if size > b0:
+            grown.append((site, (size - b0, n - n0)))
+    ranked = sorted(grown, key=lambda kv: -kv[1][0])[:top]
+    out.update(
+        rss_start_mb=round(mark["rss0"] / _MB, 1),
+        rss_peak_mb=round(sampler.peak(mark["t0"]) / _MB, 1),
+        top=[{"site": s, "mb": round(b / _MB, 3), "blocks": n} for s, (b, n) in ranked],
+    )
+    return out
@@ -1,6 +1,5 @@
 # utils/nlp.py
-import re, os, json, unicodedata
-import pandas as pd
+import re, json, unicodedata
 
 def _norm(s: str) -> str:
     if s is None: return ""
@@ -8,28 +7,22 @@ def _norm(s: str) -> str:
     s = "".join([c for c in s if not unicodedata.category(c).startswith("M")])
     return s.lower().strip()
 
+def norm_question(q: str) -> str:
+    """Clave de pregunta: sin acentos/mayúsculas/puntuación de borde ni espacios repetidos."""
+    return re.sub(r"[\s¿?¡!.,;]+", " ", _norm(q)).strip()
+
 def find_col(df, synonyms):
-    """Busca por contiene, sin acentos y case-insensitive."""
-    cols = list(df.columns)
-    ncols = [_norm(c) for c in cols]
-    for syn in synonyms:
-        ns = _norm(syn)
-        for i, nc in enumerate(ncols):
-            if ns in nc:
-                return cols[i]
-    return None
+    """Busca por contiene, sin acentos y case-insensitive (encabezados normalizados cacheados)."""
+    from .colplan import match_synonyms
+    return match_synonyms(tuple(map(str, df.columns)), tuple(synonyms))[0]
 
-def ilike(series, term):
+def ilike(series, term, index=None):
+    """"Contiene" sin acentos ni mayúsculas. `index`: TrigramIndex del frame completo (utils/textindex.py)."""
     if not term: return series.astype(str).str.len() >= 0
-    return series.astype(str).str.contains(re.escape(term), case=False, na=False)
+    from .textindex import contains_mask
+    return contains_mask(series, str(term), index=index)
 
 # --------- Parser NL->JSON (si ya lo tienes, déjalo) ----------
-def _get_client():
-    from openai import OpenAI
-    api = os.environ.get("OPENAI_API_KEY")
-    if not api: return None
-    return OpenAI(api_key=api)
-
 INTENT_SCHEMA = {
   "name": "resolve_question",
   "description": "Mapea la pregunta a una métrica del catálogo y filtros. Devuelve solo argumentos JSON.",
@@ -44,23 +37,35 @@ INTENT_SCHEMA = {
   }
 }
 
+_PARSE_SYSTEM = "Eres un analista. Devuelve SOLO argumentos para la función."
+
 def parse_question_to_json(question: str, semantic_text: str) -> dict | None:
+    from .singleflight import flight
+    key = (norm_question(question), hash(semantic_text))
+    return flight("parse_question").do(key, lambda: _parse_question_to_json(question, semantic_text))
+
+def _parse_question_to_json(question: str, semantic_text: str) -> dict | None:
+    # import tardío: utils.llm → utils.prompts → utils.nlp
+    from .llm import _chat, _note_error, llm_available
+    from .prompts import build_messages, compact_catalog
     try:
-        client = _get_client()
-        if client is None: return None
-        msgs = [
-          {"role":"system","content":"Eres un analista. Devuelve SOLO argumentos para la función."},
-          {"role":"user","content": f"Catálogo:\n{semantic_text}\n\nPregunta:\n{question}"}
-        ]
-        resp = client.chat.completions.create(
-          model="gpt-4o-mini",
-          messages=msgs,
+        if not llm_available(): return None
+        msgs = build_messages(
+          "parse_question",
+          _PARSE_SYSTEM,
+          ["Catálogo:\n" + compact_catalog(semantic_text, question)],
+          f"Pregunta:\n{question}",
+        )
+        msg = _chat(
+          "parse_question",
+          msgs,
           tools=[{"type":"function","function":INTENT_SCHEMA}],
           tool_choice={"type":"function", "function":{"name":"resolve_question"}},
           temperature=0.1,
         )
-        args = resp.choices[0].message.tool_calls[0].function.arguments
-        import json
+        args = msg.tool_calls[0].function.arguments
         return json.loads(args)
-    except Exception:
+    except Exception as e:
+        # se deja rastro en llm_debug_info en vez de tragar el error
+        _note_error("parse_question", e)
         return None
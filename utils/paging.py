@@ -0,0 +1,116 @@
+# utils/paging.py — paginación en servidor de resultados grandes
+# KeysetPager: orden total (columna de orden, id, índice de fila) sobre el resultado completo de una
+# skill; cada página se busca por clave (searchsorted), no por offset. CursorPager: lee un cursor
+# (bloques de DuckDB o de un frame) solo hasta la página pedida. Al navegador va una página por vez.
+import numpy as np
+import pandas as pd
+
+PAGE_ROWS = 50
+
+def _collect(chunks) -> pd.DataFrame:
+    parts = list(chunks)
+    if not parts:
+        return pd.DataFrame()
+    return parts[0] if len(parts) == 1 else pd.concat(parts)
+
+class KeysetPager:
+    """
+    Páginas de `source()` (bloques de DataFrame) ordenadas por `by` (+ `tiebreak` + índice).
+    Nulos al final en ambos sentidos. El resultado se arma al pedir la primera página.
+    """
+    def __init__(self, source, by: str, ascending: bool = True, size: int = PAGE_ROWS, tiebreak: str = "id"):
+        self.source, self.by, self.ascending, self.size, self.tiebreak = source, by, ascending, size, tiebreak
+        self.frame = None
+        self._cursors = [None]  # cursor (clave) con que empieza cada página visitada
+
+    def _build(self):
+        df = _collect(self.source())
+        s = df[self.by] if self.by in df.columns else pd.Series(np.nan, index=df.index)
+        if pd.api.types.is_datetime64_any_dtype(s):
+            k = s.to_numpy("datetime64[ns]").astype("int64").astype("float64")
+            k[s.isna().to_numpy()] = np.nan
+        else:
+            k = pd.to_numeric(s, errors="coerce").to_numpy("float64")
+        k = k if self.ascending else -k
+        k = np.where(np.isnan(k), np.inf, k)
+        ids = (df[self.tiebreak] if self.tiebreak in df.columns else pd.Series("", index=df.index))
+        ids = ids.astype(str).to_numpy(dtype=object)
+        labels = np.arange(len(df)) if not pd.api.types.is_integer_dtype(df.index) else df.index.to_numpy()
+        order = np.lexsort((labels, ids, k))
+        self.frame = df.iloc[order]
+        self._k, self._ids, self._labels = k[order], ids[order], labels[order]
+
+    @property
+    def total(self) -> int | None:
+        return None if self.frame is None else len(self.frame)
+
+    def seek(self, after=None, size: int | None = None) -> tuple[pd.DataFrame, tuple | None]:
+        """Filas estrictamente después del cursor `after` (k, id, índice). Devuelve (página, cursor siguiente)."""
+        if self.frame is None:
+            self._build()
+        size = size or self.size
+        start = 0
+        if after is not None:
+            k, cid, clabel = after
+            lo = int(np.searchsorted(self._k, k, side="left"))
+            hi = int(np.searchsorted(self._k, k, side="right"))
+            ids, labels = self._ids[lo:hi], self._labels[lo:hi]
+            after_tie = (ids > cid) | ((ids == cid) & (labels > clabel))
+            start = lo + int(np.argmax(after_tie)) if after_tie.any() else hi
+        end = min(start + size, len(self.frame))
+        nxt = (self._k[end - 1], self._ids[end - 1], self._labels[end - 1]) if end < len(self.frame) else None
+        return self.frame.iloc[start:end], nxt
+
+    def page(self, i: int) -> tuple[pd.DataFrame, bool]:
+        """Página i (0-based) recorriendo cursores desde la última visitada. (filas, hay_siguiente)."""
+        i = max(0, i)
+        while len(self._cursors) <= i and self._cursors[-1] is not False:
+            _, nxt = self.seek(self._cursors[-1])
+            self._cursors.append(nxt if nxt is not None else False)
+        i = min(i, len(self._cursors) - 1)
+        if self._cursors[i] is False:
+            i -= 1
+        rows, nxt = self.seek(self._cursors[i])
+        return rows, nxt is not None
+
+class CursorPager:
+    """Páginas de un cursor de bloques (p. ej. llm.iter_duckdb): solo se lee hasta la página pedida."""
+    def __init__(self, source, size: int = PAGE_ROWS):
+        self.source, self.size = source, size
+        self._it = None
+        self._buf: list[pd.DataFrame] = []
+        self._rows = 0
+        self._done = False
+
+    @property
+    def total(self) -> int | None:
+        return self._rows if self._done else None
+
+    def _fill(self, upto: int):
+        if self._it is None:
+            self._it = iter(self.source())
+        while not self._done and self._rows < upto:
+            try:
+                chunk = next(self._it)
+            except StopIteration:
+                self._done = True
+                break
+            self._buf.append(chunk)
+            self._rows += len(chunk)
+        if len(self._buf) > 1:
+            self._buf = [pd.concat(self._buf)]
+
+    def page(self, i: int) -> tuple[pd.DataFrame, bool]:
+        i = max(0, i)
+        self._fill((i + 1) * self.size + 1)  # +1: saber si hay página siguiente
+        if i > 0 and i * self.size >= self._rows:
+            i = max(0, (self._rows - 1) // self.size)
+        buf = self._buf[0] if self._buf else pd.DataFrame()
+        start = i * self.size
+        return buf.iloc[start:start + self.size], self._rows > start + self.size
+
+def make_pager(source, order: tuple[str, bool] | None = None, size: int = PAGE_ROWS):
+    """order=(columna, ascendente) → KeysetPager; sin orden conocido → CursorPager (orden de la fuente)."""
+    if order is not None:
+        return KeysetPager(source, order[0], order[1], size=size)
+    return CursorPager(source, size=size)
@@ -0,0 +1,115 @@
+# utils/precompute.py — resultados por defecto de los botones rápidos, materializados por snapshot
+# Tras cada carga de hojas (load_sheets / GSheetSource) se calculan una vez las seis tarjetas con sus
+# parámetros por defecto; un clic con esos parámetros se sirve de aquí sin recalcular. Con otros
+# parámetros la tarjeta calcula a pedido como siempre. Clave: (versión de snapshot, hoy), igual que mb_for:
+# "próximos 7 días" y el mes actual cambian con la fecha aunque el snapshot no cambie.
+# Los DataFrames guardados se comparten entre sesiones: solo lectura.
+import time, logging, threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+from .snapshot import snapshot_version
+from .singleflight import flight
+from .tracing import span, note_cache
+from .skills import run_skill
+
+log = logging.getLogger("fenix.precompute")
+
+# skill del catálogo → parámetros por defecto de su tarjeta (facturación: mes actual, lo completa run_skill)
+QUICK_DEFAULTS = {
+    "entregados_sin_factura": {},
+    "entregados_facturados": {},
+    "top_en_taller": {"topn": 10},
+    "facturacion_por_mes_tipo": {},
+    "entregas_proximos_dias_sin_factura": {"horizonte_dias": 7},
+    "sin_aprobacion": {},
+}
+_MAX = 2  # snapshots guardados (el actual y el anterior mientras otra sesión termina su rerun)
+_STORE: "OrderedDict[tuple, dict]" = OrderedDict()
+_LOCK = threading.Lock()
+
+def _defaults(name: str) -> dict:
+    params = dict(QUICK_DEFAULTS[name])
+    if name == "facturacion_por_mes_tipo":
+        hoy = date.today()
+        params.update(mes=hoy.month, anio=hoy.year)
+    return params
+
+def is_default(name: str, params: dict) -> bool:
+    """¿Los parámetros de la tarjeta son los por defecto? (None/"" = filtro vacío)."""
+    if name not in QUICK_DEFAULTS:
+        return False
+    given = {k: v for k, v in params.items() if v not in (None, "")}
+    return given == _defaults(name)
+
+def _entry(data: dict) -> dict:
+    key = (snapshot_version(data), date.today())
+    with _LOCK:
+        e = _STORE.get(key)
+        if e is None:
+            raw = data.get("MODELO_BOT", next(iter(data.values())))
+            e = _STORE[key] = {"snapshot": key[0], "loaded_at": raw.attrs.get("loaded_at"),
+                               "results": {}, "started": False, "done_at": None}
+            while len(_STORE) > _MAX:
+                _STORE.popitem(last=False)
+        else:
+            _STORE.move_to_end(key)
+        return e
+
+def _compute(data: dict, e: dict, name: str) -> dict:
+    # singleflight por (snapshot, skill): el clic que llega mientras el hilo de fondo calcula la misma
+    # tarjeta espera ese cálculo en vez de repetirlo
+    def build():
+        if name in e["results"]:
+            return e["results"][name]
+        t0 = time.perf_counter()
+        with span(f"precompute:{name}"):
+            try:
+                df, err = run_skill(data, name, QUICK_DEFAULTS[name])
+            except Exception as ex:  # una tarjeta rota no impide las demás
+                df, err = None, f"{type(ex).__name__}: {ex}"
+        r = {"df": df, "err": err, "computed_at": datetime.now().isoformat(timespec="seconds"),
+             "ms": round((time.perf_counter() - t0) * 1000, 1)}
+        e["results"][name] = r
+        return r
+    return flight("precompute").do((e["snapshot"], name), build)
+
+def _fill(data: dict, e: dict) -> None:
+    for name in QUICK_DEFAULTS:
+        _compute(data, e, name)
+    e["done_at"] = datetime.now().isoformat(timespec="seconds")
+    log.info("botones rápidos precalculados para snapshot %s", e["snapshot"])
+
+def precompute(data: dict, background: bool = False) -> dict:
+    """
+    Materializa las tarjetas por defecto del snapshot (una sola vez por snapshot y día). background=True
+    lanza un hilo daemon y vuelve enseguida; la primera llamada del snapshot es la que calcula.
+    """
+    e = _entry(data)
+    with _LOCK:
+        first, e["started"] = not e["started"], True
+    if first:
+        if background:
+            threading.Thread(target=_fill, args=(data, e), name="fenix-precompute", daemon=True).start()
+        else:
+            _fill(data, e)
+    return e
+
+def quick_result(data: dict, name: str, params: dict | None = None) -> dict | None:
+    """
+    {df, err, computed_at, snapshot, loaded_at} si params son los por defecto (si la tarjeta aún se está
+    calculando en segundo plano, espera ese cálculo); None → la tarjeta calcula a pedido.
+    """
+    if not is_default(name, params or {}):
+        return None
+    e = _entry(data)
+    hit = name in e["results"]
+    note_cache("precompute", hit)
+    r = e["results"][name] if hit else _compute(data, e, name)
+    return {**r, "snapshot": e["snapshot"], "loaded_at": e["loaded_at"]}
+
+def status(data: dict) -> dict:
+    """Frescura para la UI: snapshot, hora de carga, tarjetas listas y hora de término."""
+    e = _entry(data)
+    return {"snapshot": e["snapshot"], "loaded_at": e["loaded_at"], "ready": len(e["results"]),
+            "total": len(QUICK_DEFAULTS), "done_at": e["done_at"]}
@@ -0,0 +1,166 @@
+# utils/prompts.py — prompts compactos: prefijo estático (cacheable) + contexto relevante + presupuesto de tokens
+import re, time, logging, threading
+from functools import lru_cache
+import yaml
+from .nlp import _norm
+from .tracing import note
+
+log = logging.getLogger("fenix.llm")
+
+# Presupuesto por ruta: tokens de entrada (prompt) y de salida (completion)
+TOKEN_BUDGETS = {
+    "nl2sql":         {"prompt": 2500, "completion": 400},
+    "summarize":      {"prompt": 2000, "completion": 500},
+    "parse_question": {"prompt": 1000, "completion": 200},
+    "queryspec":      {"prompt": 2200, "completion": 350},
+}
+_DEFAULT_BUDGET = {"prompt": 2000, "completion": 400}
+
+def prompt_budget(route: str) -> int:
+    return TOKEN_BUDGETS.get(route, _DEFAULT_BUDGET)["prompt"]
+
+def completion_budget(route: str) -> int:
+    return TOKEN_BUDGETS.get(route, _DEFAULT_BUDGET)["completion"]
+
+# ---------------------- conteo de tokens ----------------------
+@lru_cache(maxsize=1)
+def _encoder():
+    # tiktoken es opcional; sin él se estima ~4 caracteres por token
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _encoder()
+    if enc is not None:
+        return len(enc.encode(text))
+    return (len(text) + 3) // 4
+
+def messages_tokens(messages: list[dict]) -> int:
+    # ~4 tokens de overhead por mensaje (rol + separadores)
+    return sum(estimate_tokens(str(m.get("content") or "")) + 4 for m in messages)
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Recorta por líneas completas (desde el final) hasta caber en max_tokens."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    lines = text.splitlines()
+    while lines and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop()
+    return "\n".join(lines + ["…(recortado por presupuesto de tokens)"])
+
+# ---------------------- armado de mensajes ----------------------
+def build_messages(route: str, system: str, context: list[str] | None, question: str) -> list[dict]:
+    """
+    Orden estable para aprovechar el cache de prefijos del proveedor:
+      1) system: instrucciones estáticas (idénticas entre llamadas)
+      2) contexto: partes en orden de prioridad (se descartan desde el final si no caben)
+      3) la pregunta, siempre al final
+    """
+    budget = prompt_budget(route)
+    parts = [p for p in (context or []) if p]
+    fixed = estimate_tokens(system) + estimate_tokens(question) + 12
+    while parts and fixed + sum(estimate_tokens(p) for p in parts) > budget:
+        if len(parts) == 1:
+            parts[0] = truncate_to_tokens(parts[0], max(budget - fixed, 0))
+            break
+        dropped = parts.pop()
+        log.info("prompt %s: contexto descartado por presupuesto (%d tokens)", route, estimate_tokens(dropped))
+    user = "\n\n".join(parts + [question])
+    return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+
+# ---------------------- catálogo semántico relevante ----------------------
+@lru_cache(maxsize=8)
+def _load_catalog(semantic_text: str) -> dict:
+    try:
+        return yaml.safe_load(semantic_text) or {}
+    except Exception:
+        return {}
+
+_WORD_RE = re.compile(r"[a-z0-9ñ]+")
+
+_NEGATIONS = {"no", "sin", "aun", "pendiente", "pendientes"}
+
+def _words(s: str) -> set[str]:
+    # raíz simple (5 letras): "facturas"/"facturados" → "factu"; negaciones se conservan enteras
+    ws = _WORD_RE.findall(_norm(s))
+    return {("no" if w in _NEGATIONS else w[:5]) for w in ws if len(w) > 3 or w in _NEGATIONS}
+
+def _expand_synonyms(qn: str, catalog: dict) -> str:
+    # "placa" → "placa patente", "ventas" → "ventas facturacion", etc.
+    extra = []
+    for canon, syns in (catalog.get("synonyms") or {}).items():
+        if any(_norm(s) in qn for s in syns or []):
+            extra.append(_norm(canon).replace("_", " "))
+    return qn + " " + " ".join(extra) if extra else qn
+
+def _metric_score(qn: str, qwords: set[str], name: str, spec: dict) -> float:
+    score = 0.0
+    for syn in [name.replace("_", " ")] + list(spec.get("synonyms") or []):
+        ns = _norm(syn)
+        if ns and ns in qn:
+            score += 3.0
+        score += len(_words(ns) & qwords) / max(len(_words(ns)), 1)
+    return score
+
+def compact_catalog(semantic_text: str, question: str, k: int = 3) -> str:
+    """
+    En vez del YAML completo: detalle solo de las k métricas más afines a la pregunta
+    y una línea con los nombres del resto (para que el modelo pueda elegirlas igual).
+    """
+    catalog = _load_catalog(semantic_text)
+    metrics = catalog.get("metrics") or {}
+    if not metrics:
+        return semantic_text
+    qn = _expand_synonyms(_norm(question), catalog)
+    qwords = _words(qn)
+    ranked = sorted(metrics.items(), key=lambda kv: -_metric_score(qn, qwords, kv[0], kv[1] or {}))
+    top = [(n, s) for n, s in ranked[:k] if _metric_score(qn, qwords, n, s or {}) > 0] or ranked[:k]
+    lines = ["Métricas relevantes:"]
+    for name, spec in top:
+        spec = spec or {}
+        params = sorted(set(re.findall(r"\{(\w+)\}", str(spec.get("filter", "")))))
+        syns = ", ".join(spec.get("synonyms") or [])
+        lines.append(f"- {name}: {syns}" + (f" (filtros: {', '.join(p.lower() for p in params)})" if params else ""))
+    rest = [n for n, _ in ranked if n not in {t[0] for t in top}]
+    if rest:
+        lines.append("Otras métricas: " + ", ".join(rest))
+    return "\n".join(lines)
+
+def relevant_values(values: list[str], question: str, limit: int = 12) -> list[str]:
+    """Valores de catálogo mencionados en la pregunta primero; luego algunos ejemplos hasta `limit`."""
+    qn = _norm(question)
+    qwords = _words(qn)
+    hits = [v for v in values if v and (v in qn or (_words(v) & qwords))]
+    rest = [v for v in values if v not in hits]
+    return (hits + rest)[:max(limit, len(hits))]
+
+# ---------------------- registro de uso por ruta ----------------------
+_USAGE: dict[str, dict] = {}
+_USAGE_LOCK = threading.Lock()
+
+def record_usage(route: str, prompt_tokens: int, completion_tokens: int,
+                 cached_tokens: int = 0, latency_s: float = 0.0, estimated: bool = False) -> None:
+    with _USAGE_LOCK:
+        u = _USAGE.setdefault(route, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                      "cached_tokens": 0, "latency_s": 0.0, "last_at": None})
+        u["calls"] += 1
+        u["prompt_tokens"] += int(prompt_tokens or 0)
+        u["completion_tokens"] += int(completion_tokens or 0)
+        u["cached_tokens"] += int(cached_tokens or 0)
+        u["latency_s"] += float(latency_s or 0.0)
+        u["last_at"] = time.time()
+    note(llm_route=route, prompt_tokens=int(prompt_tokens or 0), completion_tokens=int(completion_tokens or 0),
+         cached_tokens=int(cached_tokens or 0))
+    log.info(
+        "llm %s: prompt=%s completion=%s cached=%s latency=%.2fs%s",
+        route, prompt_tokens, completion_tokens, cached_tokens, latency_s, " (estimado)" if estimated else "",
+    )
+
+def usage_summary() -> dict[str, dict]:
+    with _USAGE_LOCK:
+        return {r: dict(u) for r, u in _USAGE.items()}
@@ -0,0 +1,148 @@
+# utils/resilience.py — deadlines por ruta, reintentos con backoff+jitter y circuit breaker del proveedor LLM
+import time, random, logging, threading
+
+log = logging.getLogger("fenix.llm")
+
+# Tiempo total (s) que una ruta puede esperar al proveedor, sumando reintentos
+ROUTE_DEADLINES = {
+    "parse_question": 8.0,
+    "queryspec":      10.0,
+    "nl2sql":         15.0,
+    "summarize":      20.0,
+}
+_DEFAULT_DEADLINE = 15.0
+
+MAX_ATTEMPTS = 3
+BACKOFF_BASE_S = 0.5
+BACKOFF_CAP_S = 4.0
+
+class CircuitOpenError(RuntimeError):
+    """El proveedor está marcado como no saludable: usar el fallback local."""
+
+class DeadlineExceeded(TimeoutError):
+    """Se agotó el deadline de la ruta."""
+
+# Errores transitorios (por nombre de clase, para no importar openai/httpx aquí)
+_RETRYABLE_NAMES = {
+    "APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError",
+    "Timeout", "TimeoutException", "ConnectTimeout", "ReadTimeout", "ConnectError",
+    "ServiceUnavailableError", "APIError", "TryAgain",
+}
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "http_status", None)
+    if status is not None:
+        return int(status) in _RETRYABLE_STATUS
+    return type(exc).__name__ in _RETRYABLE_NAMES
+
+# ---------------------- circuit breaker ----------------------
+class CircuitBreaker:
+    """
+    cerrado → (N fallas seguidas) → abierto → (cooldown) → semiabierto: deja pasar 1 prueba
+    semiabierto + éxito → cerrado; semiabierto + falla → abierto de nuevo.
+    """
+    def __init__(self, failure_threshold: int = 3, cooldown_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self.last_error: str | None = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "cerrado"
+        if time.monotonic() - self._opened_at >= self.cooldown_s:
+            return "semiabierto"
+        return "abierto"
+
+    def is_open(self) -> bool:
+        return self.state == "abierto"
+
+    def allow(self) -> bool:
+        with self._lock:
+            st = self._state()
+            if st == "cerrado":
+                return True
+            if st == "semiabierto" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self, err: BaseException | None = None) -> None:
+        with self._lock:
+            self._failures += 1
+            self.last_error = f"{type(err).__name__}: {err}" if err else self.last_error
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    log.warning("circuit breaker LLM abierto tras %d fallas (%s)", self._failures, self.last_error)
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """Libera la prueba de semiabierto sin cambiar el estado (la llamada no dijo nada del proveedor)."""
+        with self._lock:
+            self._probing = False
+
+    def describe(self) -> str:
+        with self._lock:
+            st = self._state()
+            if st == "abierto":
+                left = self.cooldown_s - (time.monotonic() - self._opened_at)
+                return f"abierto (reintento en {left:.0f}s; {self.last_error})"
+            if st == "semiabierto":
+                return "semiabierto (probando proveedor)"
+            return f"cerrado ({self._failures}/{self.failure_threshold} fallas)"
+
+BREAKER = CircuitBreaker()
+
+# ---------------------- llamada con política ----------------------
+def call_with_policy(route: str, fn, breaker: CircuitBreaker = BREAKER):
+    """
+    Ejecuta fn(timeout_s) respetando el deadline de la ruta:
+      - reintenta solo errores transitorios, con backoff exponencial y jitter
+      - nunca duerme más allá del deadline
+      - una llamada que agota reintentos/deadline cuenta como 1 falla del breaker
+    """
+    if not breaker.allow():
+        raise CircuitOpenError(f"proveedor LLM no disponible (circuito {breaker.state})")
+    deadline = time.monotonic() + ROUTE_DEADLINES.get(route, _DEFAULT_DEADLINE)
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            err = DeadlineExceeded(f"{route}: deadline agotado tras {attempt} intentos")
+            breaker.record_failure(err)
+            raise err
+        try:
+            out = fn(remaining)
+        except Exception as e:
+            attempt += 1
+            if not is_retryable(e):
+                # error de la petición (auth, 400, parseo): no indica caída ni recuperación del proveedor
+                breaker.release_probe()
+                raise
+            sleep = min(BACKOFF_CAP_S, BACKOFF_BASE_S * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            if attempt >= MAX_ATTEMPTS or time.monotonic() + sleep >= deadline:
+                breaker.record_failure(e)
+                raise
+            log.info("llm %s: intento %d falló (%s); reintento en %.2fs", route, attempt, type(e).__name__, sleep)
+            time.sleep(sleep)
+            continue
+        breaker.record_success()
+        return out
@@ -0,0 +1,210 @@
+# utils/router.py — ruteo de preguntas (semántico → Auto-SQL → fallback libre) sin depender de Streamlit
+# app.py renderiza los "eventos"; bench/ y otros puntos de entrada reutilizan el mismo ruteo.
+import time, traceback
+from contextlib import contextmanager
+import pandas as pd
+
+from .singleflight import flight
+from .snapshot import snapshot_version
+from .tracing import trace, span, frame_stats
+from .llm import (
+    nl2sql, run_duckdb, iter_duckdb, unlimited_sql, summarize_markdown, has_openai, llm_available, llm_debug_info,
+)
+from .nlp import norm_question, parse_question_to_json
+from .md import df_digest
+from .schema import build_duckdb_prelude_and_schema
+from .exports import frame_chunks
+from .skills import (
+    DISPLAY_LIMIT,
+    skill_entregados_sin_factura,
+    skill_entregados_facturados,
+    skill_top_en_taller,
+    skill_facturacion_por_mes_tipo,
+    skill_entregas_proximos_dias_sin_factura,
+    skill_sin_aprobacion,
+    skill_consulta_vehiculos_freeform,
+    skill_buscar_vehiculos,
+    skill_timeline_vehiculo,
+    skill_facturados_pago_vencido,
+    skill_aging_pagos_por_cliente,
+)
+from .lookup import keys_in_question
+
+@contextmanager
+def _stage(timings: dict, name: str):
+    # timings (s por etapa) + span de la traza activa; el span se puede anotar (rows, bytes, cache)
+    t0 = time.perf_counter()
+    try:
+        with span(name) as s:
+            yield s
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - t0)
+
+def _mb_raw(data: dict) -> pd.DataFrame:
+    return data.get("MODELO_BOT", next(iter(data.values())))
+
+def run_metric(metric: str, MB: pd.DataFrame, filters: dict, mes: int, anio: int, data: dict | None = None,
+               limit: int | None = DISPLAY_LIMIT):
+    """Métrica del catálogo semántico → skill determinista. Devuelve (df, err). limit=None: sin tope."""
+    data = data if data is not None else {"MODELO_BOT": MB}
+    if metric == "facturados_pago_vencido":
+        return skill_facturados_pago_vencido(data, cliente=filters.get("cliente"), limit=limit)
+    if metric == "aging_pagos_cliente":
+        return skill_aging_pagos_por_cliente(data)
+    if metric == "entregados_sin_factura":
+        return skill_entregados_sin_factura(MB, limit=limit, **filters)
+    if metric == "entregados_facturados":
+        return skill_entregados_facturados(MB, limit=limit, **filters)
+    if metric == "en_taller":
+        return skill_top_en_taller(MB, **filters)
+    if metric == "facturacion_mensual_tipo_cliente":
+        return skill_facturacion_por_mes_tipo(
+            MB, int(filters.get("mes", mes)), int(filters.get("anio", anio))
+        )
+    if metric == "entregas_proximas_sin_factura":
+        return skill_entregas_proximos_dias_sin_factura(MB, int(filters.get("horizonte", 7)), limit=limit)
+    if metric == "sin_aprobacion":
+        return skill_sin_aprobacion(MB, limit=limit)
+    return None, f"Métrica no implementada: {metric}"
+
+def autosql_query(data: dict, q: str, mes: int, anio: int, timings: dict | None = None):
+    """Auto-SQL sin ejecutar: (sql o None, tablas, prelude). La SQL corre con llm.run_duckdb/iter_duckdb."""
+    timings = timings if timings is not None else {}
+    tables = {k: v for k, v in data.items() if k.upper() in ("MODELO_BOT", "FINANZAS")}
+    with _stage(timings, "prelude"):
+        prelude_sql, schema_hint = build_duckdb_prelude_and_schema(tables)
+    params = {"MES": int(mes), "ANIO": int(anio)}
+    with _stage(timings, "nl2sql"):
+        sql = nl2sql(q, schema_hint=schema_hint, params=params)
+    return sql, tables, prelude_sql
+
+def answer_question(data: dict, q: str, mes: int, anio: int, semantic_text: str = "") -> dict:
+    """
+    Igual que _answer_question, pero coalesciendo preguntas idénticas en vuelo
+    (misma pregunta normalizada + mismo snapshot + mismos parámetros → un solo cómputo).
+    """
+    key = (norm_question(q), snapshot_version(data), int(mes), int(anio), hash(semantic_text))
+    with trace("pregunta", q=q, mes=int(mes), anio=int(anio), snapshot=snapshot_version(data)) as tr:
+        with span("answer_question") as s:
+            out = flight("answer_question").do(key, lambda: _answer_question(data, q, mes, anio, semantic_text))
+            s.update(frame_stats(out["df"]))
+        tr.attrs["route"] = out["path"]
+    return dict(out, trace=tr)
+
+def _answer_question(data: dict, q: str, mes: int, anio: int, semantic_text: str = "") -> dict:
+    """
+    Ejecuta el ruteo completo de una pregunta. Devuelve:
+      path, df, sql, timings (s por etapa) y events: lista (tipo, payload) en orden de render:
+        success/info/warning/error → texto; sql → SQL; trace → traceback;
+        table → (df, nombre, completo); summary → (df, completo) a resumir (lo resume quien renderiza)
+      "completo" es None o una función sin argumentos que devuelve el resultado sin tope de pantalla
+      en bloques de DataFrames (para exportes.stream_export y el digest del resumen); full: el del resultado.
+    """
+    events, timings = [], {}
+    out = {"path": None, "df": None, "full": None, "sql": None, "events": events, "timings": timings}
+    used_path = None
+    df_result = None
+
+    # 0) Búsqueda directa por clave ("estado de la patente XX1234", "OT 4512"): índice hash, sin LLM
+    claves = keys_in_question(q)
+    if claves:
+        with _stage(timings, "lookup") as s:
+            table, err = skill_buscar_vehiculos(_mb_raw(data), [v for _, v in claves])
+            timeline = None
+            if table is not None and len(claves) == 1:
+                timeline, _ = skill_timeline_vehiculo(_mb_raw(data), claves[0][1])
+            s.update(frame_stats(table))
+        if table is not None:
+            used_path = "Búsqueda directa"
+            df_result = table
+            events.append(("success", f"✓ Ruta: {used_path} ({', '.join(f'{k} {v}' for k, v in claves)})"))
+            events.append(("table", (table, "busqueda_vehiculo", None)))
+            if timeline is not None:
+                events.append(("table", (timeline, "timeline_vehiculo", None)))
+        else:
+            events.append(("info", f"(Búsqueda directa) {err}"))
+
+    # 1) Router semántico (si hay semantic.yaml y LLM activo)
+    if used_path is None and semantic_text and llm_available():
+        with _stage(timings, "parse_question"):
+            parsed = parse_question_to_json(q, semantic_text)
+        if parsed and parsed.get("metric"):
+            metric = parsed["metric"]
+            filters = parsed.get("filters", {}) or {}
+            used_path = f"Semántico → {metric}"
+            try:
+                with _stage(timings, "skill") as s:
+                    df_result, err = run_metric(metric, _mb_raw(data), filters, mes, anio, data=data)
+                    s.update(metric=metric, **frame_stats(df_result))
+            except Exception as e:
+                df_result, err = None, str(e)
+
+            if err:
+                events.append(("warning", err))
+            elif df_result is not None and not df_result.empty:
+                events.append(("success", f"✓ Ruta: {used_path}"))
+                full = lambda: frame_chunks(run_metric(metric, _mb_raw(data), filters, mes, anio, data=data, limit=None)[0])
+                events.append(("table", (df_result, "resultado_semantico", full)))
+                out["full"] = full
+            else:
+                events.append(("info", "Ruta semántica devolvió 0 filas; intentaré Auto-SQL."))
+                used_path = None
+
+    # 2) Auto-SQL sobre DuckDB (respaldo) — se omite si el circuito LLM está abierto
+    if used_path is None and has_openai() and not llm_available():
+        events.append(("info", "Proveedor LLM no disponible (circuito abierto); uso el fallback local."))
+    elif used_path is None:
+        try:
+            sql, tables, prelude_sql = autosql_query(data, q, mes, anio, timings)
+            if not sql:
+                events.append(("warning", "No pude generar SQL. Revisa el 'Estado LLM' en la barra lateral."))
+                events.append(("info", llm_debug_info()))
+            else:
+                out["sql"] = sql
+                events.append(("sql", sql))
+                with _stage(timings, "run_duckdb") as s:
+                    df_result = run_duckdb(sql, tables, prelude_sql=prelude_sql)
+                    s.update(frame_stats(df_result))
+                if df_result.empty:
+                    events.append(("info", "Sin resultados."))
+                else:
+                    used_path = "Auto-SQL"
+                    full = lambda: iter_duckdb(unlimited_sql(sql), tables, prelude_sql=prelude_sql)
+                    events.append(("table", (df_result, "resultado_autosql", full)))
+                    events.append(("summary", (df_result, full)))  # digest del resultado sin el LIMIT de pantalla
+                    out["full"] = full
+        except Exception as e:
+            events.append(("error", "Error en Auto-SQL:"))
+            events.append(("trace", "".join(traceback.format_exception(type(e), e, e.__traceback__))))
+
+    # 3) Fallback libre (heurístico) — SOLO si no hubo resultado previo o quedó vacío
+    try:
+        if df_result is None or (isinstance(df_result, pd.DataFrame) and df_result.empty):
+            with _stage(timings, "fallback") as s:
+                table, err = skill_consulta_vehiculos_freeform(_mb_raw(data), q)
+                s.update(frame_stats(table))
+            if err:
+                events.append(("info", f"(Fallback libre) {err}"))
+            elif table is not None and not table.empty:
+                used_path = "Fallback libre"
+                df_result = table
+                events.append(("success", "✓ Ruta: Fallback libre (heurístico)"))
+                full = lambda: frame_chunks(skill_consulta_vehiculos_freeform(_mb_raw(data), q, limit=None)[0])
+                events.append(("table", (table, "resultado_fallback", full)))
+                out["full"] = full
+            else:
+                hint = table.attrs.get("quisiste_decir") if table is not None else None
+                events.append(("info", hint or "Sin resultados."))
+    except Exception as e:
+        events.append(("info", f"(Fallback libre no disponible) {e}"))
+
+    out["path"] = used_path
+    out["df"] = df_result
+    return out
+
+def summarize_result(df: pd.DataFrame, q: str, timings: dict | None = None, full=None) -> str:
+    """Resumen LLM del digest; con `full` (bloques sin tope de pantalla) las cifras cubren todo el resultado."""
+    with _stage(timings if timings is not None else {}, "summarize") as s:
+        digest = df_digest(df, chunks=full() if full is not None else None)
+        s.update(rows=int(len(df)), bytes=len(digest.encode("utf-8")))
+        return summarize_markdown(digest, q)
@@ -1,6 +1,6 @@
 import re
 import pandas as pd
-from .nlp import find_col
+from .colplan import resolve_plan
 
 # Sinónimos canónicos
 MB_KEYS = {
@@ -24,11 +24,9 @@ FIN_KEYS = {
     "monto": ["monto","total","monto neto","monto principal neto","importe","valor"],
 }
 
-def map_cols(df, keys):
-    m = {}
-    for k, syns in keys.items():
-        m[k] = find_col(df, syns)
-    return m
+def map_cols(df, keys, label: str = ""):
+    """Campo canónico → columna física (plan cacheado por encabezados; ver utils/colplan.py)."""
+    return dict(resolve_plan(df.columns, keys, label=label)["cols"])
 
 def _q(col: str | None) -> str:
     if not col: return "NULL"
@@ -48,7 +46,7 @@ def parse_number_expr(col_sql: str) -> str:
     return f"TRY_CAST(REPLACE(REPLACE({col_sql}, '.', ''), ',', '.') AS DOUBLE)"
 
 def build_mb_view_sql(src_name: str, df: pd.DataFrame) -> tuple[str, str]:
-    m = map_cols(df, MB_KEYS)
+    m = map_cols(df, MB_KEYS, label="MB_KEYS")
     selects = []
     # Textuales
     for ckey, alias in [
@@ -102,7 +100,7 @@ def build_mb_view_sql(src_name: str, df: pd.DataFrame) -> tuple[str, str]:
     return sql, hint
 
 def build_fin_view_sql(src_name: str, df: pd.DataFrame) -> tuple[str, str]:
-    m = map_cols(df, FIN_KEYS)
+    m = map_cols(df, FIN_KEYS, label="FIN_KEYS")
     selects = []
     for ckey, alias in [
         ("factura_num","factura_num"),
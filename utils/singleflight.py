@@ -0,0 +1,65 @@
+# utils/singleflight.py — coalescing de trabajo idéntico en vuelo (estilo "single flight")
+# Si N hilos (sesiones de Streamlit, reruns dobles) piden lo mismo a la vez, se ejecuta una sola
+# vez y todos reciben el mismo resultado (o la misma excepción). No es un cache: al terminar se olvida.
+import threading
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self.executed = 0
+        self.deduped = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.deduped += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"executed": self.executed, "deduped": self.deduped, "inflight": len(self._calls)}
+
+_GROUPS: dict[str, SingleFlight] = {}
+_GROUPS_LOCK = threading.Lock()
+
+def flight(name: str) -> SingleFlight:
+    with _GROUPS_LOCK:
+        if name not in _GROUPS:
+            _GROUPS[name] = SingleFlight(name)
+        return _GROUPS[name]
+
+def singleflight_stats() -> dict[str, dict]:
+    with _GROUPS_LOCK:
+        groups = list(_GROUPS.values())
+    return {g.name: g.stats() for g in groups}
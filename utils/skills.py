@@ -1,8 +1,20 @@
 # utils/skills.py  — SOLO MODELO_BOT (estricto por bandera + parser libre robusto)
-import os, re, yaml, unicodedata
+import os, re, yaml, logging, unicodedata, threading, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from datetime import date
 import pandas as pd
 import numpy as np
-from .nlp import find_col, ilike
+from pandas.api.types import infer_dtype
+from pandas.tseries.api import guess_datetime_format
+from .nlp import ilike
+from .colplan import resolve_plan
+from .singleflight import flight
+from .snapshot import snapshot_version, stamp_snapshot, tag_snapshot
+from .tracing import span, note, note_cache
+from .textindex import index_for, patch_indexes, suggest_values, did_you_mean
+from .lookup import key_index, split_keys
+from .finance import mb_fin_join, aging_bucket, AGING_BUCKETS
 
 # ----------------- column map -----------------
 COLUMN_MAP = {}
@@ -22,90 +34,451 @@ def _norm_text(s: str) -> str:
     s = re.sub(r"\s+", " ", s)
     return s
 
-def _parse_date_col(series):
+_NAT_STRINGS = {"", "NaT", "nat", "NAT", "nan", "NaN", "NAN", "now", "today"}
+
+def _date_format(series):
+    """
+    Formato que pandas infiere para la columna completa (del primer valor no nulo, como to_datetime).
+    Fijarlo hace que cada bloque de la construcción paralela parsee igual que la columna entera;
+    "mixed" = sin formato común, valor por valor (mismo camino que cuando la inferencia falla).
+    """
+    if series is None or series.dtype != object:
+        return None
+    for v in series.array:
+        if isinstance(v, str):
+            if v in _NAT_STRINGS:
+                continue
+            return guess_datetime_format(v, dayfirst=True) or "mixed"
+        if not pd.isna(v):
+            return "mixed"
+    return "mixed"
+
+def _parse_date_col(series, fmt=None):
     if series is None: return pd.NaT
-    return pd.to_datetime(series, errors="coerce", dayfirst=True, infer_datetime_format=True)
+    return pd.to_datetime(series, errors="coerce", dayfirst=True, format=fmt)
 
 def _to_number(series):
     if series is None: return np.nan
     s = series.astype(str).str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
     return pd.to_numeric(s, errors="coerce")
 
-def _get(df, header_fallback: str, field: str):
-    name = (COLUMN_MAP.get("MODELO_BOT", {}) or {}).get(field, "")
-    if name and name in df.columns:
-        return df[name]
-    col = find_col(df, [header_fallback, header_fallback.replace("_", " "), header_fallback.upper()])
-    return df.get(col)
+# campo lógico → encabezado de respaldo (si column_map.yaml no lo define o no existe en la hoja)
+MB_FIELDS = {
+    "ot": "OT",
+    "patente": "PATENTE",
+    "marca": "MARCA",
+    "modelo": "MODELO",
+    "tipo_cliente": "TIPO CLIENTE",
+    "nombre_cliente": "NOMBRE CLIENTE",
+    "tipo_vehiculo": "TIPO VEHÍCULO",
+    "sucursal": "SUCURSAL",
+    "estado_servicio": "ESTADO SERVICIO",
+    "estado_presupuesto": "ESTADO PRESUPUESTO",
+    "fecha_ingreso_planta": "FECHA INGRESO PLANTA",
+    "fecha_salida_planta": "FECHA SALIDA PLANTA",
+    "fecha_inspeccion": "FECHA INSPECCIÓN",
+    "fecha_recepcion": "FECHA RECEPCION",
+    "fecha_entrega": "FECHA ENTREGA",
+    "numero_factura": "NUMERO DE FACTURA",
+    "fecha_facturacion": "FECHA DE FACTURACION",
+    "fecha_pago_factura": "FECHA DE PAGO FACTURA",
+    "facturado_flag": "FACTURADO",
+    "monto_neto": "MONTO PRINCIPAL NETO",
+    "iva_f": "IVA PRINCIPAL [F]",
+    "monto_bruto_f": "MONTO PRINCIPAL BRUTO [F]",
+    "numero_dias_en_planta": "NUMERO DE DIAS EN PLANTA",
+    "dias_en_dominio": "DIAS EN DOMINIO",
+    "cantidad_vehiculo": "CANTIDAD DE VEHICULO",
+    "dias_pago_factura": "DIAS DE PAGO DE FACTURA",
+}
 
-# ----------------- vista MODELO_BOT normalizada -----------------
-def _build_mb(df: pd.DataFrame) -> pd.DataFrame:
-    MB = pd.DataFrame(index=df.index)
+def mb_plan(df) -> dict:
+    """Plan de resolución de columnas de MODELO_BOT (cacheado por firma de encabezados)."""
+    fields = {f: [h, h.replace("_", " "), h.upper()] for f, h in MB_FIELDS.items()}
+    exact = COLUMN_MAP.get("MODELO_BOT", {}) or {}
+    return resolve_plan(df.columns, fields, exact=exact, label="MODELO_BOT")
 
-    # Identificadores / cliente
-    MB["OT"]       = _get(df, "OT", "ot")
-    MB["PATENTE"]  = _get(df, "PATENTE", "patente")
-    MB["MARCA"]    = _get(df, "MARCA", "marca")
-    MB["MODELO"]   = _get(df, "MODELO", "modelo")
-    MB["TIPO_CLIENTE"]   = _get(df, "TIPO CLIENTE", "tipo_cliente")
-    MB["NOMBRE_CLIENTE"] = _get(df, "NOMBRE CLIENTE", "nombre_cliente")
-    MB["TIPO_VEHICULO"]  = _get(df, "TIPO VEHÍCULO", "tipo_vehiculo")
-    MB["SUCURSAL"]       = _get(df, "SUCURSAL", "sucursal")
+def _get(df, plan: dict, field: str):
+    col = plan["cols"].get(field)
+    return df[col] if col is not None else None
 
+# ----------------- vista MODELO_BOT normalizada -----------------
+# (campo, columna de MB, tipo) en el orden de MB: "fecha" y "numero" se parsean (lo caro), el resto se copia
+_MB_COLUMNS = (
+    # Identificadores / cliente
+    ("ot", "OT", None), ("patente", "PATENTE", None), ("marca", "MARCA", None), ("modelo", "MODELO", None),
+    ("tipo_cliente", "TIPO_CLIENTE", None), ("nombre_cliente", "NOMBRE_CLIENTE", None),
+    ("tipo_vehiculo", "TIPO_VEHICULO", None), ("sucursal", "SUCURSAL", None),
     # Estados
-    MB["ESTADO_SERVICIO"]    = _get(df, "ESTADO SERVICIO", "estado_servicio")
-    MB["ESTADO_PRESUPUESTO"] = _get(df, "ESTADO PRESUPUESTO", "estado_presupuesto")
-
+    ("estado_servicio", "ESTADO_SERVICIO", None), ("estado_presupuesto", "ESTADO_PRESUPUESTO", None),
     # Fechas
-    MB["FECHA_INGRESO_PLANTA"] = _parse_date_col(_get(df, "FECHA INGRESO PLANTA", "fecha_ingreso_planta"))
-    MB["FECHA_SALIDA_PLANTA"]  = _parse_date_col(_get(df, "FECHA SALIDA PLANTA", "fecha_salida_planta"))
-    MB["FECHA_INSPECCION"]     = _parse_date_col(_get(df, "FECHA INSPECCIÓN", "fecha_inspeccion"))
-    MB["FECHA_RECEPCION"]      = _parse_date_col(_get(df, "FECHA RECEPCION", "fecha_recepcion"))
-    MB["FECHA_ENTREGA"]        = _parse_date_col(_get(df, "FECHA ENTREGA", "fecha_entrega"))
-
+    ("fecha_ingreso_planta", "FECHA_INGRESO_PLANTA", "fecha"), ("fecha_salida_planta", "FECHA_SALIDA_PLANTA", "fecha"),
+    ("fecha_inspeccion", "FECHA_INSPECCION", "fecha"), ("fecha_recepcion", "FECHA_RECEPCION", "fecha"),
+    ("fecha_entrega", "FECHA_ENTREGA", "fecha"),
     # Facturación
-    MB["NUMERO_FACTURA"]     = _get(df, "NUMERO DE FACTURA", "numero_factura")
-    MB["FECHA_FACTURACION"]  = _parse_date_col(_get(df, "FECHA DE FACTURACION", "fecha_facturacion"))
-    MB["FECHA_PAGO_FACTURA"] = _parse_date_col(_get(df, "FECHA DE PAGO FACTURA", "fecha_pago_factura"))
-    MB["FACTURADO_FLAG"]     = _get(df, "FACTURADO", "facturado_flag")  # SI/NO
-
+    ("numero_factura", "NUMERO_FACTURA", None), ("fecha_facturacion", "FECHA_FACTURACION", "fecha"),
+    ("fecha_pago_factura", "FECHA_PAGO_FACTURA", "fecha"), ("facturado_flag", "FACTURADO_FLAG", None),  # SI/NO
     # Montos / KPIs
-    MB["MONTO_NETO"]    = _to_number(_get(df, "MONTO PRINCIPAL NETO", "monto_neto"))
-    MB["IVA_F"]         = _to_number(_get(df, "IVA PRINCIPAL [F]", "iva_f"))
-    MB["MONTO_BRUTO_F"] = _to_number(_get(df, "MONTO PRINCIPAL BRUTO [F]", "monto_bruto_f"))
-
-    MB["NUMERO_DIAS_EN_PLANTA"] = _to_number(_get(df, "NUMERO DE DIAS EN PLANTA", "numero_dias_en_planta"))
-    MB["DIAS_EN_DOMINIO"]       = _to_number(_get(df, "DIAS EN DOMINIO", "dias_en_dominio"))
-    MB["CANTIDAD_VEHICULO"]     = _to_number(_get(df, "CANTIDAD DE VEHICULO", "cantidad_vehiculo"))
-    MB["DIAS_PAGO_FACTURA"]     = _to_number(_get(df, "DIAS DE PAGO DE FACTURA", "dias_pago_factura"))
+    ("monto_neto", "MONTO_NETO", "numero"), ("iva_f", "IVA_F", "numero"), ("monto_bruto_f", "MONTO_BRUTO_F", "numero"),
+    ("numero_dias_en_planta", "NUMERO_DIAS_EN_PLANTA", "numero"), ("dias_en_dominio", "DIAS_EN_DOMINIO", "numero"),
+    ("cantidad_vehiculo", "CANTIDAD_VEHICULO", "numero"), ("dias_pago_factura", "DIAS_PAGO_FACTURA", "numero"),
+)
+# texto normalizado (sin acentos, minúsculas) de las banderas: base de los booleans y columnas de diagnóstico
+_MB_NORM = (("estado_servicio", "_estado_servicio_norm"), ("facturado_flag", "_facturado_flag_norm"))
+
+def _mb_context(df: pd.DataFrame) -> dict:
+    """Lo que depende de la hoja completa y no de cada fila: plan de columnas y formato de cada fecha."""
+    plan = mb_plan(df)
+    return {"plan": plan,
+            "date_fmt": {f: _date_format(_get(df, plan, f)) for f, _, kind in _MB_COLUMNS if kind == "fecha"}}
+
+def _sheet_context(df: pd.DataFrame) -> dict:
+    """_mb_context + si la hoja trae días en planta en alguna fila (para construir MB de una muestra de ella)."""
+    ctx = _mb_context(df)
+    dias = _get(df, ctx["plan"], "numero_dias_en_planta")
+    ctx["dias_desde_fechas"] = dias is None or bool(_to_number(dias).isna().all())
+    return ctx
+
+def _parse_rows(df: pd.DataFrame, ctx: dict) -> pd.DataFrame:
+    """Lo caro, fila a fila: fechas, montos y normalización de banderas (sirve igual para un bloque de filas)."""
+    plan, P = ctx["plan"], pd.DataFrame(index=df.index)
+    for field, name, kind in _MB_COLUMNS:
+        if kind == "fecha":
+            P[name] = _parse_date_col(_get(df, plan, field), ctx["date_fmt"][field])
+        elif kind == "numero":
+            P[name] = _to_number(_get(df, plan, field))
+    for field, name in _MB_NORM:
+        s = _get(df, plan, field)
+        P[name] = s.map(_norm_text) if s is not None else ""
+    return P
+
+FACTURADO_TRUE  = {"si","sí","si.","si !","si ok","sí ok","facturado","facturada","emitida","emitido","ok","con factura"}
+FACTURADO_FALSE = {"no","no.","no !","pendiente","por facturar","sin factura","no emitida","no emitido","0","false",""}
+
+def _assemble_mb(df: pd.DataFrame, ctx: dict, P: pd.DataFrame) -> pd.DataFrame:
+    """
+    MB base: columnas copiadas de la hoja + las parseadas (P) + booleans y derivadas vectorizadas. Sin nada
+    relativo a "hoy": eso lo agrega la vista por fecha de corte (with_asof).
+    """
+    MB = pd.DataFrame(index=df.index)
+    for field, name, kind in _MB_COLUMNS:
+        MB[name] = P[name] if kind else _get(df, ctx["plan"], field)
 
     # --------- Booleans ESTRICTOS por bandera ----------
-    estado_norm = MB["ESTADO_SERVICIO"].map(_norm_text)
-    fact_norm   = MB["FACTURADO_FLAG"].map(_norm_text)
+    estado_norm = P["_estado_servicio_norm"]
+    fact_norm   = P["_facturado_flag_norm"]
 
     MB["entregado_bool"] = estado_norm.str.contains("entreg", na=False)
-
-    FACTURADO_TRUE  = {"si","sí","si.","si !","si ok","sí ok","facturado","facturada","emitida","emitido","ok","con factura"}
-    FACTURADO_FALSE = {"no","no.","no !","pendiente","por facturar","sin factura","no emitida","no emitido","0","false",""}
     MB["facturado_bool"]    = fact_norm.isin(FACTURADO_TRUE)
     MB["no_facturado_bool"] = fact_norm.isin(FACTURADO_FALSE) | (fact_norm == "")
 
     # --------- Derivados ----------
     MB["fecha_op"] = MB["FECHA_FACTURACION"].combine_first(MB["FECHA_ENTREGA"]).combine_first(MB["FECHA_RECEPCION"])
-
-    if MB["NUMERO_DIAS_EN_PLANTA"].isna().all():
-        fini = MB["FECHA_INGRESO_PLANTA"].combine_first(MB["FECHA_RECEPCION"])
-        fend = MB["FECHA_SALIDA_PLANTA"].combine_first(MB["FECHA_ENTREGA"]).fillna(pd.Timestamp.today())
-        MB["NUMERO_DIAS_EN_PLANTA"] = (fend - fini).dt.days
-
-    MB["dias_desde_entrega"] = (pd.Timestamp.today() - MB["FECHA_ENTREGA"]).dt.days
     MB["id"] = MB["PATENTE"].replace("", np.nan).fillna(MB["OT"])
 
     # diagnóstico
     MB["_estado_servicio_norm"] = estado_norm
     MB["_facturado_flag_norm"]  = fact_norm
+    # sin días en planta en ninguna fila de la hoja → with_asof los calcula desde las fechas. Se decide con la
+    # hoja completa (ctx["dias_desde_fechas"] si df es una muestra) y viaja en attrs a recortes y vistas
+    desde_fechas = ctx.get("dias_desde_fechas", MB["NUMERO_DIAS_EN_PLANTA"].isna().all())
+    MB.attrs["dias_en_planta_desde_fechas"] = bool(desde_fechas)
     return MB
 
+def with_asof(MB: pd.DataFrame, asof=None) -> pd.DataFrame:
+    """
+    Columnas relativas a una fecha de corte (por defecto ahora) sobre MB base o un recorte: dias_desde_entrega
+    y, si la hoja no trae días en planta (ninguna fila), NUMERO_DIAS_EN_PLANTA desde las fechas (abiertos
+    hasta la fecha de corte). Copia superficial: no toca el frame recibido.
+    """
+    asof = pd.Timestamp.today() if asof is None else pd.Timestamp(asof)
+    out = MB.copy(deep=False)
+    if MB.attrs.get("dias_en_planta_desde_fechas", MB["NUMERO_DIAS_EN_PLANTA"].isna().all()):
+        fini = MB["FECHA_INGRESO_PLANTA"].combine_first(MB["FECHA_RECEPCION"])
+        fend = MB["FECHA_SALIDA_PLANTA"].combine_first(MB["FECHA_ENTREGA"]).fillna(asof)
+        out["NUMERO_DIAS_EN_PLANTA"] = (fend - fini).dt.days
+    dias = (asof - MB["FECHA_ENTREGA"]).dt.days
+    if "id" in out.columns:  # mismo lugar que tenía cuando se materializaba en MB
+        out.insert(out.columns.get_loc("id"), "dias_desde_entrega", dias)
+    else:
+        out["dias_desde_entrega"] = dias
+    return out
+
+# ----------------- construcción paralela (hojas muy grandes) -----------------
+# Lo caro de _build_mb es Python puro (normalizar texto, reemplazos de montos, fechas fuera de formato):
+# con hilos no escala por el GIL, así que los bloques de filas van a un pool de procesos persistente.
+#   FENIX_MB_WORKERS=n (por defecto núcleos disponibles, máx. 8; 1 = siempre en serie)
+#   FENIX_MB_PARALLEL_MIN_ROWS=n (por defecto 200000: por debajo el costo de enviar los bloques no compensa)
+MB_MAX_WORKERS = 8
+MB_PARALLEL_MIN_ROWS = int(os.environ.get("FENIX_MB_PARALLEL_MIN_ROWS", 200_000))
+_POOL: ProcessPoolExecutor | None = None
+_POOL_SIZE = 0
+_POOL_LOCK = threading.Lock()
+log = logging.getLogger("fenix.skills")
+
+def mb_workers(rows: int, workers: int | None = None) -> int:
+    """Procesos para construir MB de `rows` filas (1 = en serie)."""
+    if workers is None:
+        env = os.environ.get("FENIX_MB_WORKERS")
+        cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+        workers = int(env) if env else min(cpus, MB_MAX_WORKERS)
+        if rows < MB_PARALLEL_MIN_ROWS:
+            return 1
+    return max(1, min(int(workers), rows // 1000 or 1))
+
+def _mb_pool(workers: int) -> ProcessPoolExecutor:
+    # forkserver: los procesos no heredan los hilos de Streamlit/API (fork con hilos puede colgarse)
+    global _POOL, _POOL_SIZE
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_SIZE < workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                ctx = multiprocessing.get_context("forkserver")
+                ctx.set_forkserver_preload([__name__])  # cada proceso nace con pandas y este módulo importados
+            else:
+                ctx = multiprocessing.get_context("spawn")
+            _POOL, _POOL_SIZE = ProcessPoolExecutor(max_workers=workers, mp_context=ctx), workers
+        return _POOL
+
+def _drop_pool() -> None:
+    global _POOL, _POOL_SIZE
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL, _POOL_SIZE = None, 0
+
+def _pack(df: pd.DataFrame) -> tuple:
+    """
+    Bloque para enviar a un proceso. Las columnas solo-texto (lo normal en Sheets) viajan como arreglos
+    Arrow (búferes contiguos: ~4× más barato que picklear un str por celda); las demás, tal cual.
+    """
+    import pyarrow as pa
+    cols = {}
+    for c in df.columns:
+        s = df[c]
+        cols[c] = pa.array(s.to_numpy(), type=pa.large_string()) \
+            if s.dtype == object and infer_dtype(s, skipna=False) == "string" else s.to_numpy()
+    return df.index, cols
+
+def _unpack(packed: tuple) -> pd.DataFrame:
+    index, cols = packed
+    return pd.DataFrame({c: v if isinstance(v, np.ndarray) else v.to_numpy(zero_copy_only=False)
+                         for c, v in cols.items()}, index=index)
+
+def _parse_chunk(packed: tuple, ctx: dict) -> pd.DataFrame:
+    # en el proceso: el texto normalizado vuelve como categórico (pocos valores distintos, viaja barato)
+    P = _parse_rows(_unpack(packed), ctx)
+    for _, name in _MB_NORM:
+        P[name] = P[name].astype("category")
+    return P
+
+def _parse_parallel(df: pd.DataFrame, ctx: dict, workers: int) -> pd.DataFrame:
+    # a los procesos van solo las columnas que se parsean; las que MB copia tal cual no salen de aquí
+    fields = [f for f, _, kind in _MB_COLUMNS if kind] + [f for f, _ in _MB_NORM]
+    cols = list(dict.fromkeys(c for f in fields if (c := ctx["plan"]["cols"].get(f)) is not None))
+    src = df[cols]
+    bounds = np.linspace(0, len(df), workers + 1).astype(int)
+    chunks = [_pack(src.iloc[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+    P = pd.concat(_mb_pool(workers).map(_parse_chunk, chunks, [ctx] * len(chunks)))
+    for _, name in _MB_NORM:
+        P[name] = P[name].astype(object)
+    return P
+
+def _build_mb(df: pd.DataFrame, workers: int | None = None, sheet: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    MB normalizado (vista de hoy). Con muchas filas el parseo (fechas, montos, banderas) se reparte en
+    bloques de filas entre procesos; el resultado es idéntico al serial (los formatos de fecha se fijan
+    para la hoja completa y lo que depende de todas las filas se calcula al juntar).
+    `sheet`: hoja completa cuando df es una muestra (p. ej. head): lo que depende de todas las filas sale de ella.
+    """
+    return with_asof(_build_mb_base(df, workers, ctx=_sheet_context(sheet) if sheet is not None else None))
+
+def _parse(df: pd.DataFrame, ctx: dict, workers: int | None = None) -> pd.DataFrame:
+    n = mb_workers(len(df), workers)
+    if n > 1:
+        try:
+            P = _parse_parallel(df, ctx, n)
+            note(mb_workers=n)
+            return P
+        except Exception as e:  # pool roto (proceso muerto, sin /dev/shm…): en serie
+            log.warning("MB en paralelo falló (%s: %s); en serie", type(e).__name__, e)
+            _drop_pool()
+    note(mb_workers=1)
+    return _parse_rows(df, ctx)
+
+def _build_mb_base(df: pd.DataFrame, workers: int | None = None, ctx: dict | None = None) -> pd.DataFrame:
+    ctx = ctx or _mb_context(df)
+    return _assemble_mb(df, ctx, _parse(df, ctx, workers))
+
+# ----------------- actualización incremental -----------------
+# Una hoja recargada suele diferir de la anterior en pocas filas. Cada fila se identifica por OT/PATENTE
+# (+ n° de ocurrencia si la clave se repite) y un hash de las columnas que se parsean; las filas con la
+# misma clave y el mismo hash reutilizan lo ya parseado y solo las cambiadas/nuevas se parsean. El
+# ensamblado (copias, booleans, fecha_op, id) es vectorizado y se rehace completo.
+MB_PATCH_MAX_FRACTION = 0.5  # con más filas distintas conviene reconstruir (y en paralelo si aplica)
+_P_COLUMNS = [name for _, name, kind in _MB_COLUMNS if kind] + [name for _, name in _MB_NORM]
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+def _row_ids(df: pd.DataFrame, plan: dict) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (clave OT/PATENTE con n° de ocurrencia, hash de las columnas que se parsean) por fila, vectorizado.
+    Las columnas que MB copia tal cual no entran al hash: el ensamblado las toma siempre de la hoja nueva.
+    """
+    fields = [f for f, _, kind in _MB_COLUMNS if kind] + [f for f, _ in _MB_NORM]
+    cols = list(dict.fromkeys(c for f in fields if (c := plan["cols"].get(f)) is not None))
+    content = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+    kcols = list(dict.fromkeys(c for c in (plan["cols"].get("ot"), plan["cols"].get("patente")) if c is not None))
+    key = pd.util.hash_pandas_object(df[kcols], index=False).to_numpy() if kcols else np.zeros(len(df), np.uint64)
+    occ = pd.Series(key).groupby(key, sort=False).cumcount().to_numpy().astype(np.uint64)
+    return key ^ (occ * _GOLDEN), content
+
+def _patch_base(prev: dict, df: pd.DataFrame, ctx: dict, rowkey: np.ndarray, rowhash: np.ndarray):
+    """(MB base, estadísticas) reutilizando las filas sin cambios de `prev`; None si conviene reconstruir."""
+    old_keys = pd.Index(prev["rowkey"])
+    if not old_keys.is_unique:
+        return None
+    old_pos = old_keys.get_indexer(rowkey)
+    same = old_pos >= 0
+    same[same] = prev["rowhash"][old_pos[same]] == rowhash[same]
+    keep, redo = np.flatnonzero(same), np.flatnonzero(~same)
+    if len(redo) > MB_PATCH_MAX_FRACTION * len(df):
+        return None
+    parts = [prev["MB"][_P_COLUMNS].iloc[old_pos[keep]]]
+    if len(redo):
+        parts.append(_parse(df.iloc[redo], ctx))
+    P = pd.concat(parts) if len(parts) > 1 else parts[0]
+    P = P.iloc[np.argsort(np.concatenate([keep, redo]), kind="stable")]
+    P.index = df.index
+    matched = int((old_pos >= 0).sum())
+    stats = {"reutilizadas": int(len(keep)), "cambiadas": int((old_pos[redo] >= 0).sum()),
+             "nuevas": int((old_pos[redo] < 0).sum()), "eliminadas": len(old_keys) - matched}
+    return _assemble_mb(df, ctx, P), stats
+
+# ----------------- MB cacheado por snapshot -----------------
+# Base por versión de snapshot (sin nada relativo a "hoy": sobrevive al cambio de día) y vistas por
+# (snapshot, fecha de corte) con las columnas relativas, que se calculan al primer uso de esa fecha.
+_MB_BASES: "OrderedDict[str, dict]" = OrderedDict()
+_MB_CACHE: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+_MB_LOCK = threading.Lock()
+_MB_CACHE_SIZE = 4
+
+def _same_context(a: dict, b: dict) -> bool:
+    return a["plan"]["cols"] == b["plan"]["cols"] and a["date_fmt"] == b["date_fmt"]
+
+def mb_base(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    MB base cacheado por versión de snapshot. Si hay una base anterior con el mismo plan de columnas y
+    formatos de fecha, se parchea (solo filas cambiadas/nuevas) y sus índices de texto se parchean igual.
+    """
+    ver = snapshot_version(df_raw)
+    with _MB_LOCK:
+        entry = _MB_BASES.get(ver)
+        if entry is not None:
+            _MB_BASES.move_to_end(ver)
+            note_cache("mb_base", True)
+            return entry["MB"]
+    note_cache("mb_base", False)
+
+    def build():
+        with span("build_mb", rows=int(len(df_raw))) as s:
+            ctx = _mb_context(df_raw)
+            rowkey, rowhash = _row_ids(df_raw, ctx["plan"])
+            with _MB_LOCK:
+                prev = next(reversed(_MB_BASES.values()), None)
+            patched = None
+            if prev is not None and _same_context(prev["ctx"], ctx):
+                patched = _patch_base(prev, df_raw, ctx, rowkey, rowhash)
+            if patched is not None:
+                MB, stats = patched
+                s.update(modo="incremental", **stats)
+            else:
+                MB = _build_mb_base(df_raw, ctx=ctx)
+                s["modo"] = "completo"
+        tag_snapshot(MB, ver)
+        with _MB_LOCK:
+            _MB_BASES[ver] = {"MB": MB, "ctx": ctx, "rowkey": rowkey, "rowhash": rowhash}
+            while len(_MB_BASES) > _MB_CACHE_SIZE:
+                _MB_BASES.popitem(last=False)
+        if patched is not None:
+            patch_indexes(prev["MB"], MB)
+        return MB
+    return flight("mb_base").do(ver, build)
+
+def mb_rowkeys(df_raw: pd.DataFrame) -> np.ndarray:
+    """Clave por fila (OT/PATENTE + n° de ocurrencia) alineada con mb_base(df_raw); la del cache si está."""
+    mb_base(df_raw)
+    with _MB_LOCK:
+        entry = _MB_BASES.get(snapshot_version(df_raw))
+    return entry["rowkey"] if entry is not None else _row_ids(df_raw, mb_plan(df_raw))[0]
+
+def mb_for(df_raw: pd.DataFrame, asof=None) -> pd.DataFrame:
+    """
+    Vista de MB para la fecha de corte `asof` (por defecto hoy), cacheada por (versión de snapshot, fecha):
+    las skills, el parser libre y QuerySpec comparten la misma vista (y sus índices de texto, que son de
+    la base). El resultado es compartido: no mutarlo.
+    """
+    day = date.today() if asof is None else pd.Timestamp(asof).date()
+    key = (snapshot_version(df_raw), day)
+    with _MB_LOCK:
+        MB = _MB_CACHE.get(key)
+        if MB is not None:
+            _MB_CACHE.move_to_end(key)
+            note_cache("mb", True)
+            return MB
+    note_cache("mb", False)
+
+    def build():
+        base = mb_base(df_raw)
+        with span("mb_asof", fecha=str(day)):
+            MB = tag_snapshot(with_asof(base, asof), key[0])  # comparte índices de texto/clave con la base
+        with _MB_LOCK:
+            _MB_CACHE[key] = MB
+            while len(_MB_CACHE) > _MB_CACHE_SIZE:
+                _MB_CACHE.popitem(last=False)
+        return MB
+    return flight("mb").do(key, build)
+
+def upsert_rows(df_raw: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Hoja cruda con `rows` aplicadas por clave OT/PATENTE: las claves existentes se reemplazan en su lugar,
+    las nuevas se agregan al final. El resultado es un snapshot nuevo; mb_for/mb_base lo derivan
+    parchando la base anterior (solo se parsean esas filas).
+    """
+    plan = mb_plan(df_raw)
+    kcols = [c for c in (plan["cols"].get("ot"), plan["cols"].get("patente")) if c is not None]
+    if not kcols:
+        raise ValueError("MODELO_BOT sin columnas OT/PATENTE: no hay clave para actualizar filas")
+    rows = rows.reindex(columns=df_raw.columns)
+    k_old = pd.MultiIndex.from_frame(df_raw[kcols].astype(str))
+    first = ~k_old.duplicated(keep="first")  # clave repetida en la hoja: se actualiza su primera fila
+    loc = k_old[first].get_indexer(pd.MultiIndex.from_frame(rows[kcols].astype(str)))
+    hit = loc >= 0
+    out = df_raw.copy()
+    out.iloc[np.flatnonzero(first)[loc[hit]]] = rows[hit].to_numpy()
+    out = pd.concat([out, rows[~hit]], ignore_index=isinstance(df_raw.index, pd.RangeIndex))
+    stamp_snapshot({"MODELO_BOT": out})
+    return out
+
+def _contains(t: pd.DataFrame, MB: pd.DataFrame, col: str, term) -> pd.DataFrame:
+    """Filtro "contiene" (sin acentos) usando el índice de trigramas de la columna completa."""
+    return t[ilike(t[col], term, index=index_for(MB, col))]
+
+# tope de filas en pantalla; los exportes completos llaman a la misma skill con limit=None
+DISPLAY_LIMIT = 200
+
+# orden de cada listado (mismo sort_values de la skill) para paginar por clave (utils.paging)
+PAGE_ORDER = {
+    "entregados_sin_factura": ("FECHA_ENTREGA", False),
+    "entregados_facturados": ("FECHA_ENTREGA", False),
+    "entregas_proximas_sin_factura": ("FECHA_ENTREGA", True),
+    "sin_aprobacion": ("NUMERO_DIAS_EN_PLANTA", False),
+    "facturados_pago_vencido": ("DIAS_VENCIDA", False),
+}
+
+def _cap(t: pd.DataFrame, limit) -> pd.DataFrame:
+    return t if limit is None else t.head(int(limit))
+
 def _with_id_first(df):
     cols = list(df.columns)
     idc = next((c for c in cols if c.lower() in ("id","patente","placa","ot")), None)
@@ -114,32 +487,32 @@ def _with_id_first(df):
     return df
 
 # ----------------- SKILLS deterministas -----------------
-def skill_entregados_sin_factura(df_raw, **f):
-    MB = _build_mb(df_raw)
+def skill_entregados_sin_factura(df_raw, limit=DISPLAY_LIMIT, **f):
+    MB = mb_for(df_raw)
     t = MB[MB["entregado_bool"] & MB["no_facturado_bool"]].copy()
-    if v:=f.get("cliente"):      t = t[ilike(t["NOMBRE_CLIENTE"], v)]
+    if v:=f.get("cliente"):      t = _contains(t, MB, "NOMBRE_CLIENTE", v)
     if v:=f.get("tipo_cliente"): t = t[t["TIPO_CLIENTE"].astype(str).str.lower()==str(v).lower()]
     if v:=f.get("marca"):        t = t[t["MARCA"].astype(str).str.lower()==str(v).lower()]
     if v:=f.get("sucursal") and "SUCURSAL" in t.columns: t = t[t["SUCURSAL"].astype(str).str.lower()==str(v).lower()]
     if v:=f.get("desde"):        t = t[t["FECHA_ENTREGA"]>=pd.to_datetime(v, errors="coerce")]
     if v:=f.get("hasta"):        t = t[t["FECHA_ENTREGA"]<=pd.to_datetime(v, errors="coerce")]
     cols = [c for c in ["id","NOMBRE_CLIENTE","PATENTE","MARCA","FECHA_ENTREGA","NUMERO_FACTURA","FECHA_FACTURACION","MONTO_NETO","NUMERO_DIAS_EN_PLANTA"] if c in t.columns]
-    return _with_id_first(t[cols].sort_values("FECHA_ENTREGA", ascending=False).head(200)), None
+    return _with_id_first(_cap(t[cols].sort_values("FECHA_ENTREGA", ascending=False), limit)), None
 
-def skill_entregados_facturados(df_raw, **f):
-    MB = _build_mb(df_raw)
+def skill_entregados_facturados(df_raw, limit=DISPLAY_LIMIT, **f):
+    MB = mb_for(df_raw)
     t = MB[MB["entregado_bool"] & MB["facturado_bool"]].copy()
-    if v:=f.get("cliente"):      t = t[ilike(t["NOMBRE_CLIENTE"], v)]
+    if v:=f.get("cliente"):      t = _contains(t, MB, "NOMBRE_CLIENTE", v)
     if v:=f.get("tipo_cliente"): t = t[t["TIPO_CLIENTE"].astype(str).str.lower()==str(v).lower()]
     if v:=f.get("marca"):        t = t[t["MARCA"].astype(str).str.lower()==str(v).lower()]
     if v:=f.get("sucursal") and "SUCURSAL" in t.columns: t = t[t["SUCURSAL"].astype(str).str.lower()==str(v).lower()]
     if v:=f.get("desde"):        t = t[t["FECHA_ENTREGA"]>=pd.to_datetime(v, errors="coerce")]
     if v:=f.get("hasta"):        t = t[t["FECHA_ENTREGA"]<=pd.to_datetime(v, errors="coerce")]
     cols = [c for c in ["id","NOMBRE_CLIENTE","PATENTE","MARCA","NUMERO_FACTURA","FECHA_FACTURACION","FECHA_ENTREGA","MONTO_NETO","NUMERO_DIAS_EN_PLANTA"] if c in t.columns]
-    return _with_id_first(t[cols].sort_values("FECHA_ENTREGA", ascending=False).head(200)), None
+    return _with_id_first(_cap(t[cols].sort_values("FECHA_ENTREGA", ascending=False), limit)), None
 
 def skill_top_en_taller(df_raw, topn=10, **f):
-    MB = _build_mb(df_raw)
+    MB = mb_for(df_raw)
     t = MB[~MB["entregado_bool"]].copy()
     if v:=f.get("marca"):        t = t[t["MARCA"].astype(str).str.lower()==str(v).lower()]
     if v:=f.get("tipo_cliente"): t = t[t["TIPO_CLIENTE"].astype(str).str.lower()==str(v).lower()]
@@ -149,29 +522,153 @@ def skill_top_en_taller(df_raw, topn=10, **f):
     return _with_id_first(t), None
 
 def skill_facturacion_por_mes_tipo(df_raw, mes:int, anio:int):
-    MB = _build_mb(df_raw)
+    MB = mb_for(df_raw)
     fecha = pd.to_datetime(MB["fecha_op"], errors="coerce")
     t = MB[(fecha.dt.month==int(mes)) & (fecha.dt.year==int(anio))].copy()
     if t.empty: return pd.DataFrame(columns=["TIPO_CLIENTE","MONTO_NETO"]), None
     t = t.groupby("TIPO_CLIENTE", dropna=False, as_index=False)["MONTO_NETO"].sum().sort_values("MONTO_NETO", ascending=False)
     return t, None
 
-def skill_entregas_proximos_dias_sin_factura(df_raw, horizonte_dias:int=7):
-    MB = _build_mb(df_raw)
+def skill_entregas_proximos_dias_sin_factura(df_raw, horizonte_dias:int=7, limit=DISPLAY_LIMIT):
+    MB = mb_for(df_raw)
     hoy = pd.Timestamp.today().normalize()
     lim = hoy + pd.Timedelta(days=int(horizonte_dias))
     t = MB[(MB["entregado_bool"]) & (MB["no_facturado_bool"]) & MB["FECHA_ENTREGA"].between(hoy, lim)].copy()
     cols = [c for c in ["id","NOMBRE_CLIENTE","PATENTE","MARCA","FECHA_ENTREGA","dias_desde_entrega"] if c in t.columns]
-    t = t[cols].sort_values("FECHA_ENTREGA", ascending=True).head(200)
+    t = _cap(t[cols].sort_values("FECHA_ENTREGA", ascending=True), limit)
     return _with_id_first(t), None
 
-def skill_sin_aprobacion(df_raw):
-    MB = _build_mb(df_raw)
+def skill_sin_aprobacion(df_raw, limit=DISPLAY_LIMIT):
+    MB = mb_for(df_raw)
     t = MB[(~MB["entregado_bool"]) & (MB["no_facturado_bool"])].copy()
     cols = [c for c in ["id","NOMBRE_CLIENTE","PATENTE","MARCA","FECHA_RECEPCION","NUMERO_DIAS_EN_PLANTA"] if c in t.columns]
-    t = t[cols].sort_values("NUMERO_DIAS_EN_PLANTA", ascending=False).head(200)
+    t = _cap(t[cols].sort_values("NUMERO_DIAS_EN_PLANTA", ascending=False), limit)
     return _with_id_first(t), None
 
+# ----------------- Búsqueda directa por clave (PATENTE / OT / factura) -----------------
+TIMELINE_HITOS = [
+    ("Recepción", "FECHA_RECEPCION"),
+    ("Ingreso planta", "FECHA_INGRESO_PLANTA"),
+    ("Salida planta", "FECHA_SALIDA_PLANTA"),
+    ("Entrega", "FECHA_ENTREGA"),
+    ("Facturación", "FECHA_FACTURACION"),
+    ("Pago factura", "FECHA_PAGO_FACTURA"),
+]
+_LOOKUP_COLS = ["id","PATENTE","OT","NOMBRE_CLIENTE","MARCA","MODELO","ESTADO_SERVICIO",
+                *[c for _, c in TIMELINE_HITOS], "NUMERO_FACTURA","MONTO_NETO","NUMERO_DIAS_EN_PLANTA"]
+
+def skill_buscar_vehiculos(df_raw, claves):
+    """
+    Una o varias claves (patente, OT o n° de factura; lista o texto pegado) → filas de MB vía índice hash.
+    Las claves sin resultado quedan en t.attrs["no_encontradas"].
+    """
+    MB = mb_for(df_raw)
+    idx = key_index(MB)
+    claves = split_keys(claves) if isinstance(claves, str) else [str(c) for c in claves if str(c).strip()]
+    if not claves:
+        return None, "Indica al menos una patente, OT o número de factura."
+    parts, missing = [], []
+    for clave in claves:
+        kind, pos = idx.positions(clave)
+        if not len(pos):
+            missing.append(clave)
+            continue
+        parts.append(pd.DataFrame({"CLAVE": clave, "TIPO_CLAVE": kind}, index=MB.index[pos]).join(MB.iloc[pos]))
+    if not parts:
+        return None, f"Sin coincidencias para: {', '.join(missing)}"
+    t = pd.concat(parts)
+    t = t[["CLAVE","TIPO_CLAVE"] + [c for c in _LOOKUP_COLS if c in t.columns]].reset_index(drop=True)
+    t.attrs["no_encontradas"] = missing
+    return t, None
+
+def skill_timeline_vehiculo(df_raw, clave: str):
+    """Hitos de una patente/OT/factura en orden (recepción → … → pago) con días entre hitos."""
+    MB = mb_for(df_raw)
+    rows = MB.iloc[key_index(MB).positions(clave)[1]]
+    if rows.empty:
+        return None, f"Sin coincidencias para: {clave}"
+    out = []
+    for _, r in rows.iterrows():
+        prev = None
+        for hito, col in TIMELINE_HITOS:
+            fecha = r.get(col)
+            if pd.isna(fecha):
+                continue
+            out.append({"OT": r.get("OT"), "PATENTE": r.get("PATENTE"), "HITO": hito, "FECHA": fecha,
+                        "DIAS_DESDE_ANTERIOR": None if prev is None else int((fecha - prev).days)})
+            prev = fecha
+        if prev is None:  # esta fila no aportó hitos (no comparar por OT: NaN != NaN)
+            out.append({"OT": r.get("OT"), "PATENTE": r.get("PATENTE"), "HITO": "(sin fechas)", "FECHA": pd.NaT,
+                        "DIAS_DESDE_ANTERIOR": None})
+    return pd.DataFrame(out).astype({"DIAS_DESDE_ANTERIOR": "Int64"}), None
+
+# ----------------- MODELO_BOT ⋈ FINANZAS (por folio) -----------------
+def _join_or_err(data: dict):
+    J = mb_fin_join(data)
+    if J is None:
+        return None, "Falta la hoja FINANZAS (verifica que se esté cargando junto a MODELO_BOT)."
+    return J, None
+
+def skill_facturados_pago_vencido(data: dict, cliente=None, limit=DISPLAY_LIMIT):
+    """Entregados y facturados cuya factura en FINANZAS sigue por pagar con vencimiento pasado."""
+    J, err = _join_or_err(data)
+    if err: return None, err
+    hoy = pd.Timestamp.today().normalize()
+    t = J[J["entregado_bool"] & J["facturado_bool"] & J["por_pagar_bool"] & (J["vencimiento"] < hoy)].copy()
+    if cliente: t = t[ilike(t["NOMBRE_CLIENTE"], cliente)]
+    t["DIAS_VENCIDA"] = (hoy - t["vencimiento"]).dt.days
+    t = t.rename(columns={"vencimiento": "FECHA_VENCIMIENTO", "estado_pago": "ESTADO_PAGO", "monto": "MONTO_FINANZAS"})
+    cols = [c for c in ["id","NOMBRE_CLIENTE","NUMERO_FACTURA","FECHA_FACTURACION","FECHA_VENCIMIENTO",
+                        "DIAS_VENCIDA","ESTADO_PAGO","MONTO_FINANZAS","MONTO_NETO"] if c in t.columns]
+    return _with_id_first(_cap(t[cols].sort_values("DIAS_VENCIDA", ascending=False), limit)), None
+
+def skill_aging_pagos_por_cliente(data: dict):
+    """Facturas por pagar por cliente y tramo de días vencidos (Por vencer, 1-30, 31-60, 61-90, +90)."""
+    J, err = _join_or_err(data)
+    if err: return None, err
+    hoy = pd.Timestamp.today().normalize()
+    t = J[J["por_pagar_bool"] & J["vencimiento"].notna()].copy()
+    if t.empty: return pd.DataFrame(columns=["NOMBRE_CLIENTE","TOTAL"]), None
+    t["TRAMO"] = aging_bucket((hoy - t["vencimiento"]).dt.days)
+    t["MONTO"] = t["monto"].fillna(t["MONTO_NETO"])
+    g = t.pivot_table(index="NOMBRE_CLIENTE", columns="TRAMO", values="MONTO", aggfunc="sum", fill_value=0)
+    g = g.reindex(columns=[b for _, _, b in AGING_BUCKETS if b in g.columns])
+    g["TOTAL"] = g.sum(axis=1)
+    g.columns.name = None
+    return g.sort_values("TOTAL", ascending=False).reset_index(), None
+
+# ----------------- Catálogo para puntos de entrada sin UI (api.py, batch.py) -----------------
+_FILTERS = ("cliente", "tipo_cliente", "marca", "sucursal", "asesor", "desde", "hasta")
+# nombre → (skill, recibe todas las hojas (FINANZAS) en vez de MODELO_BOT, parámetros aceptados)
+SKILL_CATALOG = {
+    "entregados_sin_factura": (skill_entregados_sin_factura, False, ("limit", *_FILTERS)),
+    "entregados_facturados": (skill_entregados_facturados, False, ("limit", *_FILTERS)),
+    "top_en_taller": (skill_top_en_taller, False, ("topn", "marca", "tipo_cliente", "sucursal")),
+    "facturacion_por_mes_tipo": (skill_facturacion_por_mes_tipo, False, ("mes", "anio")),
+    "entregas_proximos_dias_sin_factura": (skill_entregas_proximos_dias_sin_factura, False, ("horizonte_dias", "limit")),
+    "sin_aprobacion": (skill_sin_aprobacion, False, ("limit",)),
+    "buscar_vehiculos": (skill_buscar_vehiculos, False, ("claves",)),
+    "facturados_pago_vencido": (skill_facturados_pago_vencido, True, ("cliente", "limit")),
+    "aging_pagos_por_cliente": (skill_aging_pagos_por_cliente, True, ()),
+}
+
+def run_skill(data: dict, name: str, params: dict | None = None):
+    """
+    Skill del catálogo con parámetros validados → (df, err). KeyError si no existe, TypeError si sobra
+    un parámetro. mes/anio por defecto: el mes actual; limit por defecto: DISPLAY_LIMIT (None = sin tope).
+    """
+    fn, whole, allowed = SKILL_CATALOG[name]
+    params = dict(params or {})
+    extra = sorted(set(params) - set(allowed))
+    if extra:
+        raise TypeError(f"Parámetros no soportados para {name}: {', '.join(extra)}")
+    if name == "facturacion_por_mes_tipo":
+        hoy = date.today()
+        params["mes"], params["anio"] = int(params.get("mes") or hoy.month), int(params.get("anio") or hoy.year)
+    if "limit" in allowed:
+        params.setdefault("limit", DISPLAY_LIMIT)
+    return fn(data if whole else data.get("MODELO_BOT", next(iter(data.values()))), **params)
+
 # ----------------- Fallback libre robusto -----------------
 SPANISH_MONTHS = {
     "enero":1,"febrero":2,"marzo":3,"abril":4,"mayo":5,"junio":6,
@@ -181,61 +678,113 @@ SPANISH_MONTHS = {
 
 _DATE_RE = r"(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})"
 
+# Tokenizador de una pasada: una sola regex compilada con alternativas nombradas, recorrida con
+# finditer sobre la pregunta normalizada. El orden importa (la primera alternativa que calza gana):
+# frases largas antes que sus prefijos ("tipo de cliente" antes que "cliente", "no entreg" antes que "entreg").
+_SLOT_KEYWORDS = {
+    "tipo_cliente":    r"tipo (?:de )?cliente",
+    "estado_servicio": r"estado (?:del )?servicio",
+    "cliente":         r"cliente",
+    "marca":           r"marca",
+    "patente":         r"patente",
+    "sucursal":        r"(?:sucursal|sede)",
+}
+_FREEFORM_RE = re.compile(r"\b(?:" + "|".join([
+    rf"(?P<rango>del\s+{_DATE_RE}\s+al\s+(\d{{1,2}}[-/]\d{{1,2}}[-/]\d{{2,4}}))",
+    rf"(?P<desde>desde\s+(\d{{1,2}}[-/]\d{{1,2}}[-/]\d{{2,4}}))",
+    rf"(?P<hasta>hasta\s+(\d{{1,2}}[-/]\d{{1,2}}[-/]\d{{2,4}}))",
+    r"(?P<prox>proxim[oa]s?\s+(\d+)\s+dias)",
+    r"(?P<ult>ultim[oa]s?\s+(\d+)\s+dias)",
+    r"(?P<anio>(?:19|20)\d{2}\b)",
+    r"(?P<mes>(?:" + "|".join(SPANISH_MONTHS) + r")\b)",
+    *(rf"(?P<kw_{k}>{pat}\b)" for k, pat in _SLOT_KEYWORDS.items()),
+    # estados (también cortan el valor de un slot de texto)
+    r"(?P<st_no_entreg>no entreg\w*)",
+    r"(?P<st_taller>en taller)",
+    r"(?P<st_sin_factura>sin factura\w*)",
+    r"(?P<st_no_factur>no factur\w*)",
+    r"(?P<st_pend_factur>pendientes? de factur\w*)",
+    r"(?P<st_entregad>entregad\w*)",
+    r"(?P<st_facturad>facturad\w*)",
+]) + ")")
+# raíces que pueden aparecer dentro de otras palabras (foco de fecha / flags): basta un "in"
+_DATE_STEMS = ("factur", "entreg", "recep", "pago")
+# valores de texto: mismo juego de caracteres que antes; se recortan conectores al final
+_VALUE_STOP_RE = re.compile(r"[^a-z0-9\-\. ]")
+_TRAILING_WORDS = {"de", "del", "la", "las", "el", "los", "en", "y", "con", "para", "que", "por", "entre", "a", "al",
+                   "es", "esta", "estan", "son", "hay", "tiene", "tienen"}
+_STATE_STEMS = {
+    "st_no_entreg": ("entreg", "no entreg"), "st_taller": ("en taller",),
+    "st_sin_factura": ("factur", "sin factura"), "st_no_factur": ("factur", "no factur"),
+    "st_pend_factur": ("factur", "pendiente de factur"),
+    "st_entregad": ("entreg",), "st_facturad": ("factur", "facturad"),
+}
+
+def _slot_value(s: str, start: int, end: int, single_token: bool) -> str | None:
+    v = s[start:end]
+    cut = _VALUE_STOP_RE.search(v)
+    if cut:
+        v = v[:cut.start()]
+    words = v.split()
+    if single_token:
+        words = words[:1]
+    while words and words[-1] in _TRAILING_WORDS:
+        words.pop()
+    return " ".join(words) or None
+
 def _parse_freeform(question: str):
     s = _norm_text(question)
 
-    # foco de fecha (elige columna)
+    seen = {stem for stem in _DATE_STEMS if stem in s}
+    mes = anio = start = end = prox_dias = ult_dias = None
+    slots: dict[str, str | None] = {k: None for k in _SLOT_KEYWORDS}
+    pending = None  # (slot, inicio del valor) a la espera del próximo token fuerte
+
+    for m in _FREEFORM_RE.finditer(s):
+        kind = m.lastgroup
+        if pending:
+            slot, v0 = pending
+            pending = None
+            if slots[slot] is None:
+                slots[slot] = _slot_value(s, v0, m.start(), slot == "patente")
+        if kind.startswith("kw_"):
+            pending = (kind[3:], m.end())
+        elif kind.startswith("st_"):
+            seen.update(_STATE_STEMS[kind])
+        elif kind == "mes":
+            mes = mes or SPANISH_MONTHS[m.group(kind)]
+        elif kind == "anio":
+            anio = anio or int(m.group(kind))
+        elif kind == "rango":
+            i = m.re.groupindex[kind]
+            start = pd.to_datetime(m.group(i + 1), dayfirst=True, errors="coerce")
+            end = pd.to_datetime(m.group(i + 2), dayfirst=True, errors="coerce")
+        elif kind in ("desde", "hasta"):
+            val = pd.to_datetime(m.group(m.re.groupindex[kind] + 1), dayfirst=True, errors="coerce")
+            if kind == "desde": start = val
+            else:               end = val
+        elif kind == "prox":
+            prox_dias = prox_dias or int(m.group(m.re.groupindex[kind] + 1))
+        elif kind == "ult":
+            ult_dias = ult_dias or int(m.group(m.re.groupindex[kind] + 1))
+    if pending and slots[pending[0]] is None:
+        slots[pending[0]] = _slot_value(s, pending[1], len(s), pending[0] == "patente")
+
+    # foco de fecha (elige columna); mismo orden de prioridad que antes
     date_focus = None
-    if "factur" in s:     date_focus = "FECHA_FACTURACION"
-    if "entreg" in s:     date_focus = "FECHA_ENTREGA"
-    if "recep"  in s:     date_focus = "FECHA_RECEPCION"
-    if "pago"   in s:     date_focus = "FECHA_PAGO_FACTURA"
+    for stem, col in (("factur", "FECHA_FACTURACION"), ("entreg", "FECHA_ENTREGA"),
+                      ("recep", "FECHA_RECEPCION"), ("pago", "FECHA_PAGO_FACTURA")):
+        if stem in seen: date_focus = col
 
     # flags de estado
     entregado = None
-    if "entreg" in s:                      entregado = True
-    if "en taller" in s or "no entreg" in s: entregado = False
+    if "entreg" in seen:                          entregado = True
+    if "en taller" in seen or "no entreg" in seen: entregado = False
 
     facturado = None
-    if "sin factura" in s or "no factur" in s or "pendiente de factur" in s: facturado = False
-    if re.search(r"\bfacturad", s) and "no factur" not in s and "sin factura" not in s: facturado = True
-
-    # meses / año
-    mes, anio = None, None
-    for name, num in SPANISH_MONTHS.items():
-        if re.search(rf"\b{name}\b", s): mes = num; break
-    m = re.search(r"\b(20\d{2}|19\d{2})\b", s)
-    if m: anio = int(m.group(1))
-
-    # fechas explícitas
-    d1 = re.search(r"desde\s+" + _DATE_RE, s)
-    d2 = re.search(r"hasta\s+" + _DATE_RE, s)
-    start = pd.to_datetime(d1.group(1), dayfirst=True, errors="coerce") if d1 else None
-    end   = pd.to_datetime(d2.group(1), dayfirst=True, errors="coerce") if d2 else None
-    # también "del X al Y"
-    d12 = re.search(r"del\s+" + _DATE_RE + r"\s+al\s+" + _DATE_RE, s)
-    if d12:
-        start = pd.to_datetime(d12.group(1), dayfirst=True, errors="coerce")
-        end   = pd.to_datetime(d12.group(2), dayfirst=True, errors="coerce")
-
-    prox_dias = None
-    m = re.search(r"proxim[oa]s?\s+(\d+)\s+d[ií]as", s)
-    if m: prox_dias = int(m.group(1))
-    ult_dias = None
-    m = re.search(r"[uú]ltim[oa]s?\s+(\d+)\s+d[ií]as", s)
-    if m: ult_dias = int(m.group(1))
-
-    # filtros comunes
-    def pick(pattern):
-        m = re.search(pattern, s)
-        return m.group(1).strip() if m else None
-
-    cliente = pick(r"cliente\s+([a-z0-9\-\. ]+)")
-    marca   = pick(r"marca\s+([a-z0-9\-\. ]+)")
-    patente = pick(r"patente\s+([a-z0-9\-]+)")
-    tipo_cli = pick(r"tipo (?:de )?cliente\s+([a-z0-9\-\. ]+)")
-    sucursal = pick(r"(?:sucursal|sede)\s+([a-z0-9\-\. ]+)")
-    estado   = pick(r"estado (?:servicio|del servicio)\s+([a-z0-9\-\. ]+)")
+    negado = {"sin factura", "no factur", "pendiente de factur"} & seen
+    if negado:                                 facturado = False
+    if "facturad" in seen and not ({"sin factura", "no factur"} & seen): facturado = True
 
     return {
         "date_focus": date_focus,
@@ -244,8 +793,9 @@ def _parse_freeform(question: str):
         "mes": mes, "anio": anio,
         "start": start, "end": end,
         "prox_dias": prox_dias, "ult_dias": ult_dias,
-        "cliente": cliente, "marca": marca, "patente": patente,
-        "tipo_cliente": tipo_cli, "sucursal": sucursal, "estado_servicio": estado,
+        "cliente": slots["cliente"], "marca": slots["marca"], "patente": slots["patente"],
+        "tipo_cliente": slots["tipo_cliente"], "sucursal": slots["sucursal"],
+        "estado_servicio": slots["estado_servicio"],
     }
 
 def _choose_date_col(MB: pd.DataFrame, focus: str | None) -> str:
@@ -257,8 +807,8 @@ def _choose_date_col(MB: pd.DataFrame, focus: str | None) -> str:
 def parse_freeform_query(q: str):
     return _parse_freeform(q)
 
-def skill_consulta_vehiculos_freeform(df_raw, question: str):
-    MB = _build_mb(df_raw)
+def skill_consulta_vehiculos_freeform(df_raw, question: str, limit=300):
+    MB = mb_for(df_raw)
     f = _parse_freeform(question)
     t = MB.copy()
 
@@ -269,9 +819,9 @@ def skill_consulta_vehiculos_freeform(df_raw, question: str):
     if f["facturado"] is False: t = t[t["no_facturado_bool"]]
 
     # filtros por texto
-    if f["cliente"]:      t = t[ilike(t["NOMBRE_CLIENTE"], f["cliente"])]
+    if f["cliente"]:      t = _contains(t, MB, "NOMBRE_CLIENTE", f["cliente"])
     if f["marca"]:        t = t[t["MARCA"].astype(str).str.lower()==f["marca"].lower()]
-    if f["patente"]:      t = t[ilike(t["PATENTE"], f["patente"])]
+    if f["patente"]:      t = _contains(t, MB, "PATENTE", f["patente"])
     if f["tipo_cliente"]: t = t[t["TIPO_CLIENTE"].astype(str).str.lower()==f["tipo_cliente"].lower()]
     if f["sucursal"] and "SUCURSAL" in t.columns:
         t = t[t["SUCURSAL"].astype(str).str.lower()==f["sucursal"].lower()]
@@ -303,4 +853,8 @@ def skill_consulta_vehiculos_freeform(df_raw, question: str):
             if c in t.columns]
     if "FECHA_ENTREGA" in t.columns:
         t = t.sort_values("FECHA_ENTREGA", ascending=False)
-    return _with_id_first(t.head(300)), None
+    out = _with_id_first(_cap(t, limit))
+    # cliente que no aparece en la hoja: sin filas + "¿quisiste decir …?" (patente/OT no: otra patente es otro vehículo)
+    if out.empty and f["cliente"] and (sug := suggest_values(MB, "NOMBRE_CLIENTE", f["cliente"])):
+        out.attrs["quisiste_decir"] = did_you_mean(f["cliente"], sug)
+    return out, None
@@ -0,0 +1,50 @@
+# utils/snapshot.py — versión de snapshot (hash de contenido) de las hojas cargadas
+# Sirve como clave estable para coalescing/caches: dos cargas con el mismo contenido → misma versión.
+# pandas copia attrs a todo frame derivado (head, filtros, copy, selección de columnas): la marca guarda
+# además la forma del frame marcado (filas, columnas, primera/última etiqueta del índice) y solo vale si
+# coincide; cualquier otro frame se versiona por su contenido. Editar en sitio el frame marcado no se detecta.
+import hashlib
+from datetime import datetime
+import pandas as pd
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Hash de contenido (valores + índice + encabezados) de un DataFrame."""
+    h = hashlib.sha1()
+    h.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    h.update(str(df.shape).encode("utf-8"))
+    if len(df):
+        h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return h.hexdigest()[:16]
+
+def _shape(df: pd.DataFrame) -> tuple:
+    idx = df.index
+    ends = (str(idx[0]), str(idx[-1])) if len(idx) else (None, None)
+    return (len(df), tuple(map(str, df.columns)), *ends)
+
+def stamp_snapshot(data: dict, loaded_at: datetime | None = None) -> dict:
+    """Marca cada hoja con su versión y hora de carga en df.attrs (sobrevive a st.cache_data)."""
+    ts = (loaded_at or datetime.now()).isoformat(timespec="seconds")
+    for df in data.values():
+        df.attrs["snapshot_version"] = frame_fingerprint(df)
+        df.attrs["snapshot_shape"] = _shape(df)
+        df.attrs["loaded_at"] = ts
+    return data
+
+def tag_snapshot(df: pd.DataFrame, version: str) -> pd.DataFrame:
+    """Marca `df` (un derivado completo del snapshot, p. ej. MB) con la versión de su origen."""
+    df.attrs["snapshot_version"] = version
+    df.attrs["snapshot_shape"] = _shape(df)
+    return df
+
+def snapshot_version(obj) -> str:
+    """Versión de un DataFrame o de un dict {hoja: DataFrame} (se calcula y guarda si falta)."""
+    if isinstance(obj, pd.DataFrame):
+        v, shape = obj.attrs.get("snapshot_version"), _shape(obj)
+        if not v or obj.attrs.get("snapshot_shape") != shape:  # sin marca, o heredada de otro frame
+            v = obj.attrs["snapshot_version"] = frame_fingerprint(obj)
+            obj.attrs["snapshot_shape"] = shape
+        return v
+    if isinstance(obj, dict):
+        parts = [f"{k}={snapshot_version(v)}" for k, v in sorted(obj.items()) if isinstance(v, pd.DataFrame)]
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+    raise TypeError(f"snapshot_version: tipo no soportado {type(obj).__name__}")
@@ -0,0 +1,103 @@
+# utils/sources.py — origen de las hojas sin Streamlit: Google Sheets (cuenta de servicio) o datos fijos
+# app.py usa gsheets.load_sheets (st.cache_data encima de fetch_sheets); api.py usa una de estas fuentes,
+# que guardan el snapshot en memoria con TTL y coalescen recargas concurrentes.
+import os, json, time, threading
+import pandas as pd
+from .singleflight import flight
+from .snapshot import stamp_snapshot
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets.readonly",
+    "https://www.googleapis.com/auth/drive.readonly",
+]
+ALLOW_SHEETS = ("MODELO_BOT", "FINANZAS")
+
+def parse_service_info(svc) -> dict:
+    """Credenciales de la cuenta de servicio: dict, JSON en texto o ruta a un archivo JSON."""
+    if svc is None:
+        raise RuntimeError("Faltan credenciales GOOGLE_SERVICE_ACCOUNT")
+    if isinstance(svc, str):
+        try:
+            if not svc.lstrip().startswith("{") and os.path.exists(svc):
+                with open(svc, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            return json.loads(svc)
+        except Exception as e:
+            raise RuntimeError(f"GOOGLE_SERVICE_ACCOUNT debe ser JSON válido. Detalle: {e}")
+    return dict(svc)
+
+def fetch_sheets(sheet_id: str, svc_info: dict, allow_sheets=ALLOW_SHEETS) -> dict:
+    """Lee las hojas permitidas como DataFrames de texto y las marca con su versión de snapshot."""
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    creds = Credentials.from_service_account_info(svc_info, scopes=SCOPES)
+    client = gspread.authorize(creds)
+
+    try:
+        sh = client.open_by_key(sheet_id)
+    except Exception as e:
+        correo = svc_info.get("client_email","(sin email)")
+        raise RuntimeError(
+            "No se encontró la planilla o no hay acceso.\n"
+            f"- Verifica SHEET_ID.\n"
+            f"- Comparte el archivo con: {correo} (Viewer)."
+        )
+
+    data = {}
+    for ws in sh.worksheets():
+        name = ws.title.strip()
+        if name.upper() not in [s.upper() for s in allow_sheets]:
+            continue
+        values = ws.get_all_records()
+        if not values:
+            continue
+        df = pd.DataFrame(values, dtype=str)
+        df = df.loc[:, ~df.columns.duplicated()]
+        data[name] = df
+
+    if not data:
+        raise RuntimeError("No se pudieron cargar hojas permitidas. Verifica nombres y permisos.")
+    return stamp_snapshot(data)
+
+class GSheetSource:
+    """
+    Google Sheets con TTL (mismo criterio que st.cache_data(ttl=600) de la app). on_load(data) corre tras
+    cada lectura de la planilla (p. ej. registrar el snapshot en utils.history).
+    """
+    def __init__(self, sheet_id: str, svc_info: dict, ttl: float = 600, allow_sheets=ALLOW_SHEETS, on_load=None):
+        self.sheet_id, self.svc_info, self.ttl, self.allow_sheets = sheet_id, svc_info, ttl, allow_sheets
+        self.on_load = on_load
+        self._lock = threading.Lock()
+        self._data: dict | None = None
+        self._at = 0.0
+
+    @classmethod
+    def from_env(cls, **kw) -> "GSheetSource":
+        sheet_id = os.environ.get("SHEET_ID", "")
+        if not sheet_id:
+            raise RuntimeError("Falta SHEET_ID en el entorno")
+        ttl = float(os.environ.get("FENIX_SHEETS_TTL", 600))
+        return cls(sheet_id, parse_service_info(os.environ.get("GOOGLE_SERVICE_ACCOUNT")), ttl=ttl, **kw)
+
+    def load(self, force: bool = False) -> dict:
+        with self._lock:
+            if self._data is not None and not force and time.monotonic() - self._at < self.ttl:
+                return self._data
+
+        def fetch():
+            data = fetch_sheets(self.sheet_id, self.svc_info, self.allow_sheets)
+            with self._lock:
+                self._data, self._at = data, time.monotonic()
+            if self.on_load is not None:
+                self.on_load(data)
+            return data
+        return flight("sheets").do(self.sheet_id, fetch)
+
+class StaticSource:
+    """Hojas fijas (p. ej. bench.synthetic.make_data) para probar la API sin Google Sheets."""
+    def __init__(self, data: dict):
+        self._data = stamp_snapshot(data)
+
+    def load(self, force: bool = False) -> dict:
+        return self._data
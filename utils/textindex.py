@@ -0,0 +1,188 @@
+# utils/textindex.py — índice de trigramas para búsquedas "contiene" sin acentos (clientes, patentes, OT)
+# Se construye una vez por snapshot y columna sobre los valores ÚNICOS normalizados; una búsqueda
+# intersecta las listas de trigramas del término, verifica los candidatos y proyecta a filas.
+# La búsqueda nunca cambia de término por su cuenta: sin coincidencias, suggest_values ofrece los valores más
+# parecidos (ranking por similitud) para un "¿quisiste decir …?".
+import re, threading
+from collections import Counter, OrderedDict
+import numpy as np
+import pandas as pd
+
+from .nlp import _norm
+from .singleflight import flight
+from .snapshot import snapshot_version
+from .tracing import span, note_cache
+
+FUZZY_MIN_SCORE = 0.5   # fracción de trigramas del término presentes en el valor
+FUZZY_LIMIT = 5         # sugerencias como máximo
+FUZZY_MIN_GRAMS = 3     # términos más cortos (< 5 letras) no reciben sugerencias
+_MAX_INDEXES = 16
+STALE_MAX = 0.25        # fracción de valores sin filas tolerada en un índice parchado
+
+def fold(s) -> str:
+    """Normalización de búsqueda: sin acentos, minúsculas, espacios simples."""
+    return re.sub(r"\s+", " ", _norm(s))
+
+def trigrams(s: str) -> set[str]:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+def _postings(values: list[str], start: int = 0) -> dict[str, np.ndarray]:
+    postings: dict[str, list[int]] = {}
+    for i, v in enumerate(values, start):
+        for g in trigrams(v):
+            postings.setdefault(g, []).append(i)
+    return {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+
+class TrigramIndex:
+    def __init__(self, series: pd.Series):
+        codes, uniques = pd.factorize(series, sort=False)
+        self.index = series.index
+        self.codes = codes
+        self.uniques = pd.Index(uniques)
+        self.raw = [str(u) for u in uniques]
+        self.values = [fold(u) for u in self.raw]
+        self.postings = _postings(self.values)
+
+    def patched(self, series: pd.Series) -> "TrigramIndex":
+        """
+        Índice para una versión nueva de la columna sin volver a trigramar los valores ya indexados: solo
+        los valores nuevos se normalizan y suman a las listas. Los que ya no aparecen quedan sin filas.
+        No modifica este índice (puede seguir en uso por el snapshot anterior).
+        """
+        known = self.uniques.get_indexer(series)
+        fresh = (known < 0) & series.notna().to_numpy()
+        new = TrigramIndex.__new__(TrigramIndex)
+        new.index = series.index
+        new.codes = known
+        codes, uniques = pd.factorize(series[fresh], sort=False)
+        n0 = len(self.raw)
+        new.codes[fresh] = codes + n0
+        new.uniques = self.uniques.append(pd.Index(uniques))
+        raw = [str(u) for u in uniques]
+        new.raw, new.values = self.raw + raw, self.values + [fold(u) for u in raw]
+        new.postings = dict(self.postings)
+        for g, ids in _postings(new.values[n0:], n0).items():
+            old = new.postings.get(g)
+            new.postings[g] = ids if old is None else np.concatenate([old, ids])
+        return new
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def contains(self, term: str) -> np.ndarray:
+        """Ids de valores únicos que contienen el término (normalizado)."""
+        t = fold(term)
+        grams = trigrams(t)
+        if not grams:  # términos de 1-2 letras: recorrido sobre los únicos
+            return np.asarray([i for i, v in enumerate(self.values) if t in v], dtype=np.int32)
+        lists = sorted((self.postings.get(g) for g in grams), key=lambda a: 0 if a is None else len(a))
+        if lists[0] is None:
+            return np.empty(0, dtype=np.int32)
+        cand = lists[0]
+        for ids in lists[1:]:
+            cand = np.intersect1d(cand, ids, assume_unique=True)
+            if not len(cand):
+                break
+        return np.asarray([i for i in cand if t in self.values[i]], dtype=np.int32)
+
+    def similar(self, term: str, limit: int = FUZZY_LIMIT, min_score: float = FUZZY_MIN_SCORE) -> list[tuple[int, float]]:
+        """(id, score) de los valores más parecidos al término; score = trigramas compartidos / trigramas del término."""
+        grams = trigrams(fold(term))
+        if len(grams) < FUZZY_MIN_GRAMS:
+            return []
+        hits = Counter()
+        for g in grams:
+            ids = self.postings.get(g)
+            if ids is not None:
+                hits.update(ids.tolist())
+        ranked = sorted(((i, n / len(grams)) for i, n in hits.items()),
+                        key=lambda x: (-x[1], len(self.values[x[0]])))
+        return [(i, s) for i, s in ranked if s >= min_score][:limit]
+
+    def rows(self, ids) -> pd.Series:
+        """Máscara booleana por fila (alineada al índice original) para los ids de valores únicos."""
+        return pd.Series(np.isin(self.codes, ids), index=self.index)
+
+    def mask(self, term: str) -> pd.Series:
+        return self.rows(self.contains(term))
+
+    def suggest(self, term: str, limit: int = FUZZY_LIMIT) -> list[tuple[str, float]]:
+        return [(self.raw[i], round(s, 2)) for i, s in self.similar(term, limit)]
+
+_INDEXES: "OrderedDict[tuple, TrigramIndex]" = OrderedDict()
+_LOCK = threading.Lock()
+
+def index_for(frame: pd.DataFrame, col: str) -> TrigramIndex | None:
+    """Índice de la columna `col` de `frame`, cacheado por (versión de snapshot, columna)."""
+    if col not in frame.columns:
+        return None
+    key = (snapshot_version(frame), len(frame), col)
+    with _LOCK:
+        idx = _INDEXES.get(key)
+        if idx is not None:
+            _INDEXES.move_to_end(key)
+            note_cache(f"text_index:{col}", True)
+            return idx
+    note_cache(f"text_index:{col}", False)
+
+    def build():
+        with span("text_index", col=col, rows=int(len(frame))):
+            idx = TrigramIndex(frame[col])
+        with _LOCK:
+            _INDEXES[key] = idx
+            while len(_INDEXES) > _MAX_INDEXES:
+                _INDEXES.popitem(last=False)
+        return idx
+    return flight("text_index").do(key, build)
+
+def patch_indexes(old: pd.DataFrame, new: pd.DataFrame) -> int:
+    """
+    Índices en cache de `old` → índices de `new` (otra versión del mismo frame, p. ej. MB parchado) sin
+    reconstruirlos. Si quedan demasiados valores sin filas se descarta y se reconstruye al primer uso.
+    """
+    old_key = (snapshot_version(old), len(old))
+    with _LOCK:
+        found = [(k[2], idx) for k, idx in _INDEXES.items() if k[:2] == old_key]
+    n = 0
+    for col, idx in found:
+        if col not in new.columns:
+            continue
+        with span("text_index_patch", col=col, rows=int(len(new))):
+            p = idx.patched(new[col])
+        if (len(p) - len(np.unique(p.codes[p.codes >= 0]))) > STALE_MAX * len(p):
+            continue
+        with _LOCK:
+            _INDEXES[(snapshot_version(new), len(new), col)] = p
+            while len(_INDEXES) > _MAX_INDEXES:
+                _INDEXES.popitem(last=False)
+        n += 1
+    return n
+
+def contains_mask(series: pd.Series, term: str, index: TrigramIndex | None = None) -> pd.Series:
+    """
+    Máscara "contiene" sin acentos para `series`. Con `index` (construido sobre el frame completo)
+    se responde por trigramas y se alinea a las filas de `series`; sin índice se normalizan solo los únicos.
+    """
+    if index is not None and index.index.is_unique:
+        m = index.mask(term)
+        return m if m.index.equals(series.index) else m.reindex(series.index, fill_value=False)
+    return _scan_mask(series, term)
+
+def suggest_values(frame: pd.DataFrame, col: str, term) -> list[str]:
+    """
+    Valores de `col` parecidos a `term` (ranking por similitud) si `term` no aparece en ninguna fila de
+    `frame`; [] si aparece o no hay nada parecido. Para "¿quisiste decir …?": no filtra filas.
+    """
+    idx = index_for(frame, col)
+    if idx is None or not term or len(idx.contains(str(term))):
+        return []
+    return [v for v, _ in idx.suggest(str(term))]
+
+def did_you_mean(term, suggestions: list[str]) -> str:
+    return f"Sin coincidencias para «{term}». ¿Quisiste decir: {', '.join(suggestions)}?"
+
+def _scan_mask(series: pd.Series, term: str) -> pd.Series:
+    codes, uniques = pd.factorize(series, sort=False)
+    t = fold(term)
+    ids = [i for i, u in enumerate(uniques) if t in fold(u)]
+    return pd.Series(np.isin(codes, ids), index=series.index)
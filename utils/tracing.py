@@ -0,0 +1,173 @@
+# utils/tracing.py — traza por pregunta: spans con duración, filas, bytes y cache hit/miss
+# Sin traza activa, span()/note() no hacen nada (costo ~1 µs): los módulos pueden instrumentarse
+# siempre. Cada traza cerrada se agrega a un JSONL local para analizar p50/p95 por ruta (bench/traces.py).
+#   FENIX_TRACE_LOG=ruta.jsonl (por defecto logs/traces.jsonl; "off" desactiva el archivo)
+# Con el perfilado de memoria activo (utils.memprof) cada span suma pico/neto de tracemalloc y pico de RSS,
+# y la traza los sitios que más memoria retienen.
+import os, json, time, uuid, threading, contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from . import memprof
+
+DEFAULT_LOG = "logs/traces.jsonl"
+_TRACE: contextvars.ContextVar = contextvars.ContextVar("fenix_trace", default=None)
+_SPAN: contextvars.ContextVar = contextvars.ContextVar("fenix_span", default=None)
+_LOG_LOCK = threading.Lock()
+
+class Trace:
+    def __init__(self, kind: str, **attrs):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.attrs = attrs
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.t0 = time.perf_counter()
+        self.total_ms: float | None = None
+        self.spans: list[dict] = []
+        self._lock = threading.Lock()
+        self._mem = None  # marca de memprof (solo con el perfilado activo)
+
+    def now_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000
+
+    def add(self, name: str, dur_ms: float, start_ms: float | None = None, **attrs) -> dict:
+        """Span ya medido (p. ej. load_sheets, que corre antes de que exista la traza)."""
+        s = {"name": name, "start_ms": round(self.now_ms() - dur_ms if start_ms is None else start_ms, 2),
+             "dur_ms": round(dur_ms, 2), "depth": 0, **attrs}
+        with self._lock:
+            self.spans.append(s)
+        return s
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        return {"id": self.id, "kind": self.kind, "started_at": self.started_at,
+                "total_ms": self.total_ms, **self.attrs, "spans": spans}
+
+def current_trace() -> Trace | None:
+    return _TRACE.get()
+
+def _log_path() -> str | None:
+    path = os.environ.get("FENIX_TRACE_LOG", DEFAULT_LOG)
+    return None if path.lower() in ("", "off", "0", "false") else path
+
+def append_log(record: dict, path: str | None = None) -> None:
+    path = path or _log_path()
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _LOG_LOCK, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+@contextmanager
+def trace(kind: str, log: bool = True, **attrs):
+    """
+    Abre una traza (o reutiliza la activa: una pregunta dentro de un lote queda en la traza del lote).
+    Al cerrar calcula total_ms y la agrega al JSONL.
+    """
+    active = _TRACE.get()
+    if active is not None:
+        yield active
+        return
+    tr = Trace(kind, **attrs)
+    tr._mem = memprof.question_start()
+    token = _TRACE.set(tr)
+    try:
+        yield tr
+    finally:
+        _TRACE.reset(token)
+        tr.total_ms = round(tr.now_ms(), 2)
+        mem = memprof.question_end(tr._mem)
+        if mem:
+            tr.attrs["mem"] = mem
+        if log:
+            try:
+                append_log(tr.to_dict())
+            except OSError:
+                pass  # la traza nunca rompe la respuesta
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Span anidable. Devuelve un dict donde el llamador anota rows/bytes/cache; sin traza activa es un
+    dict descartable.
+    """
+    tr = _TRACE.get()
+    if tr is None:
+        yield dict(attrs)
+        return
+    parent = _SPAN.get()
+    s = {"name": name, "start_ms": round(tr.now_ms(), 2), "dur_ms": None,
+         "depth": 0 if parent is None else parent["depth"] + 1, **attrs}
+    parent_mem = tr._mem if parent is None else parent.get("_mem")
+    s["_mem"] = memprof.stage_start(parent_mem)
+    token = _SPAN.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s["error"] = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        _SPAN.reset(token)
+        s["dur_ms"] = round(tr.now_ms() - s["start_ms"], 2)
+        s.update(memprof.stage_end(s.pop("_mem"), parent_mem, tr._mem and tr._mem.get("sampler")))
+        with tr._lock:
+            tr.spans.append(s)
+
+def note(**attrs) -> None:
+    """Anota el span en curso (p. ej. tokens de una llamada LLM hecha dentro de 'nl2sql')."""
+    s = _SPAN.get()
+    if s is not None:
+        s.update(attrs)
+
+def note_cache(cache: str, hit: bool) -> None:
+    """Registra hit/miss de un cache en el span en curso: {"cache": {"mb": "hit", ...}}."""
+    s = _SPAN.get()
+    if s is not None:
+        s.setdefault("cache", {})[cache] = "hit" if hit else "miss"
+
+def frame_stats(df) -> dict:
+    """rows/bytes de un resultado (memoria superficial: deep=True recorre cada string)."""
+    if df is None or not hasattr(df, "memory_usage"):
+        return {}
+    return {"rows": int(len(df)), "bytes": int(df.memory_usage(index=False).sum())}
+
+# ---------------------- análisis offline ----------------------
+def read_log(path: str | None = None) -> list[dict]:
+    path = path or _log_path() or DEFAULT_LOG
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _pct(vals: list[float], p: float) -> float:
+    s = sorted(vals)
+    return s[min(len(s) - 1, int(round(p * (len(s) - 1))))] if s else 0.0
+
+def route_percentiles(traces: list[dict]) -> dict[str, dict]:
+    """{ruta: {n, p50_ms, p95_ms, etapas: {span: {p50_ms, p95_ms}}}} de trazas de preguntas."""
+    by_route: dict[str, list[dict]] = {}
+    for t in traces:
+        if t.get("total_ms") is not None:
+            by_route.setdefault(t.get("route") or "(sin ruta)", []).append(t)
+    out = {}
+    for route, ts in by_route.items():
+        stages: dict[str, list[float]] = {}
+        peaks: dict[str, list[float]] = {}
+        for t in ts:
+            per: dict[str, float] = {}
+            for s in t.get("spans", []):  # todas las profundidades: un span anidado es una etapa más
+                if s.get("dur_ms") is not None:
+                    per[s["name"]] = per.get(s["name"], 0.0) + s["dur_ms"]
+                if s.get("mem_peak_mb") is not None:
+                    peaks.setdefault(s["name"], []).append(s["mem_peak_mb"])
+            for name, ms in per.items():
+                stages.setdefault(name, []).append(ms)
+        totals = [t["total_ms"] for t in ts]
+        out[route] = {
+            "n": len(ts), "p50_ms": round(_pct(totals, .5), 1), "p95_ms": round(_pct(totals, .95), 1),
+            "etapas": {k: {"p50_ms": round(_pct(v, .5), 1), "p95_ms": round(_pct(v, .95), 1),
+                           **({"p95_peak_mb": round(_pct(peaks[k], .95), 2)} if k in peaks else {})}
+                       for k, v in sorted(stages.items(), key=lambda kv: -sum(kv[1]))},
+        }
+    return out